@@ -0,0 +1,87 @@
+"""
+Микро‑бенчмарк рендера инцидента: текст сообщения + клавиатура.
+
+Сравнивает старый путь (чтение статуса из БД + новая клавиатура + полный
+рендер текста) с фабриками клавиатур и кэшем рендера.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_incident_render
+"""
+import asyncio
+import os
+import timeit
+from datetime import datetime, timedelta, timezone
+
+# globals.config требует переменные окружения — для бенчмарка хватит заглушек
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("GROUP_ID", "-1000000000000")
+os.environ.setdefault("DATABASE_URL", "postgres://bench@localhost/bench")
+
+from utils import messages  # noqa: E402
+from utils.keyboards import build_incident_keyboard, get_incident_keyboard  # noqa: E402
+
+N = 20000
+
+INCIDENT = {
+    "id": 4242,
+    "event": "High CPU utilization",
+    "node": "hv-01.example.local",
+    "trigger": "CPU load > 90% for 5m",
+    "status": "closed",
+    "severity": "High",
+    "details": "Load average 32.1 on 16 cores",
+    "created_at": datetime(2026, 1, 1, 10, 0, tzinfo=timezone.utc),
+    "updated_at": datetime(2026, 1, 1, 11, 0, tzinfo=timezone.utc),
+    "assigned_to_username": "@oncall",
+    "closed_by_username": "@oncall",
+    "closed_at": datetime(2026, 1, 1, 11, 0, tzinfo=timezone.utc),
+    "comment": "fixed",
+    "message_id": 100,
+}
+
+
+class FakeDB:
+    """Имитирует Database.get_incident без сети (только накладные расходы вызова)."""
+
+    async def get_incident(self, incident_id):
+        await asyncio.sleep(0)
+        return INCIDENT
+
+
+def bench(label, fn, number=N):
+    total = timeit.timeit(fn, number=number)
+    print(f"{label:<45} {total / number * 1e6:8.2f} µs/op")
+
+
+def main():
+    db = FakeDB()
+    loop = asyncio.new_event_loop()
+
+    bench("keyboard: get_incident_keyboard (fake DB)",
+          lambda: loop.run_until_complete(get_incident_keyboard(INCIDENT["id"], db)), number=N // 4)
+    bench("keyboard: build_incident_keyboard (cold)",
+          lambda: build_incident_keyboard.__wrapped__(INCIDENT["id"], INCIDENT["status"]))
+    bench("keyboard: build_incident_keyboard (cached)",
+          lambda: build_incident_keyboard(INCIDENT["id"], INCIDENT["status"]))
+
+    bench("text: render without cache",
+          lambda: messages._render_incident_message(INCIDENT))
+    messages.clear_render_cache()
+    bench("text: format_incident_message (cached)",
+          lambda: messages.format_incident_message(INCIDENT))
+
+    # /active: 200 разных инцидентов, повторный вызов целиком из кэша
+    incidents = [
+        dict(INCIDENT, id=i, status="open", updated_at=INCIDENT["updated_at"] + timedelta(seconds=i))
+        for i in range(200)
+    ]
+    bench("/active x200: render without cache",
+          lambda: "".join(messages._render_active_line(i) for i in incidents), number=N // 20)
+    bench("/active x200: format_active_line (cached)",
+          lambda: "".join(messages.format_active_line(i) for i in incidents), number=N // 20)
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк списка vApp: записи с __slots__ и индексами против pandas DataFrame.
+
+Меряет время импорта handlers.cloud_vapp (и отдельно import pandas, который
+раньше тянулся при старте), память под список vApp и задержку типовых
+операций: поиск vApp по имени, страница клавиатуры, сводная таблица.
+Если pandas не установлен, сравнение со старым путём пропускается.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_vapp_inventory
+"""
+import os
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+# globals.config требует переменные окружения — для бенчмарка хватит заглушек
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("GROUP_ID", "-1000000000000")
+os.environ.setdefault("DATABASE_URL", "postgres://bench@localhost/bench")
+
+from handlers.cloud_vapp import (  # noqa: E402
+    VAppInventory, VAppRecord, keyboard_vapp_list, render_summary_table,
+)
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+N_VAPPS = 2000
+N = 2000
+CAPACITY = (1000.0, 4096.0, 100 * 1024.0)  # vCPU, RAM ГБ, диск ГБ
+
+
+def make_query_records(count: int) -> list[dict]:
+    """Атрибуты VAppRecord, как их отдаёт /api/query."""
+    states = ["POWERED_ON", "POWERED_OFF", "MIXED"]
+    return [
+        {
+            "name": f"vapp-{i:05d}", "status": states[i % 3],
+            "href": f"https://vcd.example/api/vApp/vapp-{i}",
+            "numberOfCpus": str(2 + i % 8), "memoryAllocationMB": str(4096 * (1 + i % 4)),
+            "totalStorageAllocatedMb": str(51200 + i),
+        }
+        for i in range(count)
+    ]
+
+
+def make_dataframe(records: list[dict]):
+    """Прежний путь: строки‑словари из записей /api/query → DataFrame."""
+    rows = []
+    for rec in records:
+        r = VAppRecord.from_query(rec)
+        rows.append({"Статус": r.status, "Имя vApp": r.name, "vCPU": r.vcpu,
+                     "RAM (ГБ)": r.ram_gb, "Диск (ГБ)": r.disk_gb, "href": r.href})
+    return pd.DataFrame(rows)
+
+
+def bench(label, fn, number=N):
+    total = timeit.timeit(fn, number=number)
+    print(f"{label:<50} {total / number * 1e6:10.2f} µs/op")
+
+
+def import_cost(module: str) -> tuple[float, float]:
+    """Время импорта (мс) и прирост RSS (МБ) в свежем интерпретаторе."""
+    code = (
+        "import time\n"
+        "def rss():\n"
+        "    with open('/proc/self/status') as f:\n"
+        "        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS'))\n"
+        "before = rss()\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - t, rss() - before)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, env=os.environ)
+    seconds, rss_kb = out.stdout.split()
+    return float(seconds) * 1000, int(rss_kb) / 1024
+
+
+def traced(fn):
+    """Результат fn() и память, которую он удерживает, КБ."""
+    tracemalloc.start()
+    result = fn()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained / 1024
+
+
+def main():
+    for module in ("handlers.cloud_vapp", "pandas"):
+        if module == "pandas" and pd is None:
+            continue
+        ms, rss = import_cost(module)
+        print(f"import {module:<42} {ms:8.1f} ms  +{rss:6.1f} MB RSS")
+    print("  (pandas раньше импортировался вместе с handlers.cloud_vapp)")
+    print()
+
+    records = make_query_records(N_VAPPS)
+    inventory, kb = traced(lambda: VAppInventory([VAppRecord.from_query(r) for r in records]))
+    print(f"memory: VAppInventory x{N_VAPPS} (+ индексы)          {kb:10.1f} KB")
+    if pd is not None:
+        df, kb = traced(lambda: make_dataframe(records))
+        print(f"memory: pandas DataFrame x{N_VAPPS}                    {kb:10.1f} KB")
+    print()
+
+    name = inventory.records[-1].name
+    bench("lookup by name: VAppInventory.find", lambda: inventory.find(name))
+    if pd is not None:
+        bench("lookup by name: df[df['Имя vApp'] == name]",
+              lambda: df[df["Имя vApp"] == name].iloc[0]["href"], number=N // 10)
+
+    # строки одной страницы клавиатуры (12 кнопок) — часть, которая поменялась
+    bench("keyboard rows: records slice",
+          lambda: [(r.status, r.name) for r in inventory.records[48:60]])
+    if pd is not None:
+        bench("keyboard rows: df.iloc + iterrows",
+              lambda: [(row.get("Статус", "⚪"), row["Имя vApp"]) for _, row in df.iloc[48:60].iterrows()],
+              number=N // 10)
+    bench("keyboard page: keyboard_vapp_list (вся разметка)",
+          lambda: keyboard_vapp_list(inventory, page=5), number=N // 10)
+
+    bench(f"summary table x{N_VAPPS}: records", lambda: render_summary_table(inventory, CAPACITY), number=20)
+    if pd is not None:
+        bench(f"summary rows x{N_VAPPS}: df.iterrows", lambda: [r["vCPU"] for _, r in df.iterrows()], number=20)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 import asyncpg
 from database.queries import (
@@ -5,21 +6,66 @@ from database.queries import (
     INSERT_INCIDENT,
     UPDATE_STATUS,
     CLOSE_INCIDENT,
-    REJECT_INCIDENT
+    REJECT_INCIDENT,
+    MIGRATIONS,
+    INSERT_INCIDENT_MESSAGE,
+    SELECT_INCIDENT_MESSAGES,
+    SELECT_ESCALATION_CANDIDATES,
+    MARK_ESCALATED,
+    RESET_ESCALATION,
+    INSERT_MAINTENANCE_WINDOW,
+    SELECT_MAINTENANCE_WINDOWS,
+    DELETE_MAINTENANCE_WINDOW,
+    CLAIM_MAINTENANCE_SUMMARY,
+    SELECT_MAINTENANCE_SUMMARY,
+    ADD_CHILD_INCIDENT,
+    SELECT_RECENT_PARENTS,
+    CLOSE_CHILD_INCIDENTS,
+    SELECT_MESSAGES_FOR_INCIDENTS,
+    SELECT_INCIDENTS_VERSION,
+    SELECT_INCIDENT_STATS,
+    SELECT_ACTIVE_BY_SEVERITY,
+    INSERT_OUTBOX,
+    CLAIM_OUTBOX,
+    DELETE_OUTBOX,
+    FAIL_OUTBOX,
+    SELECT_RECENT_PARENT
 )
+from globals.config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
 from logger.logger import logger
 
+# Ключ pg_advisory_xact_lock на время миграций
+MIGRATION_LOCK_KEY = 0x7A62_0001
+
+# Интервал проверки живости соединения LISTEN и пауза перед переподключением, сек
+LISTENER_PING_INTERVAL = 30
+LISTENER_RETRY_DELAY = 5
+
+# Колонки, доступные через REST API (fields=...)
+INCIDENT_FIELDS = (
+    "id", "event", "node", "trigger", "status", "severity", "details",
+    "created_at", "updated_at", "assigned_to_username", "assigned_to_user_id",
+    "closed_by_username", "closed_by_user_id", "closed_at", "comment",
+    "message_id", "chat_id", "escalation_level", "suppressed", "maintenance_id",
+    "flapping", "parent_id", "child_count"
+)
+
 class Database:
     def __init__(self):
         self.pool = None
+        self.dsn = None
+        self._listeners: dict[str, list] = {}
+        self._listen_task: asyncio.Task | None = None
+        self._listen_conn = None
 
     async def connect(self, dsn: str):
         """Установка соединения с базой данных"""
+        self.dsn = dsn
         try:
             self.pool = await asyncpg.create_pool(
                 dsn=dsn,
-                min_size=5,
-                max_size=20,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
                 command_timeout=60
             )
             logger.info("Database connection pool created")
@@ -31,8 +77,11 @@ class Database:
 
     async def _init_db(self):
         """Инициализация структуры базы данных"""
-        async with self.pool.acquire() as conn:
+        async with self.pool.acquire() as conn, conn.transaction():
             try:
+                # Несколько процессов/реплик стартуют одновременно — схему меняет только один
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_KEY)
+
                 # Создаем схему public если она не существует
                 await conn.execute("CREATE SCHEMA IF NOT EXISTS public")
                 
@@ -50,30 +99,44 @@ class Database:
                     logger.info("Database tables created")
                 else:
                     logger.info("Database tables already exist")
+
+                for statement in MIGRATIONS:
+                    await conn.execute(statement)
+                logger.info(f"Applied {len(MIGRATIONS)} schema migrations")
                     
             except Exception as e:
                 logger.error(f"Database initialization error: {e}", exc_info=True)
                 raise
 
-    async def create_incident(self, data: dict) -> int:
-        """Создание нового инцидента"""
-        try:
-            async with self.pool.acquire() as conn:
-                result = await conn.fetchrow(
-                    INSERT_INCIDENT,
-                    data["event"],
-                    data["node"],
-                    data["trigger"],
-                    data.get("status", "open"),
-                    data["severity"],
-                    data.get("details", ""),
-                    data.get("assigned_to_username"),
-                    data.get("assigned_to_user_id"),
-                    data.get("closed_by_username"),
-                    data.get("closed_by_user_id"),
-                    data.get("message_id")  # Добавляем 11-й параметр
-                )
+    @staticmethod
+    def _incident_params(data: dict, parent_id: int = None) -> tuple:
+        """Параметры INSERT_INCIDENT в порядке $1..$15"""
+        return (
+            data["event"],
+            data["node"],
+            data["trigger"],
+            data.get("status", "open"),
+            data["severity"],
+            data.get("details", ""),
+            data.get("assigned_to_username"),
+            data.get("assigned_to_user_id"),
+            data.get("closed_by_username"),
+            data.get("closed_by_user_id"),
+            data.get("message_id"),  # Добавляем 11-й параметр
+            data.get("suppressed", False),
+            data.get("maintenance_id"),
+            data.get("flapping", False),
+            parent_id if parent_id is not None else data.get("parent_id")
+        )
+
+    async def create_incident(self, data: dict, outbox_kind: str = None) -> int:
+        """Создание нового инцидента; outbox_kind — задание в outbox в той же транзакции"""
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                result = await conn.fetchrow(INSERT_INCIDENT, *self._incident_params(data))
                 incident_id = result["id"]
+                if outbox_kind:
+                    await conn.execute(INSERT_OUTBOX, outbox_kind, incident_id, "{}")
                 logger.info(f"Created incident ID: {incident_id}")
                 return incident_id
         except asyncpg.PostgresError as e:
@@ -105,6 +168,12 @@ class Database:
             )
             return None
 
+    async def fetch_incident(self, incident_id: int) -> dict | None:
+        """Инцидент для REST API: None — нет такого, ошибки БД пробрасываются"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM incidents WHERE id = $1", incident_id)
+        return dict(row) if row else None
+
     async def update_incident(
         self,
         incident_id: int,
@@ -115,7 +184,9 @@ class Database:
         closed_by_user_id: int = None,
         closed_at: datetime = None,
         comment: str = None,
-        message_id: int = None
+        message_id: int = None,
+        chat_id: int = None,
+        bot_id: int = None
     ) -> bool:
         """Обновление данных инцидента"""
         try:
@@ -157,6 +228,14 @@ class Database:
                     updates.append(f"message_id = ${index}")
                     params.append(message_id)
                     index += 1
+                if chat_id is not None:
+                    updates.append(f"chat_id = ${index}")
+                    params.append(chat_id)
+                    index += 1
+                if bot_id is not None:
+                    updates.append(f"bot_id = ${index}")
+                    params.append(bot_id)
+                    index += 1
 
                 if not updates:
                     logger.warning(f"No updates provided for incident #{incident_id}")
@@ -181,3 +260,442 @@ class Database:
                 exc_info=True
             )
             return False
+
+    async def add_incident_message(self, incident_id: int, chat_id: int, topic_id: int | None, message_id: int,
+                                   bot_id: int | None = None) -> bool:
+        """Сохраняет одно из сообщений инцидента в Telegram (и бота, который его отправил)"""
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(INSERT_INCIDENT_MESSAGE, incident_id, chat_id, topic_id, message_id, bot_id)
+                return True
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error saving message {chat_id}/{message_id} of incident #{incident_id}: {e}", exc_info=True)
+            return False
+
+    async def get_incident_messages(self, incident_id: int) -> list[dict]:
+        """Все сообщения инцидента (по одному на каждый чат/тему маршрута)"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_INCIDENT_MESSAGES, incident_id)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting messages of incident #{incident_id}: {e}", exc_info=True)
+            return []
+
+    async def get_escalation_candidates(self) -> list[dict]:
+        """Открытые инциденты для восстановления таймеров эскалации"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_ESCALATION_CANDIDATES)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting escalation candidates: {e}", exc_info=True)
+            return []
+
+    async def mark_escalated(self, incident_id: int, level: int) -> dict | None:
+        """
+        Атомарно поднимает уровень эскалации открытого инцидента.
+        Возвращает инцидент или None, если он уже не открыт / шаг уже выполнен.
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(MARK_ESCALATED, incident_id, level)
+                return dict(row) if row else None
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error escalating incident #{incident_id}: {e}", exc_info=True)
+            return None
+
+    async def reset_escalation(self, incident_id: int) -> dict | None:
+        """Сбрасывает эскалацию (после переоткрытия инцидента)"""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(RESET_ESCALATION, incident_id)
+                return dict(row) if row else None
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error resetting escalation of incident #{incident_id}: {e}", exc_info=True)
+            return None
+
+    async def add_maintenance_window(
+        self,
+        node_pattern: str,
+        starts_at: datetime,
+        ends_at: datetime,
+        comment: str = None,
+        created_by_username: str = None,
+        created_by_user_id: int = None,
+        chat_id: int = None,
+        topic_id: int = None
+    ) -> dict | None:
+        """Создание окна обслуживания"""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    INSERT_MAINTENANCE_WINDOW,
+                    node_pattern, starts_at, ends_at, comment,
+                    created_by_username, created_by_user_id, chat_id, topic_id
+                )
+                logger.info(f"Created maintenance window #{row['id']} for {node_pattern}")
+                return dict(row)
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error creating maintenance window for {node_pattern}: {e}", exc_info=True)
+            return None
+
+    async def get_maintenance_windows(self) -> list[dict]:
+        """Действующие и будущие окна, а также завершённые без итога"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_MAINTENANCE_WINDOWS)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting maintenance windows: {e}", exc_info=True)
+            return []
+
+    async def delete_maintenance_window(self, window_id: int) -> dict | None:
+        """Удаление окна обслуживания"""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(DELETE_MAINTENANCE_WINDOW, window_id)
+                return dict(row) if row else None
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error deleting maintenance window #{window_id}: {e}", exc_info=True)
+            return None
+
+    async def claim_maintenance_summary(self, window_id: int) -> dict | None:
+        """Помечает итог окна отправленным; None — окно не закончилось или итог уже отправлен"""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(CLAIM_MAINTENANCE_SUMMARY, window_id)
+                return dict(row) if row else None
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error claiming summary of maintenance window #{window_id}: {e}", exc_info=True)
+            return None
+
+    async def get_maintenance_summary(self, window_id: int) -> list[dict]:
+        """Подавленные алерты окна, сгруппированные по узлу и триггеру"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_MAINTENANCE_SUMMARY, window_id)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting summary of maintenance window #{window_id}: {e}", exc_info=True)
+            return []
+
+    async def create_child_incident(self, data: dict, parent_id: int) -> int | None:
+        """
+        Дочерний инцидент и child_count + 1 у родителя в одной транзакции.
+        None — родитель уже не активен (ничего не записано), -1 — ошибка БД.
+        """
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                if await conn.fetchrow(ADD_CHILD_INCIDENT, parent_id) is None:
+                    return None
+                result = await conn.fetchrow(INSERT_INCIDENT, *self._incident_params(data, parent_id))
+                logger.info(f"Created incident ID: {result['id']} (child of #{parent_id})")
+                return result["id"]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error creating child incident of #{parent_id}: {e}\nParams: {data}", exc_info=True)
+            return -1
+
+    async def get_recent_parents(self, window_seconds: float) -> list[dict]:
+        """Отправленные активные инциденты моложе window_seconds"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_RECENT_PARENTS, float(window_seconds))
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting recent parent incidents: {e}", exc_info=True)
+            return []
+
+    async def close_children(
+        self,
+        parent_id: int,
+        status: str,
+        closed_by_username: str,
+        closed_by_user_id: int,
+        comment: str
+    ) -> list[int]:
+        """Закрывает (или отклоняет) все активные дочерние инциденты одним запросом"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    CLOSE_CHILD_INCIDENTS,
+                    parent_id, status, closed_by_username, closed_by_user_id, comment
+                )
+                if rows:
+                    logger.info(f"Closed {len(rows)} child incidents of #{parent_id} ({status})")
+                return [row["id"] for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error closing children of incident #{parent_id}: {e}", exc_info=True)
+            return []
+
+    async def get_messages_for_incidents(self, incident_ids: list[int]) -> list[dict]:
+        """Сообщения сразу многих инцидентов одним запросом"""
+        if not incident_ids:
+            return []
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(SELECT_MESSAGES_FOR_INCIDENTS, incident_ids)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error getting messages of {len(incident_ids)} incidents: {e}", exc_info=True)
+            return []
+
+    async def bulk_close_incidents(
+        self,
+        status: str,
+        closed_by_username: str,
+        closed_by_user_id: int,
+        comment: str,
+        node: str = None,
+        trigger: str = None,
+        severities: list[str] = None,
+        older_than: float = None
+    ) -> list[dict] | None:
+        """
+        Закрывает (или отклоняет) все активные инциденты под фильтрами и их
+        дочерние одним UPDATE ... RETURNING. node — имя или шаблон с '*',
+        trigger — подстрока, older_than — возраст в секундах.
+        """
+        conditions = ["status IN ('open', 'in_progress')"]
+        params = [status, closed_by_username, closed_by_user_id, comment]
+        index = len(params) + 1
+
+        if node is not None:
+            pattern = node.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(f"lower(node) LIKE ${index}")
+            params.append(pattern.replace("*", "%"))
+            index += 1
+        if trigger is not None:
+            escaped = trigger.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append(f"trigger ILIKE ${index}")
+            params.append(f"%{escaped}%")
+            index += 1
+        if severities:
+            conditions.append(f"lower(severity) = ANY(${index}::text[])")
+            params.append([s.lower() for s in severities])
+            index += 1
+        if older_than is not None:
+            conditions.append(f"created_at < NOW() - make_interval(secs => ${index})")
+            params.append(float(older_than))
+            index += 1
+
+        query = f"""
+        WITH targets AS (
+            SELECT id FROM public.incidents WHERE {" AND ".join(conditions)}
+        )
+        UPDATE public.incidents
+        SET status = $1,
+            closed_by_username = $2,
+            closed_by_user_id = $3,
+            closed_at = NOW(),
+            comment = $4,
+            updated_at = NOW()
+        WHERE status IN ('open', 'in_progress')
+          AND (id IN (SELECT id FROM targets) OR parent_id IN (SELECT id FROM targets))
+        RETURNING *;
+        """
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(query, *params)
+                logger.info(f"Bulk {status}: {len(rows)} incidents")
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(
+                f"Error in bulk {status}: {e}\n"
+                f"Query: {query}\n"
+                f"Params: {params}",
+                exc_info=True
+            )
+            return None
+
+    async def list_incidents(
+        self,
+        fields: list[str],
+        limit: int,
+        before_id: int = None,
+        status: list[str] = None,
+        node: str = None,
+        severity: list[str] = None,
+        include_suppressed: bool = False
+    ) -> list[dict]:
+        """
+        Страница инцидентов от новых к старым (keyset по id: before_id —
+        курсор предыдущей страницы). fields — подмножество INCIDENT_FIELDS.
+        """
+        columns = ", ".join(dict.fromkeys(["id", *fields]))
+        conditions = []
+        params = []
+        index = 1
+
+        if before_id is not None:
+            conditions.append(f"id < ${index}")
+            params.append(before_id)
+            index += 1
+        if status:
+            conditions.append(f"status = ANY(${index}::text[])")
+            params.append(status)
+            index += 1
+        if node is not None:
+            conditions.append(f"lower(node) = ${index}")
+            params.append(node.lower())
+            index += 1
+        if severity:
+            conditions.append(f"lower(severity) = ANY(${index}::text[])")
+            params.append([s.lower() for s in severity])
+            index += 1
+        if not include_suppressed:
+            conditions.append("NOT suppressed")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"SELECT {columns} FROM public.incidents {where} ORDER BY id DESC LIMIT ${index}"
+        params.append(limit)
+
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(query, *params)
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(
+                f"Error listing incidents: {e}\n"
+                f"Query: {query}\n"
+                f"Params: {params}",
+                exc_info=True
+            )
+            raise
+
+    async def get_incidents_version(self) -> tuple:
+        """(max(updated_at), max(id)) — меняется при любой записи инцидентов"""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(SELECT_INCIDENTS_VERSION)
+            return row["updated_at"], row["max_id"]
+
+    async def get_incident_stats(self) -> dict:
+        """Счётчики по статусам и активные инциденты по критичности"""
+        async with self.pool.acquire() as conn:
+            totals = await conn.fetchrow(SELECT_INCIDENT_STATS)
+            by_severity = await conn.fetch(SELECT_ACTIVE_BY_SEVERITY)
+        stats = dict(totals)
+        stats["active_by_severity"] = {row["severity"]: row["count"] for row in by_severity}
+        return stats
+
+    def add_listener(self, channel: str, callback):
+        """
+        Подписка callback(payload) на LISTEN channel. Все каналы слушаются
+        через одно отдельное соединение (не из пула) с автопереподключением;
+        после переподключения callback получает None — события за время
+        разрыва могли потеряться.
+        """
+        new_channel = channel not in self._listeners
+        self._listeners.setdefault(channel, []).append(callback)
+        conn = self._listen_conn
+        if new_channel and conn is not None and not conn.is_closed():
+            # соединение уже слушает — подписываем его и на новый канал
+            asyncio.create_task(conn.add_listener(channel, self._on_notify))
+        if self._listen_task is None or self._listen_task.done():
+            self._listen_task = asyncio.create_task(self._listen_loop(), name="db-listener")
+
+    async def stop_listeners(self):
+        if self._listen_task:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+
+    def _on_notify(self, _conn, _pid, channel: str, payload):
+        self._dispatch(channel, payload)
+
+    def _dispatch(self, channel: str, payload):
+        for callback in self._listeners.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Listener of {channel} failed: {e}", exc_info=True)
+
+    async def _listen_loop(self):
+        reconnect = False
+        while True:
+            conn = None
+            lost = asyncio.Event()
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                conn.add_termination_listener(lambda _: lost.set())
+                subscribed = set()
+                while subscribed != set(self._listeners):
+                    # каналы могли добавить, пока шла подписка
+                    for channel in set(self._listeners) - subscribed:
+                        await conn.add_listener(channel, self._on_notify)
+                        subscribed.add(channel)
+                self._listen_conn = conn
+                logger.info(f"Listening on {', '.join(self._listeners)}")
+
+                if reconnect:
+                    for channel in self._listeners:
+                        self._dispatch(channel, None)
+                reconnect = True
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=LISTENER_PING_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # тихий обрыв сети иначе не заметить
+                        await conn.execute("SELECT 1")
+                logger.warning("Listener connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener connection error: {e}")
+            finally:
+                self._listen_conn = None
+                if conn is not None and not conn.is_closed():
+                    try:
+                        await conn.close()
+                    except Exception:
+                        pass
+            await asyncio.sleep(LISTENER_RETRY_DELAY)
+
+    async def enqueue_outbox(self, kind: str, incident_id: int = None, payload: str = "{}") -> int | None:
+        """Кладёт задание в outbox и будит обработчик (NOTIFY outbox)"""
+        try:
+            async with self.pool.acquire() as conn:
+                return await conn.fetchval(INSERT_OUTBOX, kind, incident_id, payload)
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error enqueueing {kind} for incident #{incident_id}: {e}", exc_info=True)
+            return None
+
+    async def claim_outbox(self, limit: int, lease_seconds: float) -> list[dict]:
+        """Берёт в аренду до limit доступных заданий"""
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(CLAIM_OUTBOX, limit, float(lease_seconds))
+                return [dict(row) for row in rows]
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error claiming outbox jobs: {e}", exc_info=True)
+            return []
+
+    async def complete_outbox(self, job_id: int):
+        """Удаляет выполненное задание"""
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(DELETE_OUTBOX, job_id)
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error completing outbox job #{job_id}: {e}", exc_info=True)
+
+    async def fail_outbox(self, job_id: int, error: str, retry_in: float):
+        """Откладывает неудавшееся задание на retry_in секунд"""
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(FAIL_OUTBOX, job_id, error[:1000], float(retry_in))
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error failing outbox job #{job_id}: {e}", exc_info=True)
+
+    async def find_recent_parent(self, nodes: list[str], window_seconds: float) -> dict | None:
+        """Последний активный отправленный инцидент с одного из узлов за окно"""
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(SELECT_RECENT_PARENT, [n.lower() for n in nodes], float(window_seconds))
+                return dict(row) if row else None
+        except asyncpg.PostgresError as e:
+            logger.error(f"Error finding parent incident for {nodes}: {e}", exc_info=True)
+            return None
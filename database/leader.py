@@ -0,0 +1,71 @@
+import asyncio
+import asyncpg
+from logger.logger import logger
+
+
+class AdvisoryLeader:
+    """
+    Выбор лидера среди реплик через pg_try_advisory_lock.
+
+    Блокировка сессионная, поэтому держится на отдельном соединении (не из
+    пула): пока соединение живо — реплика лидер; при обрыве Postgres сам
+    снимает блокировку и её забирает другая реплика.
+    """
+
+    def __init__(self, dsn: str, key: int, name: str = "leader", check_interval: float = 10):
+        self.dsn = dsn
+        self.key = key
+        self.name = name
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._conn: asyncpg.Connection | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self, on_elected=None, on_lost=None):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(on_elected, on_lost), name=f"{self.name}-leader")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+        self.is_leader = False
+
+    async def _close(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _run(self, on_elected, on_lost):
+        while True:
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._conn = await asyncpg.connect(self.dsn)
+
+                if self.is_leader:
+                    # проверяем, что соединение (а значит и блокировка) живо
+                    await self._conn.fetchval("SELECT 1")
+                elif await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key):
+                    self.is_leader = True
+                    logger.info(f"[{self.name}] Эта реплика стала лидером")
+                    if on_elected:
+                        await on_elected()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[{self.name}] Соединение блокировки лидера потеряно: {e}")
+                await self._close()
+                if self.is_leader:
+                    self.is_leader = False
+                    if on_lost:
+                        await on_lost()
+
+            await asyncio.sleep(self.check_interval)
@@ -31,9 +31,13 @@ INSERT INTO public.incidents (
     assigned_to_user_id,
     closed_by_username,
     closed_by_user_id,
-    message_id
+    message_id,
+    suppressed,
+    maintenance_id,
+    flapping,
+    parent_id
 )
-VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
 RETURNING id;
 """
 
@@ -73,4 +77,329 @@ SET status = 'rejected',
     message_id = COALESCE($5, message_id)  -- Обновляем message_id, если передан
 WHERE id = $4
 RETURNING id;  
-"""
\ No newline at end of file
+"""
+
+# --- Миграции: выполняются при каждом старте, поэтому только идемпотентные ---
+MIGRATIONS = [
+    # Все сообщения инцидента: алерт может уйти сразу в несколько чатов/тем
+    """
+    CREATE TABLE IF NOT EXISTS public.incident_messages (
+        incident_id INTEGER NOT NULL REFERENCES public.incidents(id) ON DELETE CASCADE,
+        chat_id BIGINT NOT NULL,
+        topic_id INTEGER,
+        message_id BIGINT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (chat_id, message_id)
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS incident_messages_incident_idx ON public.incident_messages (incident_id);",
+    # Чат основного сообщения (message_id) — для ссылок в /active
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS chat_id BIGINT;",
+    # Эскалация: сколько шагов уже сработало и от какого момента считать сроки
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS escalation_level INTEGER NOT NULL DEFAULT 0;",
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS escalate_from TIMESTAMP WITH TIME ZONE DEFAULT NOW();",
+    "CREATE INDEX IF NOT EXISTS incidents_open_idx ON public.incidents (id) WHERE status = 'open';",
+    # Окна обслуживания: алерты в окне сохраняются с suppressed = TRUE и не отправляются
+    """
+    CREATE TABLE IF NOT EXISTS public.maintenance_windows (
+        id SERIAL PRIMARY KEY,
+        node_pattern TEXT NOT NULL,
+        starts_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        ends_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        comment TEXT,
+        created_by_username TEXT,
+        created_by_user_id BIGINT,
+        chat_id BIGINT,
+        topic_id INTEGER,
+        summary_sent BOOLEAN NOT NULL DEFAULT FALSE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        CHECK (ends_at > starts_at)
+    );
+    """,
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS suppressed BOOLEAN NOT NULL DEFAULT FALSE;",
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS maintenance_id INTEGER;",
+    "CREATE INDEX IF NOT EXISTS incidents_maintenance_idx ON public.incidents (maintenance_id) WHERE maintenance_id IS NOT NULL;",
+    # Триггер флаппил в момент алерта (повторы при этом приглушаются через suppressed)
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS flapping BOOLEAN NOT NULL DEFAULT FALSE;",
+    # Каскады: дочерние алерты ссылаются на родителя, у родителя — счётчик
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS parent_id INTEGER REFERENCES public.incidents(id) ON DELETE SET NULL;",
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS child_count INTEGER NOT NULL DEFAULT 0;",
+    "CREATE INDEX IF NOT EXISTS incidents_parent_idx ON public.incidents (parent_id) WHERE parent_id IS NOT NULL;",
+    # Версия данных для ETag REST API: max(updated_at) берётся из индекса
+    "CREATE INDEX IF NOT EXISTS incidents_updated_at_idx ON public.incidents (updated_at);",
+    # NOTIFY на каждую вставку/изменение инцидента — для SSE‑потока /incidents/stream.
+    # В payload только короткие поля: лимит NOTIFY — 8000 байт
+    """
+    CREATE OR REPLACE FUNCTION public.incidents_notify() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('incident_changes', json_build_object(
+            'op', lower(TG_OP),
+            'id', NEW.id,
+            'status', NEW.status,
+            'severity', NEW.severity,
+            'node', left(NEW.node, 200),
+            'event', left(NEW.event, 200),
+            'assigned_to_username', NEW.assigned_to_username,
+            'suppressed', NEW.suppressed,
+            'parent_id', NEW.parent_id,
+            'child_count', NEW.child_count,
+            'updated_at', NEW.updated_at
+        )::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'incidents_notify_trg') THEN
+            CREATE TRIGGER incidents_notify_trg
+            AFTER INSERT OR UPDATE ON public.incidents
+            FOR EACH ROW EXECUTE FUNCTION public.incidents_notify();
+        END IF;
+    END $$;
+    """,
+    # Outbox: API‑процессы кладут задания, процесс бота их выполняет (RUN_MODE=api/bot)
+    """
+    CREATE TABLE IF NOT EXISTS public.outbox (
+        id BIGSERIAL PRIMARY KEY,
+        kind TEXT NOT NULL,
+        incident_id INTEGER REFERENCES public.incidents(id) ON DELETE CASCADE,
+        payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    """,
+    "CREATE INDEX IF NOT EXISTS outbox_available_idx ON public.outbox (available_at, id);",
+    # Поиск недавнего родителя каскада из любого API‑воркера
+    "CREATE INDEX IF NOT EXISTS incidents_node_created_idx ON public.incidents (lower(node), created_at);",
+    # Несколько ботов: править сообщение может только бот, который его отправил
+    "ALTER TABLE public.incident_messages ADD COLUMN IF NOT EXISTS bot_id BIGINT;",
+    "ALTER TABLE public.incidents ADD COLUMN IF NOT EXISTS bot_id BIGINT;",
+    # NOTIFY при изменении окон обслуживания: все процессы сразу перечитывают индекс
+    """
+    CREATE OR REPLACE FUNCTION public.maintenance_windows_notify() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('maintenance_changes', lower(TG_OP));
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'maintenance_windows_notify_trg') THEN
+            CREATE TRIGGER maintenance_windows_notify_trg
+            AFTER INSERT OR UPDATE OR DELETE ON public.maintenance_windows
+            FOR EACH STATEMENT EXECUTE FUNCTION public.maintenance_windows_notify();
+        END IF;
+    END $$;
+    """,
+]
+
+# Канал LISTEN/NOTIFY изменений инцидентов
+INCIDENT_CHANNEL = "incident_changes"
+# Канал пробуждения обработчика outbox
+OUTBOX_CHANNEL = "outbox"
+# Канал изменений окон обслуживания
+MAINTENANCE_CHANNEL = "maintenance_changes"
+
+INSERT_INCIDENT_MESSAGE = """
+INSERT INTO public.incident_messages (incident_id, chat_id, topic_id, message_id, bot_id)
+VALUES ($1, $2, $3, $4, $5)
+ON CONFLICT DO NOTHING;
+"""
+
+SELECT_INCIDENT_MESSAGES = """
+SELECT chat_id, topic_id, message_id, bot_id
+FROM public.incident_messages
+WHERE incident_id = $1
+ORDER BY created_at;
+"""
+
+
+SELECT_ESCALATION_CANDIDATES = """
+SELECT id, severity, escalation_level, escalate_from
+FROM public.incidents
+WHERE status = 'open' AND NOT suppressed AND parent_id IS NULL;
+"""
+
+# Условие на уровень делает шаг идемпотентным: сработает ровно один раз,
+# даже если таймер выстрелит дважды (например, при смене лидера)
+MARK_ESCALATED = """
+UPDATE public.incidents
+SET escalation_level = $2,
+    updated_at = NOW()
+WHERE id = $1 AND status = 'open' AND escalation_level < $2
+RETURNING *;
+"""
+
+RESET_ESCALATION = """
+UPDATE public.incidents
+SET escalation_level = 0,
+    escalate_from = NOW(),
+    updated_at = NOW()
+WHERE id = $1
+RETURNING *;
+"""
+
+INSERT_MAINTENANCE_WINDOW = """
+INSERT INTO public.maintenance_windows (
+    node_pattern, starts_at, ends_at, comment,
+    created_by_username, created_by_user_id, chat_id, topic_id
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+RETURNING *;
+"""
+
+# Окна, которые ещё действуют или ждут итогового сообщения
+SELECT_MAINTENANCE_WINDOWS = """
+SELECT *
+FROM public.maintenance_windows
+WHERE ends_at > NOW() OR NOT summary_sent
+ORDER BY starts_at;
+"""
+
+DELETE_MAINTENANCE_WINDOW = """
+DELETE FROM public.maintenance_windows
+WHERE id = $1
+RETURNING *;
+"""
+
+# Итог отправляет ровно одна реплика — та, что первой сняла флаг
+CLAIM_MAINTENANCE_SUMMARY = """
+UPDATE public.maintenance_windows
+SET summary_sent = TRUE
+WHERE id = $1 AND NOT summary_sent AND ends_at <= NOW()
+RETURNING *;
+"""
+
+SELECT_MAINTENANCE_SUMMARY = """
+SELECT node, trigger, severity, COUNT(*) AS count
+FROM public.incidents
+WHERE maintenance_id = $1
+GROUP BY node, trigger, severity
+ORDER BY count DESC, node, trigger;
+"""
+
+# Родитель принимает дочерние алерты, только пока он активен
+ADD_CHILD_INCIDENT = """
+UPDATE public.incidents
+SET child_count = child_count + 1,
+    updated_at = NOW()
+WHERE id = $1 AND status IN ('open', 'in_progress')
+RETURNING *;
+"""
+
+SELECT_RECENT_PARENTS = """
+SELECT id, node, severity, trigger, created_at
+FROM public.incidents
+WHERE parent_id IS NULL
+  AND NOT suppressed
+  AND message_id IS NOT NULL
+  AND status IN ('open', 'in_progress')
+  AND created_at > NOW() - make_interval(secs => $1)
+ORDER BY created_at;
+"""
+
+# Закрытие/отклонение родителя одним запросом закрывает все его активные дочерние
+CLOSE_CHILD_INCIDENTS = """
+UPDATE public.incidents
+SET status = $2,
+    closed_by_username = $3,
+    closed_by_user_id = $4,
+    closed_at = NOW(),
+    comment = $5,
+    updated_at = NOW()
+WHERE parent_id = $1 AND status IN ('open', 'in_progress')
+RETURNING id;
+"""
+
+SELECT_MESSAGES_FOR_INCIDENTS = """
+SELECT incident_id, chat_id, topic_id, message_id, bot_id
+FROM public.incident_messages
+WHERE incident_id = ANY($1::int[])
+ORDER BY incident_id, created_at;
+"""
+
+# Дешёвая «версия» таблицы для ETag: оба агрегата читаются из индексов
+SELECT_INCIDENTS_VERSION = """
+SELECT (SELECT MAX(updated_at) FROM public.incidents) AS updated_at,
+       (SELECT MAX(id) FROM public.incidents) AS max_id;
+"""
+
+SELECT_INCIDENT_STATS = """
+SELECT
+    COUNT(*) FILTER (WHERE NOT suppressed) AS total,
+    COUNT(*) FILTER (WHERE status = 'open' AND NOT suppressed) AS open,
+    COUNT(*) FILTER (WHERE status = 'in_progress' AND NOT suppressed) AS in_progress,
+    COUNT(*) FILTER (WHERE status = 'closed' AND NOT suppressed) AS closed,
+    COUNT(*) FILTER (WHERE status = 'rejected' AND NOT suppressed) AS rejected,
+    COUNT(*) FILTER (WHERE suppressed) AS suppressed,
+    COUNT(*) FILTER (WHERE flapping) AS flapping,
+    COUNT(*) FILTER (WHERE parent_id IS NOT NULL) AS correlated
+FROM public.incidents;
+"""
+
+SELECT_ACTIVE_BY_SEVERITY = """
+SELECT severity, COUNT(*) AS count
+FROM public.incidents
+WHERE status IN ('open', 'in_progress') AND NOT suppressed AND parent_id IS NULL
+GROUP BY severity
+ORDER BY count DESC;
+"""
+
+# Задание и NOTIFY в одной транзакции: уведомление уйдёт только после коммита
+INSERT_OUTBOX = """
+WITH job AS (
+    INSERT INTO public.outbox (kind, incident_id, payload)
+    VALUES ($1, $2, $3::jsonb)
+    RETURNING id
+)
+SELECT id, pg_notify('outbox', id::text) FROM job;
+"""
+
+# Забираем пачку заданий в аренду: SKIP LOCKED — параллельные обработчики
+# не мешают друг другу, available_at — время, после которого задание
+# (если обработчик упал) снова станет доступным
+CLAIM_OUTBOX = """
+WITH batch AS (
+    SELECT id
+    FROM public.outbox
+    WHERE available_at <= NOW()
+    ORDER BY id
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE public.outbox o
+SET attempts = o.attempts + 1,
+    available_at = NOW() + make_interval(secs => $2)
+FROM batch
+WHERE o.id = batch.id
+RETURNING o.*;
+"""
+
+DELETE_OUTBOX = """
+DELETE FROM public.outbox WHERE id = $1;
+"""
+
+FAIL_OUTBOX = """
+UPDATE public.outbox
+SET last_error = $2,
+    available_at = NOW() + make_interval(secs => $3)
+WHERE id = $1;
+"""
+
+SELECT_RECENT_PARENT = """
+SELECT *
+FROM public.incidents
+WHERE lower(node) = ANY($1::text[])
+  AND created_at > NOW() - make_interval(secs => $2)
+  AND parent_id IS NULL
+  AND NOT suppressed
+  AND status IN ('open', 'in_progress')
+ORDER BY id DESC
+LIMIT 1;
+"""
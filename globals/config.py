@@ -7,9 +7,41 @@ load_dotenv()
 
 # --- Настройки базы данных / API ---
 DB_DSN = os.getenv("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+
+# --- Допуск алертов на /alert: при шторме часть пула остаётся командам бота ---
+# Соединения пула, недоступные приёму алертов
+DB_POOL_RESERVED = int(os.getenv("DB_POOL_RESERVED", "5"))
+# Одновременно обрабатываемых алертов (каждый держит не больше одного соединения)
+ALERT_MAX_CONCURRENCY = int(os.getenv("ALERT_MAX_CONCURRENCY", str(max(1, DB_POOL_MAX_SIZE - DB_POOL_RESERVED))))
+# Алертов в очереди ожидания сверх лимита и сколько им ждать, сек
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "100"))
+ALERT_QUEUE_TIMEOUT = float(os.getenv("ALERT_QUEUE_TIMEOUT", "10"))
+# Retry-After в ответе 429, сек
+ALERT_RETRY_AFTER = int(os.getenv("ALERT_RETRY_AFTER", "5"))
+
+# --- Режим запуска: all — бот и API в одном процессе, api — только приём алертов
+# (можно несколько воркеров/реплик), bot — только бот и обработка outbox ---
+RUN_MODE = os.getenv("RUN_MODE", "all")
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "7000"))
+# Служебный HTTP процесса бота в режиме bot: /debug/metrics и /debug/profile; 0 — выключен
+METRICS_PORT = int(os.getenv("METRICS_PORT", "7100"))
+
+# --- Outbox: задания от API‑процессов процессу бота ---
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "10"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
 
 # --- Telegram настройки ---
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Дополнительные боты для исходящих сообщений (через запятую); BOT_TOKEN — всегда первый
+BOT_TOKENS = list(dict.fromkeys(
+    [BOT_TOKEN] + [t.strip() for t in os.getenv("BOT_TOKENS", "").split(",") if t.strip()]
+))
 GROUP_ID = os.getenv("GROUP_ID")
 TOPIC_ID = os.getenv("TOPIC_ID")
 
@@ -28,6 +60,107 @@ LOG_ROTATE_BY_SIZE = True     # Ротация по размеру
 LOG_ROTATE_BY_TIME = True     # Ротация по датам (папки logs/YYYY-MM-DD)
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# --- Маршрутизация алертов по чатам и темам ---
+# JSON‑файл с маршрутами (пример: alert_routes.example.json); нет файла — всё в GROUP_ID/TOPIC_ID
+ALERT_ROUTES_FILE = os.getenv("ALERT_ROUTES_FILE", "alert_routes.json")
+ALERT_ROUTES_RELOAD_SECONDS = float(os.getenv("ALERT_ROUTES_RELOAD_SECONDS", "5"))
+
+# --- Лимиты Telegram для массовых рассылок и правок ---
+# Не больше N сообщений в минуту в один чат и N в секунду суммарно
+TELEGRAM_CHAT_RATE_PER_MINUTE = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MINUTE", "20"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "5"))
+TELEGRAM_GLOBAL_RATE_PER_SECOND = float(os.getenv("TELEGRAM_GLOBAL_RATE_PER_SECOND", "25"))
+
+# --- Редактирование сообщений Telegram ---
+# Окно склейки частых правок одного сообщения инцидента, сек
+EDIT_DEBOUNCE_SECONDS = float(os.getenv("EDIT_DEBOUNCE_SECONDS", "0.5"))
+
+# --- Защита от повторных нажатий кнопок инцидентов ---
+# Сколько держится метка «в процессе», если диалог не завершён, сек
+INFLIGHT_TTL_SECONDS = float(os.getenv("INFLIGHT_TTL_SECONDS", "300"))
+INFLIGHT_MAX_KEYS = int(os.getenv("INFLIGHT_MAX_KEYS", "4096"))
+
+# --- Эскалация неподтверждённых инцидентов ---
+# JSON в .env: шаги по критичности, "after" — минуты от создания (или переоткрытия)
+# ESCALATION_RULES={"disaster": [{"after": 5, "mention": "@oncall"}], "*": [{"after": 10}, {"after": 30, "mention": "@oncall"}]}
+ESCALATION_RESYNC_SECONDS = float(os.getenv("ESCALATION_RESYNC_SECONDS", "60"))
+
+# --- Окна обслуживания (/maintenance) ---
+# Страховочное перечитывание окон из БД (изменения приходят по NOTIFY), сек
+MAINTENANCE_RELOAD_SECONDS = float(os.getenv("MAINTENANCE_RELOAD_SECONDS", "60"))
+
+# --- Детектор флаппинга триггеров ---
+# Длительность одного отсчёта истории (21 отсчёт), пороги в % (гистерезис, как в Nagios)
+FLAP_SAMPLE_SECONDS = float(os.getenv("FLAP_SAMPLE_SECONDS", "60"))
+FLAP_HIGH_THRESHOLD = float(os.getenv("FLAP_HIGH_THRESHOLD", "30"))
+FLAP_LOW_THRESHOLD = float(os.getenv("FLAP_LOW_THRESHOLD", "10"))
+# Пока триггер флаппит — не больше одного сообщения за интервал, сек
+FLAP_NOTIFY_INTERVAL = float(os.getenv("FLAP_NOTIFY_INTERVAL", "900"))
+FLAP_TTL_SECONDS = float(os.getenv("FLAP_TTL_SECONDS", "21600"))
+FLAP_MAX_KEYS = int(os.getenv("FLAP_MAX_KEYS", "20000"))
+
+# --- Склейка каскадов алертов в родительский инцидент ---
+# Сколько секунд после отправки инцидента алерты с того же узла (и зависимых узлов)
+# становятся его дочерними; 0 — склейка отключена
+CORRELATION_WINDOW_SECONDS = float(os.getenv("CORRELATION_WINDOW_SECONDS", "300"))
+# JSON‑карта зависимостей {"hv-01": ["vm-*"]} (пример: dependencies.example.json)
+DEPENDENCY_MAP_FILE = os.getenv("DEPENDENCY_MAP_FILE", "dependencies.json")
+# Задержка перерисовки счётчика дочерних алертов в сообщении родителя, сек
+CORRELATION_REFRESH_DELAY = float(os.getenv("CORRELATION_REFRESH_DELAY", "2"))
+
+# --- SSE‑поток изменений инцидентов (/incidents/stream) ---
+# Очередь на подписчика: переполнилась — медленный клиент отключается
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "256"))
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "100"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# --- vCloud Director (/cloudinfo, /cloudvapp) ---
+VCD_CONFIG = {
+    "base_url": os.getenv("base_url"),
+    "tenant": os.getenv("tenant"),
+    "refresh_token": os.getenv("refresh_token"),
+    "org_urn": os.getenv("org_urn"),
+    "vdc_id": os.getenv("vdc_id"),
+    "storage_gold_urn": os.getenv("storage_gold_urn"),
+    "storage_bronze_urn": os.getenv("storage_bronze_urn"),
+}
+# Проверять ли сертификат VCD (у облака самоподписанный — по умолчанию нет)
+VCD_VERIFY_SSL = os.getenv("VCD_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
+# Таймауты запроса к VCD: установка соединения, пауза в чтении ответа
+# и общий срок вызова вместе с повторами, сек
+VCD_CONNECT_TIMEOUT = float(os.getenv("VCD_CONNECT_TIMEOUT", "10"))
+VCD_READ_TIMEOUT = float(os.getenv("VCD_READ_TIMEOUT", "20"))
+VCD_TIMEOUT = float(os.getenv("VCD_TIMEOUT", "30"))
+# Повторы GET при сетевой ошибке, таймауте, 429 и 5xx; пауза — случайная до base·2^n, сек
+VCD_RETRIES = int(os.getenv("VCD_RETRIES", "2"))
+VCD_RETRY_BACKOFF = float(os.getenv("VCD_RETRY_BACKOFF", "0.5"))
+# Автомат: после N сбоев подряд запросы к группе эндпоинтов отклоняются сразу на M секунд
+VCD_BREAKER_FAILURES = int(os.getenv("VCD_BREAKER_FAILURES", "5"))
+VCD_BREAKER_RESET_SECONDS = float(os.getenv("VCD_BREAKER_RESET_SECONDS", "30"))
+# JSON в .env: переопределения по группам эндпоинтов (oauth, cloudapi, query, api)
+# VCD_ENDPOINT_POLICY={"query": {"deadline": 90, "read_timeout": 40}, "oauth": {"retries": 0}}
+# Соединений keep-alive в пуле HTTP‑сессии
+VCD_MAX_CONNECTIONS = int(os.getenv("VCD_MAX_CONNECTIONS", "10"))
+# Bearer‑токен обновляется в фоне, когда до истечения осталось меньше N секунд
+VCD_TOKEN_REFRESH_AHEAD = float(os.getenv("VCD_TOKEN_REFRESH_AHEAD", "300"))
+# Одновременных запросов страниц постраничных списков VCD
+VCD_PAGE_CONCURRENCY = int(os.getenv("VCD_PAGE_CONCURRENCY", "4"))
+# Сколько секунд держать в памяти лимиты и занятое место политик хранения
+VCD_STORAGE_CACHE_TTL = float(os.getenv("VCD_STORAGE_CACHE_TTL", "60"))
+# Сколько ждать каждый источник данных отчёта /cloudinfo, сек
+VCD_REPORT_SOURCE_TIMEOUT = float(os.getenv("VCD_REPORT_SOURCE_TIMEOUT", "15"))
+# Список vApp: старше N секунд — отдаётся из кэша и обновляется в фоне
+VCD_INVENTORY_FRESH_SECONDS = float(os.getenv("VCD_INVENTORY_FRESH_SECONDS", "300"))
+# Плановое фоновое обновление списка vApp раз в N секунд (0 — только по запросу)
+VCD_INVENTORY_REFRESH_SECONDS = float(os.getenv("VCD_INVENTORY_REFRESH_SECONDS", "900"))
+# Сколько секунд держать разобранный состав vApp (ВМ) для PC/Mobile/CSV
+VCD_VAPP_DETAILS_TTL = float(os.getenv("VCD_VAPP_DETAILS_TTL", "120"))
+
+# --- Профилирование (/profile и /debug/profile) ---
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "120"))
+# Токен для служебных HTTP‑эндпоинтов /debug/*; пустой — эндпоинты отключены
+DEBUG_API_TOKEN = os.getenv("DEBUG_API_TOKEN", "")
+
 # --- Проверки обязательных переменных ---
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не задан в .env файле")
@@ -60,6 +193,41 @@ def load_servers():
         return []
 
 
+# --- Загрузка правил эскалации из JSON в .env ---
+def load_escalation_rules():
+    raw = os.getenv("ESCALATION_RULES", "{}")
+    try:
+        data = json.loads(raw)
+        rules = {}
+        for severity, steps in data.items():
+            parsed = []
+            for step in steps:
+                after = float(step["after"])
+                if after <= 0:
+                    continue
+                parsed.append({
+                    "after": after,
+                    "mention": step.get("mention", ""),
+                    "text": step.get("text", ""),
+                })
+            rules[severity.strip().lower()] = sorted(parsed, key=lambda s: s["after"])
+        return rules
+    except Exception as e:
+        print(f"[CONFIG] Ошибка чтения ESCALATION_RULES: {e}")
+        return {}
+
+
+# --- Загрузка политик эндпоинтов VCD из JSON в .env ---
+def load_vcd_endpoint_policy():
+    raw = os.getenv("VCD_ENDPOINT_POLICY", "{}")
+    try:
+        data = json.loads(raw)
+        return {group.strip().lower(): dict(values) for group, values in data.items()}
+    except Exception as e:
+        print(f"[CONFIG] Ошибка чтения VCD_ENDPOINT_POLICY: {e}")
+        return {}
+
+
 def get_today_log_dir():
     """Возвращает путь к сегодняшней директории логов (logs/YYYY-MM-DD)."""
     return os.path.join("logs", datetime.now().strftime("%Y-%m-%d"))
@@ -68,6 +236,12 @@ def get_today_log_dir():
 # --- Загружаем VPN-серверы ---
 WG_SERVERS = load_servers()
 
+# --- Загружаем правила эскалации ---
+ESCALATION_RULES = load_escalation_rules()
+
+# --- Загружаем политики эндпоинтов VCD ---
+VCD_ENDPOINT_POLICY = load_vcd_endpoint_policy()
+
 # Отладочная информация
 # print("[CONFIG DEBUG] WG_SERVERS raw =", os.getenv("WG_SERVERS"))
 # print("[CONFIG DEBUG] Parsed =", WG_SERVERS)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import html
+import re
+import time
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from database.db import Database
+from logger.logger import logger
+from utils.escalation import escalations
+from utils.notifier import refresh_many
+
+router = Router()
+
+USAGE = (
+    "📦 Массовое закрытие инцидентов.\n\n"
+    "Использование:\n"
+    "/bulk close|reject &lt;фильтры&gt; &lt;комментарий&gt;\n\n"
+    "Фильтры (хотя бы один):\n"
+    "node=db-* — имя узла или префикс с *\n"
+    "trigger=disk — подстрока триггера\n"
+    "severity=high,disaster — уровни критичности\n"
+    "older=2h — старше (m, h, d)\n\n"
+    "Пример: /bulk close node=hv-01* older=30m Питание восстановлено"
+)
+
+ACTIONS = {"close": "closed", "reject": "rejected"}
+FILTER_KEYS = {"node", "trigger", "severity", "older"}
+PROGRESS_INTERVAL = 3  # не чаще одной правки прогресса за N секунд
+
+_AGE = re.compile(r"^(\d+)([mhd])$")
+_AGE_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_age(value: str) -> int:
+    match = _AGE.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"Неверный возраст '{value}': используйте 30m, 2h или 1d")
+    return int(match.group(1)) * _AGE_SECONDS[match.group(2)]
+
+
+def parse_bulk_args(tokens: list[str]) -> tuple[dict, str]:
+    """Ведущие key=value — фильтры, всё остальное — комментарий."""
+    filters = {}
+    rest = list(tokens)
+    while rest and "=" in rest[0] and rest[0].split("=", 1)[0].lower() in FILTER_KEYS:
+        key, value = rest.pop(0).split("=", 1)
+        key = key.lower()
+        if not value:
+            raise ValueError(f"Пустое значение фильтра {key}")
+        if key == "severity":
+            filters["severities"] = [s for s in value.split(",") if s]
+        elif key == "older":
+            filters["older_than"] = parse_age(value)
+        else:
+            filters[key] = value
+    return filters, " ".join(rest).strip()
+
+
+@router.message(Command("bulk"))
+async def cmd_bulk(message: Message, db: Database):
+    user = message.from_user
+    username = f"@{user.username}" if user.username else user.full_name
+    tokens = message.text.split()[1:]
+
+    logger.info(f"/bulk вызвал [{user.id}|{username}] → args={tokens}")
+
+    if not tokens or tokens[0].lower() not in ACTIONS:
+        await message.answer(USAGE)
+        return
+    action = tokens[0].lower()
+
+    try:
+        filters, comment = parse_bulk_args(tokens[1:])
+    except ValueError as e:
+        await message.answer(f"❌ {html.escape(str(e))}\n\n{USAGE}")
+        return
+
+    if not filters or not comment:
+        await message.answer(USAGE)
+        return
+
+    incidents = await db.bulk_close_incidents(
+        status=ACTIONS[action],
+        closed_by_username=username,
+        closed_by_user_id=user.id,
+        comment=comment,
+        **filters
+    )
+    if incidents is None:
+        await message.answer("⚠️ Произошла ошибка при обновлении инцидентов. Попробуйте позже.")
+        return
+    if not incidents:
+        await message.answer("ℹ️ Под фильтры не попал ни один активный инцидент.")
+        return
+
+    for incident in incidents:
+        escalations.disarm(incident['id'])
+
+    verb = "Закрыто" if action == "close" else "Отклонено"
+    status_message = await message.answer(f"✅ {verb} инцидентов: {len(incidents)}\n⏳ Обновляю сообщения…")
+    last_report = time.monotonic()
+
+    async def progress(done: int, total: int):
+        nonlocal last_report
+        now = time.monotonic()
+        if done < total and now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        try:
+            await status_message.edit_text(
+                f"✅ {verb} инцидентов: {len(incidents)}\n⏳ Обновлено сообщений: {done}/{total}"
+            )
+        except Exception as e:
+            logger.debug(f"Не удалось обновить прогресс /bulk: {e}")
+
+    edited, failed = await refresh_many(db, incidents, bot=message.bot, progress=progress)
+
+    summary = f"✅ {verb} инцидентов: {len(incidents)}\n📝 Обновлено сообщений: {edited}"
+    if failed:
+        summary += f"\n⚠️ Не удалось обновить: {failed}"
+    await status_message.edit_text(summary)
+    logger.info(f"/bulk {action}: {len(incidents)} инцидентов, сообщений {edited}, ошибок {failed}")
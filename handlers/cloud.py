@@ -1,114 +1,84 @@
-import os
+import asyncio
 import traceback
-import requests
 import xml.etree.ElementTree as ET
-from dotenv import load_dotenv
 from typing import Dict, Optional
 
 from aiogram import Router, types, F
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 
+from globals.config import VCD_CONFIG, VCD_REPORT_SOURCE_TIMEOUT, VCD_STORAGE_CACHE_TTL
 from logger.logger import logger
-
-load_dotenv()
+from utils.async_cache import AsyncTTLCache
+from utils.vcd_client import vcd, VCD_NS
+from utils.vcd_storage import storage_policy, storage_policy_stale
 
 router = Router()
 
-CONFIG = {
-    'base_url': os.getenv('base_url'),
-    'tenant': os.getenv('tenant'),
-    'refresh_token': os.getenv('refresh_token'),
-    'org_urn': os.getenv('org_urn'),
-    'vdc_id': os.getenv('vdc_id'),
-    'storage_gold_urn': os.getenv('storage_gold_urn'),
-    'storage_bronze_urn': os.getenv('storage_bronze_urn'),
-}
+CONFIG = VCD_CONFIG
+
+
+# Ресурсы VDC: пока VCD (или его OAuth) недоступен, отчёт показывает прежние цифры
+_vdc_resources = AsyncTTLCache(VCD_STORAGE_CACHE_TTL, serve_stale=True)
 
 
 # === BASE HELPERS ===
-def get_bearer_token() -> Optional[str]:
-    """Получает временный Bearer‑токен."""
-    url = f"{CONFIG['base_url']}/oauth/tenant/{CONFIG['tenant']}/token"
-    headers = {"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"}
-    data = {"grant_type": "refresh_token", "refresh_token": CONFIG["refresh_token"]}
+async def make_api_call(path: str, params: dict | None = None) -> Optional[dict]:
     try:
-        response = requests.post(url, headers=headers, data=data)
-        response.raise_for_status()
-        token = response.json().get("access_token")
-        if not token:
-            raise ValueError(f"access_token отсутствует: {response.text}")
-        logger.info("Bearer токен успешно получен")
-        return token
+        return await vcd.get_json(path, params=params)
     except Exception as e:
-        logger.error(f"Ошибка при получении Bearer токена: {e}\n{traceback.format_exc()}")
+        logger.warning(f"Ошибка при GET {path}: {e}")
         return None
 
 
-def make_api_call(url: str, headers: dict) -> Optional[dict]:
+async def get_storage_usage(storage_policy_urn: str, policy_name: str) -> Optional[Dict]:
     try:
-        r = requests.get(url, headers=headers)
-        r.raise_for_status()
-        return r.json()
+        policy = await storage_policy(storage_policy_urn)
     except Exception as e:
-        logger.warning(f"Ошибка при GET {url}: {e}\n{traceback.format_exc()}")
+        logger.warning(f"Ошибка при подсчёте занятого места {policy_name}: {e}")
         return None
-
-
-def get_storage_usage(storage_policy_urn: str, policy_name: str, token: str) -> Optional[Dict]:
-    total_used = 0
-    page = 1
-    while True:
-        url = (f"{CONFIG['base_url']}/cloudapi/1.0.0/orgVdcStoragePolicies/"
-               f"{storage_policy_urn}/consumers?page={page}&pageSize=25")
-        headers = {"accept": "application/json;version=39.1", "Authorization": f"Bearer {token}"}
-        data = make_api_call(url, headers)
-        if not data or 'values' not in data:
-            break
-        total_used += sum(x['storageConsumedMb'] for x in data['values'])
-        if page >= data.get('pageCount', 1):
-            break
-        page += 1
-    return {'policy_name': policy_name, 'total_used': total_used}
-
-
-def get_vdc_resources(token: str) -> Optional[dict]:
+    return {'policy_name': policy_name, 'total_used': policy['used_mb']}
+
+
+async def _load_vdc_resources() -> dict:
+    content = await vcd.get_xml(f"/api/vdc/{CONFIG['vdc_id']}",
+                                accept="application/*;version=39.1")
+    root = ET.fromstring(content)
+    ns = VCD_NS
+    cpu_elem = root.find('.//v:Cpu', ns)
+    mem_elem = root.find('.//v:Memory', ns)
+    cpu_alloc = int(cpu_elem.find('v:Allocated', ns).text)
+    cpu_used = int(cpu_elem.find('v:Used', ns).text)
+    mem_alloc = int(mem_elem.find('v:Allocated', ns).text)
+    mem_used = int(mem_elem.find('v:Used', ns).text)
+    return {
+        'cpu_allocated': cpu_alloc,
+        'cpu_used': cpu_used,
+        'memory_allocated': mem_alloc,
+        'memory_used': mem_used
+    }
+
+
+async def get_vdc_resources() -> Optional[dict]:
     try:
-        url = f"{CONFIG['base_url']}/api/vdc/{CONFIG['vdc_id']}"
-        headers = {"accept": "application/*;version=39.1", "Authorization": f"Bearer {token}"}
-        r = requests.get(url, headers=headers)
-        r.raise_for_status()
-        root = ET.fromstring(r.content)
-        ns = {'vcloud': 'http://www.vmware.com/vcloud/v1.5'}
-        cpu_elem = root.find('.//vcloud:Cpu', ns)
-        mem_elem = root.find('.//vcloud:Memory', ns)
-        cpu_alloc = int(cpu_elem.find('vcloud:Allocated', ns).text)
-        cpu_used = int(cpu_elem.find('vcloud:Used', ns).text)
-        mem_alloc = int(mem_elem.find('vcloud:Allocated', ns).text)
-        mem_used = int(mem_elem.find('vcloud:Used', ns).text)
-        return {
-            'cpu_allocated': cpu_alloc,
-            'cpu_used': cpu_used,
-            'memory_allocated': mem_alloc,
-            'memory_used': mem_used
-        }
+        return await _vdc_resources.get(CONFIG['vdc_id'], _load_vdc_resources)
     except Exception as e:
         logger.error(f"Ошибка при получении VDC: {e}\n{traceback.format_exc()}")
         return None
 
 
-def get_storage_limits(token: str) -> Optional[dict]:
-    headers = {"accept": "application/json;version=39.1", "Authorization": f"Bearer {token}"}
-    try:
-        gold = make_api_call(f"{CONFIG['base_url']}/cloudapi/1.0.0/orgVdcStoragePolicies/{CONFIG['storage_gold_urn']}", headers)
-        bronze = make_api_call(f"{CONFIG['base_url']}/cloudapi/1.0.0/orgVdcStoragePolicies/{CONFIG['storage_bronze_urn']}", headers)
-        return {
-            'gold_limit': gold.get('storageLimitMb', 0) if gold else 0,
-            'bronze_limit': bronze.get('storageLimitMb', 0) if bronze else 0
-        }
-    except Exception as e:
-        logger.error(f"Ошибка при лимитах хранилища: {e}\n{traceback.format_exc()}")
-        return None
+async def get_storage_limits() -> Optional[dict]:
+    """Лимиты политик; None у политики, которую не удалось получить."""
+    keys = {'gold_limit': CONFIG['storage_gold_urn'], 'bronze_limit': CONFIG['storage_bronze_urn']}
+    results = await asyncio.gather(*(storage_policy(urn) for urn in keys.values()), return_exceptions=True)
+    limits = {}
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка при лимите хранилища {key}: {result}")
+            limits[key] = None
+        else:
+            limits[key] = result['limit_mb']
+    return limits if any(v is not None for v in limits.values()) else None
 
 
 # === FORMAT ===
@@ -154,63 +124,101 @@ async def cmd_cloudinfo(message: types.Message):
     await message.answer("Выберите интересующий ресурс ☁️", reply_markup=main_menu())
 
 
-async def compose_report(token: str, section: str) -> str:
-    limits = get_storage_limits(token)
-    bronze = get_storage_usage(CONFIG['storage_bronze_urn'], "Bronze", token)
-    gold = get_storage_usage(CONFIG['storage_gold_urn'], "Gold", token)
-    vdc = get_vdc_resources(token)
+async def _gather_sources(sources: dict) -> dict:
+    """
+    Запускает источники отчёта одновременно, каждый со своим таймаутом.
+    Упавший или не успевший источник даёт None — отчёт рисуется без него.
+    """
+    async def run(name, coro):
+        try:
+            return await asyncio.wait_for(coro, VCD_REPORT_SOURCE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"/cloudinfo: источник {name} недоступен: {type(e).__name__} {e}")
+            return None
 
-    if not all([limits, bronze, gold, vdc]):
-        return "⚠️ Ошибка при получении данных."
+    results = await asyncio.gather(*(run(name, coro) for name, coro in sources.items()))
+    return dict(zip(sources, results))
 
-    def percent(used, total): return (used / total * 100) if total else 0
 
-    # Расычитанные значения
-    bronze_rem = limits['bronze_limit'] - bronze['total_used']
-    gold_rem = limits['gold_limit'] - gold['total_used']
-    cpu_rem = vdc['cpu_allocated'] - vdc['cpu_used']
-    mem_rem = vdc['memory_allocated'] - vdc['memory_used']
+async def compose_report(section: str) -> str:
+    # запрашиваем только то, что нужно разделу
+    sources = {}
+    if section in ("disk", "all"):
+        sources["limits"] = get_storage_limits()
+        sources["bronze"] = get_storage_usage(CONFIG['storage_bronze_urn'], "Bronze")
+        sources["gold"] = get_storage_usage(CONFIG['storage_gold_urn'], "Gold")
+    if section in ("ram", "cpu", "all"):
+        sources["vdc"] = get_vdc_resources()
+    data = await _gather_sources(sources)
+
+    if not any(data.values()):
+        return "⚠️ Ошибка при получении данных."
+
+    limits, bronze, gold, vdc = (data.get(key) for key in ("limits", "bronze", "gold", "vdc"))
+    missing = []
+    # VCD не ответил, но есть прежние цифры из кэша
+    cached = []
 
-    cpu_used_ghz, cpu_used_cores = fmt_cpu(vdc['cpu_used'])
-    cpu_alloc_ghz, cpu_alloc_cores = fmt_cpu(vdc['cpu_allocated'])
-    cpu_rem_ghz, cpu_rem_cores = fmt_cpu(cpu_rem)
+    def percent(used, total): return (used / total * 100) if total else 0
 
     text_lines = []
 
     if section in ("disk", "all"):
-        for name, usage, limit, rem in [
-            ("🟤 BRONZE STORAGE", bronze['total_used'], limits['bronze_limit'], bronze_rem),
-            ("🟡 GOLD STORAGE", gold['total_used'], limits['gold_limit'], gold_rem),
+        for name, usage, limit_key, urn_key in [
+            ("🟤 BRONZE STORAGE", bronze, 'bronze_limit', 'storage_bronze_urn'),
+            ("🟡 GOLD STORAGE", gold, 'gold_limit', 'storage_gold_urn'),
         ]:
-            perc = percent(usage, limit)
+            if not usage or not limits or limits[limit_key] is None:
+                missing.append(name.split()[1].capitalize())
+                text_lines += [f"{name}:", "   ⚠️ Нет данных", ""]
+                continue
+            if storage_policy_stale(CONFIG[urn_key]):
+                cached.append(name.split()[1].capitalize())
+            used, limit = usage['total_used'], limits[limit_key]
+            perc = percent(used, limit)
             text_lines += [
                 f"{name}:",
-                f"   Использовано: {fmt_storage(usage)} из {fmt_storage(limit)}",
+                f"   Использовано: {fmt_storage(used)} из {fmt_storage(limit)}",
                 f"   Заполнение: {perc:.1f}%",
-                f"   Остаток: {fmt_storage(rem)}",
+                f"   Остаток: {fmt_storage(limit - used)}",
                 ""
             ]
 
-    if section in ("ram", "all"):
+    if section in ("ram", "cpu", "all") and not vdc:
+        missing.append("VDC")
+        text_lines += ["🧠 <b>RAM</b> / ⚙️ <b>CPU</b>", "   ⚠️ Нет данных", ""]
+    elif section in ("ram", "cpu", "all") and _vdc_resources.stale(CONFIG['vdc_id']):
+        cached.append("VDC")
+
+    if section in ("ram", "all") and vdc:
+        mem_rem = vdc['memory_allocated'] - vdc['memory_used']
         perc = percent(vdc['memory_used'], vdc['memory_allocated'])
         text_lines += [
-            "🧠 <b>RAM</b>",
+            "🧠 <b>RAM</b>",
             f"   Использовано: {fmt_mem(vdc['memory_used'])} из {fmt_mem(vdc['memory_allocated'])}",
             f"   Заполнение: {perc:.1f}%",
             f"   Остаток: {fmt_mem(mem_rem)}",
             ""
         ]
 
-    if section in ("cpu", "all"):
+    if section in ("cpu", "all") and vdc:
+        cpu_used_ghz, cpu_used_cores = fmt_cpu(vdc['cpu_used'])
+        cpu_alloc_ghz, cpu_alloc_cores = fmt_cpu(vdc['cpu_allocated'])
+        cpu_rem_ghz, cpu_rem_cores = fmt_cpu(vdc['cpu_allocated'] - vdc['cpu_used'])
         perc = percent(vdc['cpu_used'], vdc['cpu_allocated'])
         text_lines += [
-            "⚙️ <b>CPU</b>",
-            f"   Использовано: {cpu_used_ghz:.0f} GHz ({cpu_used_cores:.0f} ядер) из {cpu_alloc_ghz:.0f} GHz ({cpu_alloc_cores:.0f} ядер)",
+            "⚙️ <b>CPU</b>",
+            f"   Использовано: {cpu_used_ghz:.0f} GHz ({cpu_used_cores:.0f} ядер) из {cpu_alloc_ghz:.0f} GHz ({cpu_alloc_cores:.0f} ядер)",
             f"   Заполнение: {perc:.1f}%",
-            f"   Остаток: {cpu_rem_ghz:.0f} GHz ({cpu_rem_cores:.0f} ядер)",
+            f"   Остаток: {cpu_rem_ghz:.0f} GHz ({cpu_rem_cores:.0f} ядер)",
             ""
         ]
 
+    if cached:
+        text_lines.insert(0, f"🕒 <i>VCD не ответил, из кэша: {', '.join(cached)}</i>\n")
+    if missing:
+        # частичный отчёт: показываем, что загрузилось, и честно помечаем
+        text_lines.insert(0, f"⚠️ <i>Неполные данные, не загружено: {', '.join(missing)}</i>\n")
     return "\n".join(text_lines)
 
 
@@ -228,16 +236,13 @@ async def callback_cloud(query: types.CallbackQuery):
         # Повторим предыдущий (из caption? здесь просто перезапрос "все")
         action = "all"
 
-    token = get_bearer_token()
-    if not token:
-        await query.message.edit_text("🚫 Не удалось авторизоваться в облаке.", reply_markup=main_menu())
-        return
-
+    # токен не проверяем: при недоступном VCD/OAuth compose_report покажет
+    # цифры из кэша и пометит, чего не хватает
     try:
         # Уберём старое меню
         await query.message.delete()
 
-        text = await compose_report(token, action)
+        text = await compose_report(action)
         await query.message.answer(text, parse_mode="HTML", reply_markup=back_menu())
     except Exception as e:
         logger.error(f"Ошибка при cloud_{action}: {e}\n{traceback.format_exc()}")
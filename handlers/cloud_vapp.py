@@ -1,233 +1,356 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os
+import asyncio
+import csv
+import io
 import math
-import requests
 import time
 import xml.etree.ElementTree as ET
-import pandas as pd
-import io
 import textwrap
-from dotenv import load_dotenv
 from aiogram import Router, types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters import Command
+from globals.config import (
+    VCD_CONFIG, VCD_INVENTORY_FRESH_SECONDS, VCD_INVENTORY_REFRESH_SECONDS, VCD_VAPP_DETAILS_TTL,
+    VCD_STORAGE_CACHE_TTL
+)
 from logger.logger import logger
 from datetime import datetime, timedelta
+from utils.vcd_client import vcd, VCD_NS, XML_ACCEPT_40
+from utils.vcd_storage import storage_policies
+from utils.async_cache import AsyncTTLCache, StaleWhileRevalidate
 
 
 # ------------------------------------------------------------------------------
 # ROUTER
 # ------------------------------------------------------------------------------
 router = Router(name=__name__)
-requests.packages.urllib3.disable_warnings()
-load_dotenv()
-
-
-# --- кэш ---
-TOKEN_CACHE = {"token": None, "time": None}
-VAPP_CACHE = {"data": None, "time": None}
-
-TOKEN_TTL = 55 * 60       # 55 минут
-VAPP_TTL = 5 * 60         # 5 минут (через 5 мин обновим список)
 
 
 # ------------------------------------------------------------------------------
 # CONFIGURATION
 # ------------------------------------------------------------------------------
-CONFIG = {
-    "base_url": os.getenv("base_url"),
-    "tenant": os.getenv("tenant"),
-    "refresh_token": os.getenv("refresh_token"),
-    "vdc_id": os.getenv("vdc_id"),
-    "storage_gold_urn": os.getenv("storage_gold_urn"),
-    "storage_bronze_urn": os.getenv("storage_bronze_urn"),
-}
+CONFIG = VCD_CONFIG
 API_VERSION = "40.0.0-alpha"
 
 
 # ------------------------------------------------------------------------------
-# CLOUD UTILS
+# ЗАПИСИ vApp
 # ------------------------------------------------------------------------------
-def get_bearer_token(cfg: dict) -> str:
-    """Получаем или возвращаем из кэша Bearer‑токен"""
-    # если есть токен и он не устарел
-    if TOKEN_CACHE["token"] and TOKEN_CACHE["time"]:
-        elapsed = time.time() - TOKEN_CACHE["time"]
-        if elapsed < TOKEN_TTL:
-            logger.debug("♻️ Используем кэшированный Bearer‑токен")
-            return TOKEN_CACHE["token"]
-
-    # иначе запрашиваем новый
-    url = f"{cfg['base_url']}/oauth/tenant/{cfg['tenant']}/token"
-    headers = {"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"}
-    data = {"grant_type": "refresh_token", "refresh_token": cfg["refresh_token"]}
-    try:
-        r = requests.post(url, headers=headers, data=data, verify=False, timeout=20)
-        r.raise_for_status()
-        token = r.json().get("access_token")
-        if not token:
-            raise RuntimeError("Пустой access_token")
-        TOKEN_CACHE["token"] = token
-        TOKEN_CACHE["time"] = time.time()
-        logger.info("✅ Обновлён Bearer‑токен и сохранён в кэш")
-        return token
-    except Exception as e:
-        logger.exception(f"Ошибка при обновлении токена: {e}")
-        raise
+# Цвет статуса → текст для CSV
+STATUS_TEXT = {"🟢": "POWERED_ON", "🔴": "POWERED_OFF", "🟡": "MIXED", "⚪": "UNKNOWN"}
+
+
+def status_indicator(raw_state: str) -> str:
+    raw_state = raw_state.upper().strip()
+    if "POWERED_ON" in raw_state or raw_state == "ON":
+        return "🟢"
+    if "POWERED_OFF" in raw_state or raw_state == "OFF":
+        return "🔴"
+    if "MIX" in raw_state or "RESOLVED" in raw_state or "PART" in raw_state:
+        return "🟡"
+    return "⚪"
+
+
+class VAppRecord:
+    """Одна vApp из списка: ресурсы, цветной статус и ссылка на детали."""
+
+    __slots__ = ("status", "name", "vcpu", "ram_gb", "disk_gb", "href")
+
+    def __init__(self, status: str, name: str, vcpu: int, ram_gb: float, disk_gb: float, href: str):
+        self.status = status
+        self.name = name
+        self.vcpu = vcpu
+        self.ram_gb = ram_gb
+        self.disk_gb = disk_gb
+        self.href = href
+
+    @property
+    def id(self) -> str:
+        return self.href.split("vapp-")[-1]
+
+    @classmethod
+    def from_query(cls, rec: dict) -> "VAppRecord":
+        """Из атрибутов VAppRecord ответа /api/query."""
+        storage_mb = int(rec.get("totalStorageAllocatedMb",
+                                 int(rec.get("storageKB", 0)) / 1024))
+        return cls(
+            status=status_indicator(rec.get("status", "")),
+            name=rec.get("name", "—"),
+            vcpu=int(rec.get("numberOfCpus", 0)),
+            ram_gb=int(rec.get("memoryAllocationMB", 0)) / 1024,
+            disk_gb=storage_mb / 1024,
+            href=rec.get("href", ""),
+        )
 
 
-def get_vapps(cfg, token, force_update=False) -> pd.DataFrame:
+class VAppInventory:
     """
-    Возвращает список vApp с ресурсами и цветным статусом (для клавиатуры).
+    Список vApp в порядке VCD + индексы по имени и по id.
+
+    Поиск vApp по кнопке — словарь, а не просмотр всего списка.
     """
-    start = time.time()
-    logger.info("🚀 Запрос списка vApp (ресурсы + статусы)")
 
-    if (
-        not force_update
-        and VAPP_CACHE["data"] is not None
-        and VAPP_CACHE["time"]
-        and (time.time() - VAPP_CACHE["time"] < VAPP_TTL)
-    ):
-        logger.info("♻️ Использован кэш")
-        return VAPP_CACHE["data"]
+    def __init__(self, records: list[VAppRecord]):
+        self.records = records
+        self.by_name = {r.name: r for r in records}
+        self.by_id = {r.id: r for r in records}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def find(self, name: str) -> VAppRecord | None:
+        return self.by_name.get(name)
+
+    def totals(self) -> tuple[int, float, float]:
+        """Сумма vCPU, RAM (ГБ) и диска (ГБ) по всем vApp."""
+        return (sum(r.vcpu for r in self.records),
+                sum(r.ram_gb for r in self.records),
+                sum(r.disk_gb for r in self.records))
+
+
+class VmRecord:
+    """ВМ внутри vApp — разобранная из /api/vApp/vapp-{id}."""
+
+    __slots__ = ("name", "network", "ip", "cpu", "ram_gb", "disk_gb", "storage", "snap_count", "snap_gb")
+
+    def __init__(self, name: str, network: str, ip: str, cpu: int, ram_gb: float, disk_gb: float,
+                 storage: str, snap_count: int, snap_gb: float):
+        self.name = name
+        self.network = network
+        self.ip = ip
+        self.cpu = cpu
+        self.ram_gb = ram_gb
+        self.disk_gb = disk_gb
+        self.storage = storage
+        self.snap_count = snap_count
+        self.snap_gb = snap_gb
+
+    @classmethod
+    def from_xml(cls, vm: ET.Element) -> "VmRecord":
+        ns = VCD_NS
+        cpu = 0
+        ram_gb = disk_gb = 0.0
+        spec = vm.find("v:VmSpecSection", ns)
+        if spec is not None:
+            numcpu = spec.find("v:NumCpus", ns)
+            if numcpu is not None and numcpu.text:
+                cpu = int(numcpu.text)
+            mem = spec.find("v:MemoryResourceMb/v:Configured", ns)
+            if mem is not None and mem.text and mem.text.isdigit():
+                ram_gb = round(int(mem.text) / 1024, 1)
+            for d in spec.findall("v:DiskSection/v:DiskSettings/v:SizeMb", ns):
+                if d.text and d.text.isdigit():
+                    disk_gb += int(d.text) / 1024
+
+        nc = vm.find("v:NetworkConnectionSection/v:NetworkConnection", ns)
+        ip_el = nc.find("v:IpAddress", ns) if nc is not None else None
+        storage = vm.find("v:StorageProfile", ns)
+
+        snap_count = 0
+        snap_gb = 0.0
+        snap_section = vm.find("v:SnapshotSection", ns)
+        if snap_section is not None:
+            for s in snap_section.findall("v:Snapshot", ns):
+                snap_count += 1
+                try:
+                    snap_gb += int(s.attrib.get("size", "0")) / 1024**3
+                except ValueError:
+                    pass
+
+        return cls(
+            name=vm.attrib.get("name", "-"),
+            network=nc.attrib.get("network", "-") if nc is not None else "-",
+            ip=ip_el.text if ip_el is not None and ip_el.text else "",
+            cpu=cpu, ram_gb=ram_gb, disk_gb=disk_gb,
+            storage=storage.attrib.get("name", "-") if storage is not None else "-",
+            snap_count=snap_count, snap_gb=snap_gb,
+        )
 
-    try:
-        params = {
-            "type": "vApp", "format": "records",
-            "page": 1, "pageSize": 200,
-            "filterEncoded": "true",
-            "filter": f"(vdc=={cfg['vdc_id']})"
-        }
-        headers = {
-            "Accept": "application/*+xml;version=40.0.0-alpha",
-            "Authorization": f"Bearer {token}"
-        }
-
-        r = requests.get(f"{cfg['base_url']}/api/query",
-                         headers=headers, params=params, verify=False)
-        r.raise_for_status()
-        root = ET.fromstring(r.text)
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-
-        data = []
-        for rec in root.findall("v:VAppRecord", ns):
-            name = rec.attrib.get("name", "—")
-
-            # сначала читаем статус
-            raw_state = rec.attrib.get("status", "").upper().strip()
-            logger.debug(f"vApp {name} → status='{raw_state}'")
-
-            # подставляем цвет
-            if "POWERED_ON" in raw_state or raw_state == "ON":
-                indicator = "🟢"
-            elif "POWERED_OFF" in raw_state or raw_state == "OFF":
-                indicator = "🔴"
-            elif "MIX" in raw_state or "RESOLVED" in raw_state or "PART" in raw_state:
-                indicator = "🟡"
-            else:
-                indicator = "⚪"
-
-            href = rec.attrib.get("href", "")
-            cpus = int(rec.attrib.get("numberOfCpus", 0))
-            ram_mb = int(rec.attrib.get("memoryAllocationMB", 0))
-            storage_mb = int(rec.attrib.get("totalStorageAllocatedMb",
-                            int(rec.attrib.get("storageKB", 0)) / 1024))
-
-            data.append({
-                "Статус": indicator,
-                "Имя vApp": name,
-                "vCPU": cpus,
-                "RAM (ГБ)": ram_mb / 1024,
-                "Диск (ГБ)": storage_mb / 1024,
-                "href": href
-            })
-
-        df = pd.DataFrame(data)
-        VAPP_CACHE.update({"data": df, "time": time.time()})
-        logger.info(f"✅ Получено {len(df)} vApp, {time.time()-start:.2f}s")
-        return df
 
-    except Exception as e:
-        logger.exception(f"❌ Ошибка получения vApp: {e}")
-        return pd.DataFrame()
+class VAppDetails:
+    """Состав vApp: имя из VCD и её ВМ."""
+
+    __slots__ = ("name", "vms")
 
+    def __init__(self, name: str, vms: list[VmRecord]):
+        self.name = name
+        self.vms = vms
 
-def get_storage_limits(cfg, token) -> float:
+    @classmethod
+    def from_xml(cls, content: bytes) -> "VAppDetails":
+        root = ET.fromstring(content)
+        return cls(root.attrib.get("name", "?"),
+                   [VmRecord.from_xml(vm) for vm in root.findall("v:Children/v:Vm", VCD_NS)])
+
+    def totals(self) -> tuple[int, float, float, float]:
+        """Сумма CPU, RAM (ГБ), дисков (ГБ) и снапшотов (ГБ)."""
+        return (sum(vm.cpu for vm in self.vms),
+                sum(vm.ram_gb for vm in self.vms),
+                sum(vm.disk_gb for vm in self.vms),
+                sum(vm.snap_gb for vm in self.vms))
+
+
+# ------------------------------------------------------------------------------
+# CLOUD UTILS
+# ------------------------------------------------------------------------------
+async def _load_vapps(cfg) -> VAppInventory:
     """
-    Подсчитывает общий лимит Storage (Bronze + Gold) через CloudAPI consumers.
+    Загружает из VCD список vApp с ресурсами и цветным статусом (для клавиатуры).
     """
-    def collect_used(urn):
-        page, total = 1, 0
-        while True:
-            url = (f"{cfg['base_url']}/cloudapi/1.0.0/orgVdcStoragePolicies/"
-                   f"{urn}/consumers?page={page}&pageSize=25")
-            headers = {
-                "Accept": "application/json;version=39.1",
-                "Authorization": f"Bearer {token}",
-            }
-            r = requests.get(url, headers=headers, verify=False)
-            if not r.ok:
-                break
-            js = r.json()
-            vals = js.get("values", [])
-            total += sum(v.get("storageConsumedMb", 0) for v in vals)
-            if page >= js.get("pageCount", 1):
-                break
-            page += 1
-        return total
+    start = time.time()
+    logger.info("🚀 Запрос списка vApp (ресурсы + статусы)")
+
+    # все страницы, а не только первые 200 записей
+    records = await vcd.query_records("vApp", {
+        "filterEncoded": "true",
+        "filter": f"(vdc=={cfg['vdc_id']})"
+    })
+    inventory = VAppInventory([VAppRecord.from_query(rec) for rec in records])
+    logger.info(f"✅ Получено {len(inventory)} vApp, {time.time()-start:.2f}s")
+    return inventory
+
 
+# Список vApp: отдаётся из памяти сразу, устаревший обновляется в фоне
+vapp_inventory = StaleWhileRevalidate(
+    "vApp inventory", lambda: _load_vapps(CONFIG),
+    fresh_for=VCD_INVENTORY_FRESH_SECONDS, refresh_interval=VCD_INVENTORY_REFRESH_SECONDS,
+)
+
+
+async def get_vapps(cfg, force_update=False) -> VAppInventory:
+    """
+    Список vApp из кэша (устаревший — с фоновым обновлением).
+    force_update — дождаться свежих данных (кнопка «Обновить»).
+    """
     try:
-        used_bronze = collect_used(cfg["storage_bronze_urn"])
-        used_gold = collect_used(cfg["storage_gold_urn"])
-
-        # лимиты
-        for urn_type in ("storage_gold_urn", "storage_bronze_urn"):
-            url = f"{cfg['base_url']}/cloudapi/1.0.0/orgVdcStoragePolicies/{cfg[urn_type]}"
-            hdr = {
-                "Accept": "application/json;version=39.1",
-                "Authorization": f"Bearer {token}",
-            }
-            r = requests.get(url, headers=hdr, verify=False)
-            if not r.ok:
-                raise RuntimeError(f"Storage {urn_type} {r.status_code}")
-            limit_mb = r.json().get("storageLimitMb", 0)
-            if urn_type.endswith("gold_urn"):
-                gold_limit = limit_mb
-            else:
-                bronze_limit = limit_mb
-
-        total_limit_tb = (gold_limit + bronze_limit) / 1024 / 1024
-        total_used_tb = (used_gold + used_bronze) / 1024 / 1024
-        logger.info(
-            f"✅ Storage лимит: {total_limit_tb:.2f} ТБ, "
-            f"использовано {total_used_tb:.2f} ТБ"
-        )
-        return total_limit_tb
+        if force_update:
+            return await vapp_inventory.refresh()
+        return await vapp_inventory.get()
     except Exception as e:
-        logger.warning(f"⚠️ Ошибка Storage лимитов: {e}")
-        return 0.0
+        logger.exception(f"❌ Ошибка получения vApp: {e}")
+        # прежние данные лучше, чем пустой список
+        return vapp_inventory.value if vapp_inventory.value is not None else VAppInventory([])
+
+
+# Разобранный состав vApp по href: PC, Mobile и CSV одной vApp — один запрос к VCD
+_vapp_details = AsyncTTLCache(VCD_VAPP_DETAILS_TTL, serve_stale=True)
+
+
+async def _load_vapp_details(vapp: VAppRecord) -> VAppDetails:
+    content = await vcd.get_xml(f"/api/vApp/vapp-{vapp.id}", accept=XML_ACCEPT_40)
+    return VAppDetails.from_xml(content)
+
+
+async def get_vapp_details(vapp: VAppRecord) -> VAppDetails:
+    return await _vapp_details.get(vapp.href, lambda: _load_vapp_details(vapp))
+
+
+def prefetch_vapp_details(vapp: VAppRecord):
+    """Начать загрузку в фоне, пока пользователь выбирает вид (PC/Mobile/CSV)."""
+    _vapp_details.prefetch(vapp.href, lambda: _load_vapp_details(vapp))
+
+
+def data_age_line(source: StaleWhileRevalidate | None = None) -> str:
+    """Строка «🕒 Данные VCD на HH:MM (N мин назад)» для отчётов (по умолчанию — о списке vApp)."""
+    source = source or vapp_inventory
+    age = source.age
+    if age is None:
+        return ""
+    stamp = datetime.fromtimestamp(source.loaded_at).strftime("%H:%M")
+    if age < 60:
+        ago = "только что"
+    elif age < 3600:
+        ago = f"{int(age // 60)} мин назад"
+    else:
+        ago = f"{int(age // 3600)} ч назад"
+    return f"🕒 Данные VCD на {stamp} ({ago})"
+
+
+def vapp_list_text() -> str:
+    return f"📦 Выбери vApp из списка:\n{data_age_line()}"
+
+
+# Выделенные VDC vCPU и RAM (ГБ): меняются редко, пока VCD недоступен — прежние
+_vdc_allocation = AsyncTTLCache(VCD_STORAGE_CACHE_TTL, serve_stale=True)
+
+
+async def _load_vdc_allocation(vdc_id: str) -> tuple[float, float]:
+    ns = VCD_NS
+    root = ET.fromstring(await vcd.get_xml(f"/api/vdc/{vdc_id}"))
+    cpu_vcpu = int(root.find(".//v:Cpu/v:Allocated", ns).text) / 1000 / 1.73
+    ram_gb = int(root.find(".//v:Memory/v:Allocated", ns).text) / 1024
+    return cpu_vcpu, ram_gb
+
+
+async def get_vdc_capacity(cfg) -> tuple[float, float, float]:
+    """
+    Ёмкость VDC для процентов в отчётах: vCPU, RAM (ГБ), диск (ГБ).
+    VDC и политики хранения запрашиваются одновременно.
+    """
+    vdc_id = cfg["vdc_id"]
+    (cpu_vcpu, ram_gb), policies = await asyncio.gather(
+        _vdc_allocation.get(vdc_id, lambda: _load_vdc_allocation(vdc_id)),
+        storage_policies(cfg["storage_gold_urn"], cfg["storage_bronze_urn"]),
+    )
+
+    storage_tb = sum(p["limit_mb"] for p in policies.values()) / 1024 / 1024
+    used_tb = sum(p["used_mb"] for p in policies.values()) / 1024 / 1024
+    logger.info(f"✅ Storage лимит {storage_tb:.2f} ТБ использовано {used_tb:.2f} ТБ")
+    return cpu_vcpu, ram_gb, storage_tb * 1024 or 1  # делитель всегда >0
+
+
+def pct(value: float, total: float) -> float:
+    return value / total * 100 if total else 0.0
+
+
+def csv_bytes(header: list, rows: list) -> bytes:
+    """CSV‑файл для отправки документом (stdlib csv, без pandas)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def render_all_vapps_csv(inventory: VAppInventory, capacity: tuple[float, float, float]) -> bytes:
+    """CSV по всем vApp: ресурсы, доля от ёмкости VDC и строка ИТОГО."""
+    cpu_vcpu, ram_gb, total_storage_gb = capacity
+    header = ["Статус (текст)", "Имя vApp", "vCPU", "vCPU %",
+              "RAM (ГБ)", "RAM %", "Диск (ГБ)", "Диск %"]
+    rows = [
+        [STATUS_TEXT.get(r.status, r.status), r.name,
+         r.vcpu, round(pct(r.vcpu, cpu_vcpu), 2),
+         round(r.ram_gb, 1), round(pct(r.ram_gb, ram_gb), 2),
+         round(r.disk_gb, 1), round(pct(r.disk_gb, total_storage_gb), 2)]
+        for r in inventory
+    ]
+    total_cpu, total_ram, total_disk = inventory.totals()
+    rows.append(["", "ИТОГО",
+                 total_cpu, pct(total_cpu, cpu_vcpu),
+                 round(total_ram, 1), pct(total_ram, ram_gb),
+                 round(total_disk, 1), pct(total_disk, total_storage_gb)])
+    return csv_bytes(header, rows)
 
 
 # ------------------------------------------------------------------------------
 # клавиатуры
 # ------------------------------------------------------------------------------
-def keyboard_vapp_list(df: pd.DataFrame, page: int = 1, per_page: int = 12) -> types.InlineKeyboardMarkup:
+def keyboard_vapp_list(inventory: VAppInventory, page: int = 1, per_page: int = 12) -> types.InlineKeyboardMarkup:
     """3×4 список vApp с индикацией статуса + пагинация + кнопки общих отчётов."""
-    total_pages = max(1, math.ceil(len(df) / per_page))
+    total_pages = max(1, math.ceil(len(inventory) / per_page))
     page = max(1, min(page, total_pages))
     start, end = (page - 1) * per_page, page * per_page
-    subset = df.iloc[start:end]
 
     kb = InlineKeyboardBuilder()
 
     # --- основная сетка 3×4 ---
-    for _, row in subset.iterrows():
-        name = row["Имя vApp"]
-        status_icon = row.get("Статус", "⚪")
-        kb.button(text=f"{status_icon} {name}", callback_data=f"vapp:{name}")
+    for rec in inventory.records[start:end]:
+        kb.button(text=f"{rec.status} {rec.name}", callback_data=f"vapp:{rec.name}")
     kb.adjust(3)
 
     # --- пагинация ---
@@ -248,6 +371,8 @@ def keyboard_vapp_list(df: pd.DataFrame, page: int = 1, per_page: int = 12) -> t
         types.InlineKeyboardButton(text="📄 CSV (все vApp)", callback_data="allvapp_csv"),
         types.InlineKeyboardButton(text="📱 Mobile info (все vApp)", callback_data="allvapp_mobile"),
     )
+    kb.row(types.InlineKeyboardButton(text="🧾 CSV (все ВМ)", callback_data="allvm_csv"))
+    kb.row(types.InlineKeyboardButton(text="🔄 Обновить список", callback_data="vapp_refresh:list"))
 
     return kb.as_markup()
 
@@ -264,188 +389,86 @@ def keyboard_vapp_detail(name: str) -> types.InlineKeyboardMarkup:
 
 
 
-def summarize_all_vapps(cfg, token) -> str:
+def render_summary_table(inventory: VAppInventory, capacity: tuple[float, float, float]) -> str:
+    """Таблица «Статистика всех vApp» (ПК‑вид) по готовому списку и ёмкости VDC."""
+    cpu_vcpu, ram_gb, total_storage_gb = capacity
+    total_cpu, total_ram, total_disk = inventory.totals()
+
+    widths = [max(20, max(len(r.name) for r in inventory) + 2),
+              8, 9, 9, 8, 10, 10]
+    headers = ["Имя vApp", "vCPU", "vCPU %", "RAM(ГБ)",
+               "RAM %", "Диск(ГБ)", "Диск %"]
+    sep = "=" * (sum(widths) + len(widths) * 3 - 1)
+    dash = "-" * (sum(widths) + len(widths) * 3 - 1)
+
+    def fmt_row(values):
+        parts = []
+        for i, v in enumerate(values):
+            t = str(v)
+            parts.append(t.ljust(widths[i]) if i == 0 else t.center(widths[i]))
+        return " | ".join(parts)
+
+    lines = [sep, fmt_row(headers), dash]
+    for r in inventory:
+        lines.append(fmt_row([
+            r.name, r.vcpu,
+            f"{pct(r.vcpu, cpu_vcpu):.1f}", f"{r.ram_gb:.1f}",
+            f"{pct(r.ram_gb, ram_gb):.1f}", f"{r.disk_gb:.1f}", f"{pct(r.disk_gb, total_storage_gb):.1f}"]))
+    lines += [sep, fmt_row([
+        "ИТОГО", total_cpu,
+        f"{pct(total_cpu, cpu_vcpu):.1f}", f"{total_ram:.1f}",
+        f"{pct(total_ram, ram_gb):.1f}", f"{total_disk:.1f}",
+        f"{pct(total_disk, total_storage_gb):.1f}"]), sep]
+    return "\n".join(lines)
+
+
+async def summarize_all_vapps(cfg) -> str:
     """
     Сводный отчёт по всем vApp.
     """
     try:
         start = time.time()
-        logger.info("📊 Расчёт статистики по всем vApp")
-
-        # --- лимиты CPU/RAM ---
-        vdc_url = f"{cfg['base_url']}/api/vdc/{cfg['vdc_id']}"
-        hdrs = {"Accept": "application/*+xml;version=39.1",
-                "Authorization": f"Bearer {token}"}
-        r = requests.get(vdc_url, headers=hdrs, verify=False)
-        r.raise_for_status()
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-        root = ET.fromstring(r.text)
-        cpu_vcpu = int(root.find(".//v:Cpu/v:Allocated", ns).text) / 1000 / 1.73
-        ram_gb = int(root.find(".//v:Memory/v:Allocated", ns).text) / 1024
-
-        # --- storage limit & usage (CloudAPI /consumers)
-        def get_storage_totals():
-            heads = {"Accept": "application/json;version=39.1",
-                     "Authorization": f"Bearer {token}"}
-            total_limit, total_used = 0, 0
-            for urn in (cfg["storage_gold_urn"], cfg["storage_bronze_urn"]):
-                base = cfg["base_url"]
-                limit = requests.get(f"{base}/cloudapi/1.0.0/orgVdcStoragePolicies/{urn}",
-                                     headers=heads, verify=False).json().get("storageLimitMb", 0)
-                page, used_sum = 1, 0
-                while True:
-                    url = f"{base}/cloudapi/1.0.0/orgVdcStoragePolicies/{urn}/consumers?page={page}&pageSize=25"
-                    resp = requests.get(url, headers=heads, verify=False)
-                    if not resp.ok:
-                        break
-                    js = resp.json()
-                    used_sum += sum(v.get("storageConsumedMb", 0) for v in js.get("values", []))
-                    if page >= js.get("pageCount", 1):
-                        break
-                    page += 1
-                total_limit += limit
-                total_used += used_sum
-            return total_limit / 1024 / 1024, total_used / 1024 / 1024  # в ТБ
-
-        storage_tb, used_tb = get_storage_totals()
-        logger.info(f"✅ Storage лимит {storage_tb:.2f} ТБ использовано {used_tb:.2f} ТБ")
-        total_storage_gb = storage_tb * 1024 or 1  # делитель всегда >0
-
-        # --- таблица vApp
-        df = get_vapps(cfg, token, force_update=True)
-        if df.empty:
-            return "⚠️ Нет данных vApp."
-
-        df["vCPU %"] = df["vCPU"] / cpu_vcpu * 100
-        df["RAM %"] = df["RAM (ГБ)"] / ram_gb * 100
-        df["Диск %"] = df["Диск (ГБ)"] / total_storage_gb * 100
-        df = df.round({"RAM (ГБ)": 1, "Диск (ГБ)": 1,
-                       "vCPU %": 2, "RAM %": 2, "Диск %": 2})
-
-        total = {
-            "Имя vApp": "ИТОГО",
-            "vCPU": df["vCPU"].sum(),
-            "RAM (ГБ)": df["RAM (ГБ)"].sum(),
-            "Диск (ГБ)": df["Диск (ГБ)"].sum(),
-            "vCPU %": df["vCPU"].sum() / cpu_vcpu * 100,
-            "RAM %": df["RAM (ГБ)"].sum() / ram_gb * 100,
-            "Диск %": df["Диск (ГБ)"].sum() / total_storage_gb * 100
-        }
-
-        widths = [max(20, max(len(x) for x in df["Имя vApp"]) + 2),
-                  8, 9, 9, 8, 10, 10]
-        headers = ["Имя vApp", "vCPU", "vCPU %", "RAM(ГБ)",
-                   "RAM %", "Диск(ГБ)", "Диск %"]
-        sep = "=" * (sum(widths) + len(widths) * 3 - 1)
-        dash = "-" * (sum(widths) + len(widths) * 3 - 1)
-
-        def fmt_row(values):
-            parts = []
-            for i, v in enumerate(values):
-                t = str(v)
-                parts.append(t.ljust(widths[i]) if i == 0 else t.center(widths[i]))
-            return " | ".join(parts)
+        logger.info("📊 Расчёт статистики по всем vApp")
 
-        lines = [sep, fmt_row(headers), dash]
-        for _, r in df.iterrows():
-            lines.append(fmt_row([
-                r["Имя vApp"], int(r["vCPU"]),
-                f"{r['vCPU %']:.1f}", f"{r['RAM (ГБ)']:.1f}",
-                f"{r['RAM %']:.1f}", f"{r['Диск (ГБ)']:.1f}", f"{r['Диск %']:.1f}"]))
-        lines += [sep, fmt_row([
-            total["Имя vApp"], int(total["vCPU"]),
-            f"{total['vCPU %']:.1f}", f"{total['RAM (ГБ)']:.1f}",
-            f"{total['RAM %']:.1f}", f"{total['Диск (ГБ)']:.1f}",
-            f"{total['Диск %']:.1f}"]), sep]
+        inventory, capacity = await asyncio.gather(get_vapps(cfg), get_vdc_capacity(cfg))
+        if not inventory:
+            return "⚠️ Нет данных vApp."
 
-        text = "\n".join(lines)
+        text = render_summary_table(inventory, capacity)
         result = (
-            f"<b>📊 Статистика всех vApp</b>\n"
-            f"<pre>{text}</pre>"
+            f"<b>📊 Статистика всех vApp</b>\n"
+            f"<pre>{text}</pre>\n"
+            f"{data_age_line()}"
         )
-        logger.info(f"✅ Отчёт готов ({len(df)} vApp) за {time.time()-start:.2f}s")
+        logger.info(f"✅ Отчёт готов ({len(inventory)} vApp) за {time.time()-start:.2f}s")
         return result
 
     except Exception as e:
-        logger.exception(f"❌ Ошибка формирования сводной статистики: {e}")
-        return "❌ Ошибка при формировании статистики vApp."
+        logger.exception(f"❌ Ошибка формирования сводной статистики: {e}")
+        return "❌ Ошибка при формировании статистики vApp."
 
 
 
-def describe_single_vapp(cfg, token, vapp_name: str) -> str:
+async def describe_single_vapp(cfg, vapp_name: str) -> str:
     """
     Формирует информацию о vApp.
     Если ВМ <= 10 — таблица; если больше — компактный мобильный формат.
     """
     try:
         # --- ищем ссылку на vApp ---
-        df = get_vapps(cfg, token)
-        row = df[df["Имя vApp"] == vapp_name]
-        if row.empty:
+        vapp = (await get_vapps(cfg)).find(vapp_name)
+        if vapp is None:
             return f"⚠️ vApp <b>{vapp_name}</b> не найден."
 
-        href = row.iloc[0]["href"]
-        vapp_id = href.split("vapp-")[-1]
-        url = f"{cfg['base_url']}/api/vApp/vapp-{vapp_id}"
-        headers = {
-            "Accept": "application/*+xml;version=40.0.0-alpha",
-            "Authorization": f"Bearer {token}"
-        }
-
-        r = requests.get(url, headers=headers, verify=False, timeout=30)
-        r.raise_for_status()
-        xml_text = r.text
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-        root = ET.fromstring(xml_text)
-        vapp_name_xml = root.attrib.get("name", "?")
-        vms = root.findall("v:Children/v:Vm", ns)
-        if not vms:
-            return f"⚠️ В vApp <b>{vapp_name_xml}</b> нет виртуальных машин."
+        details = await get_vapp_details(vapp)
+        vapp_name_xml = details.name
+        if not details.vms:
+            return f"⚠️ В vApp <b>{vapp_name_xml}</b> нет виртуальных машин."
 
         # --- сбор данных ---
-        table_data = []
-        total_cpu = total_ram = total_disk = total_snap_size = 0
-        for vm in vms:
-            name = vm.attrib.get("name", "-")
-            storage = vm.find("v:StorageProfile", ns)
-            storage_name = storage.attrib.get("name", "-") if storage is not None else "-"
-
-            spec = vm.find("v:VmSpecSection", ns)
-            cpu = ram_gb = disk_gb = 0
-            if spec is not None:
-                numcpu = spec.find("v:NumCpus", ns)
-                if numcpu is not None and numcpu.text:
-                    cpu = int(numcpu.text)
-                mem = spec.find("v:MemoryResourceMb/v:Configured", ns)
-                if mem is not None and mem.text:
-                    ram_gb = round(int(mem.text) / 1024, 1)
-                for d in spec.findall("v:DiskSection/v:DiskSettings/v:SizeMb", ns):
-                    if d.text and d.text.isdigit():
-                        disk_gb += int(d.text) / 1024
-
-            nc = vm.find("v:NetworkConnectionSection/v:NetworkConnection", ns)
-            net_name = nc.attrib.get("network", "-") if nc is not None else "-"
-            ip_el = nc.find("v:IpAddress", ns) if nc is not None else None
-            ip_addr = ip_el.text if ip_el is not None else "-"
-
-            snap_section = vm.find("v:SnapshotSection", ns)
-            snap_count = 0
-            snap_size_gb = 0.0
-            if snap_section is not None:
-                for s in snap_section.findall("v:Snapshot", ns):
-                    snap_count += 1
-                    try:
-                        snap_size_gb += int(s.attrib.get("size", "0")) / 1024**3
-                    except ValueError:
-                        pass
-
-            total_cpu += cpu
-            total_ram += ram_gb
-            total_disk += disk_gb
-            total_snap_size += snap_size_gb
-
-            table_data.append([name, net_name, ip_addr, cpu, ram_gb,
-                               round(disk_gb, 1), storage_name, snap_count, round(snap_size_gb, 1)])
+        table_data = [[vm.name, vm.network, vm.ip or "-", vm.cpu, vm.ram_gb, round(vm.disk_gb, 1),
+                       vm.storage, vm.snap_count, round(vm.snap_gb, 1)] for vm in details.vms]
+        total_cpu, total_ram, total_disk, total_snap_size = details.totals()
 
         # --- выбор формата ---
         if len(table_data) <= 10:
@@ -496,7 +519,7 @@ def describe_single_vapp(cfg, token, vapp_name: str) -> str:
         return f"❌ Ошибка при получении информации о <b>{vapp_name}</b>."
 
 
-def describe_single_vapp_pc(cfg, token, vapp_name: str) -> str:
+async def describe_single_vapp_pc(cfg, vapp_name: str) -> str:
     """
     Возвращает красивую широкую таблицу ВМ внутри vApp (ПК‑вид).
     Добавлено подробное логирование.
@@ -505,76 +528,21 @@ def describe_single_vapp_pc(cfg, token, vapp_name: str) -> str:
     logger.info(f"📥 Запрос детальной таблицы vApp '{vapp_name}'")
 
     try:
-        df = get_vapps(cfg, token)
-        row = df[df["Имя vApp"] == vapp_name]
-        if row.empty:
+        vapp = (await get_vapps(cfg)).find(vapp_name)
+        if vapp is None:
             logger.warning(f"⚠️ vApp '{vapp_name}' не найден в списке vApp.")
             return f"⚠️ vApp <b>{vapp_name}</b> не найден."
 
-        href = row.iloc[0]["href"]
-        vapp_id = href.split("vapp-")[-1]
-        url = f"{cfg['base_url']}/api/vApp/vapp-{vapp_id}"
-        headers = {"Accept": "application/*+xml;version=40.0.0-alpha",
-                   "Authorization": f"Bearer {token}"}
+        details = await get_vapp_details(vapp)
+        vapp_name_xml = details.name
 
-        r = requests.get(url, headers=headers, verify=False, timeout=30)
-        r.raise_for_status()
-        xml_text = r.text
-
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-        root = ET.fromstring(xml_text)
-        vapp_name_xml = root.attrib.get("name", "?")
-        vms = root.findall("v:Children/v:Vm", ns)
-
-        if not vms:
+        if not details.vms:
             logger.info(f"⚠️ vApp '{vapp_name}' пуст (нет ВМ)")
             return f"⚠️ В vApp <b>{vapp_name_xml}</b> нет виртуальных машин."
 
-        table_data = []
-        total_cpu = total_ram = total_disk = total_snap = 0
-
-        for vm in vms:
-            name = vm.attrib.get("name", "-")
-            storage = vm.find("v:StorageProfile", ns)
-            storage_name = storage.attrib.get("name", "-") if storage is not None else "-"
-            spec = vm.find("v:VmSpecSection", ns)
-            cpu = ram_gb = disk_gb = 0
-            if spec is not None:
-                numcpu = spec.find("v:NumCpus", ns)
-                if numcpu is not None and numcpu.text:
-                    cpu = int(numcpu.text)
-                mem = spec.find("v:MemoryResourceMb/v:Configured", ns)
-                if mem is not None and mem.text:
-                    ram_gb = round(int(mem.text)/1024, 1)
-                for d in spec.findall("v:DiskSection/v:DiskSettings/v:SizeMb", ns):
-                    if d.text and d.text.isdigit():
-                        disk_gb += int(d.text)/1024
-
-            nc = vm.find("v:NetworkConnectionSection/v:NetworkConnection", ns)
-            net = nc.attrib.get("network", "-") if nc is not None else "-"
-            ip_el = nc.find("v:IpAddress", ns) if nc is not None else None
-            ip = ip_el.text if ip_el is not None else "-"
-
-            snap_section = vm.find("v:SnapshotSection", ns)
-            sn_count = 0
-            sn_size = 0.0
-            if snap_section is not None:
-                for s in snap_section.findall("v:Snapshot", ns):
-                    sn_count += 1
-                    try:
-                        sn_size += int(s.attrib.get("size", "0"))/1024**3
-                    except ValueError:
-                        pass
-
-            total_cpu += cpu
-            total_ram += ram_gb
-            total_disk += disk_gb
-            total_snap += sn_size
-
-            table_data.append([
-                name, net, ip, cpu, f"{ram_gb:.1f}", f"{disk_gb:.1f}",
-                storage_name, sn_count, f"{sn_size:.1f}"
-            ])
+        table_data = [[vm.name, vm.network, vm.ip or "-", vm.cpu, f"{vm.ram_gb:.1f}", f"{vm.disk_gb:.1f}",
+                       vm.storage, vm.snap_count, f"{vm.snap_gb:.1f}"] for vm in details.vms]
+        total_cpu, total_ram, total_disk, total_snap = details.totals()
 
         # --- оформление таблицы ---
         header = ["Имя ВМ", "Network", "IP‑Address", "CPU", "RAM(GB)",
@@ -623,12 +591,11 @@ async def cloudvapp_start(message: types.Message):
     """Команда /cloudvapp — запрос и показ списка vApp"""
     try:
         await message.answer("🔄 Получаю список vApp…")
-        token = get_bearer_token(CONFIG)
-        df = get_vapps(CONFIG, token)
-        if df.empty:
+        inventory = await get_vapps(CONFIG)
+        if not inventory:
             await message.answer("⚠️ vApp не найдены.")
             return
-        await message.answer("📦 Выбери vApp из списка:", reply_markup=keyboard_vapp_list(df))
+        await message.answer(vapp_list_text(), reply_markup=keyboard_vapp_list(inventory))
     except Exception as e:
         logger.error(f"Ошибка /cloudvapp: {e}")
         await message.answer("❌ Ошибка при запросе списка vApp.")
@@ -637,73 +604,22 @@ async def cloudvapp_start(message: types.Message):
 @router.callback_query(lambda c: c.data == "allvapp_csv")
 async def callback_allvapp_csv(callback: types.CallbackQuery):
     """Экспорт CSV по всем vApp (полная информация + проценты)."""
-    import io
     logger.info("📤 Запрошен экспорт CSV для всех vApp")
     try:
-        token = get_bearer_token(CONFIG)
-        df = get_vapps(CONFIG, token, force_update=True)
-        if df.empty:
-            await callback.answer("⚠️ Нет данных о vApp.", show_alert=True)
+        inventory, capacity = await asyncio.gather(get_vapps(CONFIG), get_vdc_capacity(CONFIG))
+        if not inventory:
+            await callback.answer("⚠️ Нет данных о vApp.", show_alert=True)
             return
 
-        # --- заменяем эмодзи статусов на текст
-        emoji_to_text = {"🟢": "POWERED_ON", "🔴": "POWERED_OFF",
-                         "🟡": "MIXED", "⚪": "UNKNOWN"}
-        df["Статус (текст)"] = df["Статус"].replace(emoji_to_text)  # Обычный пробел
-
-        # --- получаем лимиты CPU/RAM/Storage, как в summarize_all_vapps
-        url_vdc = f"{CONFIG['base_url']}/api/vdc/{CONFIG['vdc_id']}"
-        hdrs = {"Accept": "application/*+xml;version=39.1",
-                "Authorization": f"Bearer {token}"}
-        r = requests.get(url_vdc, headers=hdrs, verify=False)
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-        root = ET.fromstring(r.text)
-        cpu_vcpu = int(root.find(".//v:Cpu/v:Allocated", ns).text) / 1000 / 1.73
-        ram_gb = int(root.find(".//v:Memory/v:Allocated", ns).text) / 1024
-
-        storage_tb = get_storage_limits(CONFIG, token)
-        total_storage_gb = storage_tb * 1024 or 1
-
-        # --- расчёт процентов
-        df["vCPU %"] = df["vCPU"] / cpu_vcpu * 100
-        df["RAM %"] = df["RAM (ГБ)"] / ram_gb * 100
-        df["Диск %"] = df["Диск (ГБ)"] / total_storage_gb * 100
-        df = df.round({
-            "RAM (ГБ)": 1, "Диск (ГБ)": 1,
-            "vCPU %": 2, "RAM %": 2, "Диск %": 2,
-        })
-
-        # --- строка ИТОГО
-        total_row = {
-            "Статус (текст)": "",
-            "Имя vApp": "ИТОГО",  # Обычный пробел
-            "vCPU": df["vCPU"].sum(),
-            "vCPU %": df["vCPU"].sum() / cpu_vcpu * 100,
-            "RAM (ГБ)": df["RAM (ГБ)"].sum(),
-            "RAM %": df["RAM (ГБ)"].sum() / ram_gb * 100,
-            "Диск (ГБ)": df["Диск (ГБ)"].sum(),
-            "Диск %": df["Диск (ГБ)"].sum() / total_storage_gb * 100,
-        }
-        df = pd.concat([df, pd.DataFrame([total_row])], ignore_index=True)
-
-        # --- выбираем колонки и экспортируем
-        cols = ["Статус (текст)", "Имя vApp", "vCPU", "vCPU %",  # Все с обычными пробелами
-                "RAM (ГБ)", "RAM %", "Диск (ГБ)", "Диск %"]
-        df = df[cols]
-
-        buf = io.StringIO()
-        df.to_csv(buf, index=False)
-        buf.seek(0)
-
         await callback.message.answer_document(
             types.BufferedInputFile(
-                buf.read().encode("utf-8"),
+                render_all_vapps_csv(inventory, capacity),
                 filename="vApps_All_Info.csv"
             ),
-            caption="📄 Экспорт всех vApp (полный отчёт)",
+            caption=f"📄 Экспорт всех vApp (полный отчёт)\n{data_age_line()}",
             parse_mode="HTML"
         )
-        logger.info(f"✅ CSV экспорт успешен: {len(df)-1} vApp + итого")
+        logger.info(f"✅ CSV экспорт успешен: {len(inventory)} vApp + итого")
         await callback.answer()
 
     except Exception as e:
@@ -717,9 +633,8 @@ async def callback_page(callback: types.CallbackQuery):
     """Перелистывание"""
     try:
         page = int(callback.data.split(":")[1])
-        token = get_bearer_token(CONFIG)
-        df = get_vapps(CONFIG, token)
-        kb = keyboard_vapp_list(df, page)
+        inventory = await get_vapps(CONFIG)
+        kb = keyboard_vapp_list(inventory, page)
         await callback.message.edit_reply_markup(reply_markup=kb)
         await callback.answer()
     except Exception as e:
@@ -731,6 +646,10 @@ async def callback_page(callback: types.CallbackQuery):
 async def callback_vapp(callback: types.CallbackQuery):
     """Выбор конкретного vApp"""
     name = callback.data.split(":", 1)[1]
+    vapp = (await get_vapps(CONFIG)).find(name)
+    if vapp is not None:
+        # скорее всего следом нажмут PC/Mobile/CSV — состав vApp уже будет в кэше
+        prefetch_vapp_details(vapp)
     text = f"📦 vApp: <b>{name}</b>"
     await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard_vapp_detail(name))
     await callback.answer()
@@ -743,12 +662,11 @@ async def callback_stats(callback: types.CallbackQuery):
     таблица + только кнопка "Назад".
     """
     try:
-        token = get_bearer_token(CONFIG)
-        text = summarize_all_vapps(CONFIG, token)
+        text = await summarize_all_vapps(CONFIG)
 
-        # одна единственная кнопка "Назад"
         kb = InlineKeyboardBuilder()
-        kb.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:vapp_list"))
+        kb.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:vapp_list"),
+               types.InlineKeyboardButton(text="🔄 Обновить", callback_data="vapp_refresh:stats"))
 
         await callback.message.edit_text(
             text,
@@ -769,67 +687,40 @@ async def callback_allvapp_mobile(callback: types.CallbackQuery):
     с добавлением процентов в итогах.
     """
     try:
-        token = get_bearer_token(CONFIG)
-        df = get_vapps(CONFIG, token, force_update=True)
-        if df.empty:
-            await callback.answer("⚠️ Нет данных о vApp.", show_alert=True)
+        inventory, capacity = await asyncio.gather(get_vapps(CONFIG), get_vdc_capacity(CONFIG))
+        if not inventory:
+            await callback.answer("⚠️ Нет данных о vApp.", show_alert=True)
             return
-
-        # --- лимиты для процентов ---
-        vdc_url = f"{CONFIG['base_url']}/api/vdc/{CONFIG['vdc_id']}"
-        hdrs = {
-            "Accept": "application/*+xml;version=39.1",
-            "Authorization": f"Bearer {token}"
-        }
-        r = requests.get(vdc_url, headers=hdrs, verify=False)
-        r.raise_for_status()
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-        root = ET.fromstring(r.text)
-        cpu_vcpu = int(root.find(".//v:Cpu/v:Allocated", ns).text) / 1000 / 1.73
-        ram_gb = int(root.find(".//v:Memory/v:Allocated", ns).text) / 1024
-
-        storage_tb = get_storage_limits(CONFIG, token)
-        total_storage_gb = storage_tb * 1024 or 1
-
-        df["vCPU %"] = df["vCPU"] / cpu_vcpu * 100
-        df["RAM %"] = df["RAM (ГБ)"] / ram_gb * 100
-        df["Диск %"] = df["Диск (ГБ)"] / total_storage_gb * 100
-        df = df.round({"RAM (ГБ)": 1, "Диск (ГБ)": 1,
-                       "vCPU %": 1, "RAM %": 1, "Диск %": 1})
+        cpu_vcpu, ram_gb, total_storage_gb = capacity
 
         # --- формирование карточек ---
-        lines = ["<b>📊 Статистика всех vApp</b>", "───────────────────────"]
-        total_cpu = df["vCPU"].sum()
-        total_ram = df["RAM (ГБ)"].sum()
-        total_disk = df["Диск (ГБ)"].sum()
-
-        total_cpu_pct = total_cpu / cpu_vcpu * 100
-        total_ram_pct = total_ram / ram_gb * 100
-        total_disk_pct = total_disk / total_storage_gb * 100
+        lines = ["<b>📊 Статистика всех vApp</b>", "───────────────────────"]
+        total_cpu, total_ram, total_disk = inventory.totals()
 
-        for _, r in df.iterrows():
-            name = r["Имя vApp"]
+        for r in inventory:
             lines.append(
-                f"<b>{name}</b>\n"
-                f"• CPU {r['vCPU']} ({r['vCPU %']:.1f} %)\n"
-                f"• RAM {r['RAM (ГБ)']:.1f} GB ({r['RAM %']:.1f} %)\n"
-                f"• Disk {r['Диск (ГБ)']:.1f} GB ({r['Диск %']:.1f} %)\n"
+                f"<b>{r.name}</b>\n"
+                f"• CPU {r.vcpu} ({pct(r.vcpu, cpu_vcpu):.1f} %)\n"
+                f"• RAM {r.ram_gb:.1f} GB ({pct(r.ram_gb, ram_gb):.1f} %)\n"
+                f"• Disk {r.disk_gb:.1f} GB ({pct(r.disk_gb, total_storage_gb):.1f} %)\n"
                 "—————"
             )
 
         # --- итог ---
         lines.append(
-            f"<b>ИТОГО:</b> {len(df)} vApp │ "
-            f"CPU {int(total_cpu)} ({total_cpu_pct:.1f} %) │ "
-            f"RAM {total_ram:.1f} GB ({total_ram_pct:.1f} %) │ "
-            f"Disk {total_disk:.1f} GB ({total_disk_pct:.1f} %)"
+            f"<b>ИТОГО:</b> {len(inventory)} vApp │ "
+            f"CPU {total_cpu} ({pct(total_cpu, cpu_vcpu):.1f} %) │ "
+            f"RAM {total_ram:.1f} GB ({pct(total_ram, ram_gb):.1f} %) │ "
+            f"Disk {total_disk:.1f} GB ({pct(total_disk, total_storage_gb):.1f} %)"
         )
 
+        lines.append(data_age_line())
         text = "\n".join(lines)
 
-        # --- клавиатура «Назад» ---
+        # --- клавиатура «Назад» / «Обновить» ---
         kb = InlineKeyboardBuilder()
-        kb.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:vapp_list"))
+        kb.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:vapp_list"),
+               types.InlineKeyboardButton(text="🔄 Обновить", callback_data="vapp_refresh:mobile"))
 
         await callback.message.edit_text(
             text,
@@ -848,8 +739,7 @@ async def callback_info(callback: types.CallbackQuery):
     """Информация по выбранному vApp"""
     vapp_name = callback.data.split(":", 1)[1]
     try:
-        token = get_bearer_token(CONFIG)
-        text = describe_single_vapp(CONFIG, token, vapp_name)
+        text = await describe_single_vapp(CONFIG, vapp_name)
         await callback.message.edit_text(
             text, parse_mode="HTML",
             reply_markup=types.InlineKeyboardMarkup(
@@ -870,11 +760,10 @@ async def callback_back(callback: types.CallbackQuery):
 
         if action == "vapp_list":
             # Возвращаем список vApp
-            token = get_bearer_token(CONFIG)
-            df = get_vapps(CONFIG, token)
-            kb = keyboard_vapp_list(df, page=1)
+            inventory = await get_vapps(CONFIG)
+            kb = keyboard_vapp_list(inventory, page=1)
             await callback.message.edit_text(
-                "📦 Выбери vApp из списка:",
+                vapp_list_text(),
                 reply_markup=kb
             )
             await callback.answer()
@@ -887,13 +776,34 @@ async def callback_back(callback: types.CallbackQuery):
         logger.exception(f"Ошибка кнопки 'Назад': {e}")
         await callback.answer("Ошибка возврата.", show_alert=True)
 
+@router.callback_query(lambda c: c.data.startswith("vapp_refresh:"))
+async def callback_refresh(callback: types.CallbackQuery):
+    """Кнопка «Обновить»: дождаться свежих данных VCD и перерисовать отчёт"""
+    target = callback.data.split(":", 1)[1]
+    logger.info(f"🔄 Пользователь {callback.from_user.id} обновляет данные vApp ({target})")
+    try:
+        await vapp_inventory.refresh()
+    except Exception as e:
+        logger.error(f"Ошибка обновления списка vApp: {e}")
+        await callback.answer("Не удалось обновить данные VCD, показаны прежние.", show_alert=True)
+        return
+
+    if target == "stats":
+        await callback_stats(callback)
+    elif target == "mobile":
+        await callback_allvapp_mobile(callback)
+    else:
+        inventory = await get_vapps(CONFIG)
+        await callback.message.edit_text(vapp_list_text(), reply_markup=keyboard_vapp_list(inventory))
+        await callback.answer()
+
+
 @router.callback_query(lambda c: c.data.startswith("vappinfo_pc:"))
 async def callback_vapp_info_pc(callback: types.CallbackQuery):
     """Информация vApp в широком табличном (ПК) виде"""
     vapp_name = callback.data.split(":", 1)[1]
     try:
-        token = get_bearer_token(CONFIG)
-        text = describe_single_vapp_pc(CONFIG, token, vapp_name)
+        text = await describe_single_vapp_pc(CONFIG, vapp_name)
         await callback.message.edit_text(
             text,
             parse_mode="HTML",
@@ -910,9 +820,8 @@ async def callback_vapp_info_mobile(callback: types.CallbackQuery):
     """Информация vApp в мобильном (карточном) виде"""
     vapp_name = callback.data.split(":", 1)[1]
     try:
-        token = get_bearer_token(CONFIG)
         # принудительно показать компактный вид
-        original_describe = describe_single_vapp(CONFIG, token, vapp_name)
+        original_describe = await describe_single_vapp(CONFIG, vapp_name)
         # вырежем кодовый блок и сделаем короткие строки
         mobile_text = (
             original_describe
@@ -936,86 +845,28 @@ async def callback_vapp_info_mobile(callback: types.CallbackQuery):
 @router.callback_query(lambda c: c.data.startswith("vappinfo_csv:"))
 async def callback_vapp_info_csv(callback: types.CallbackQuery):
     """Формирует и отправляет CSV‑файл с полными данными (как в PC‑таблице)"""
-    import io
     vapp_name = callback.data.split(":", 1)[1]
     logger.info(f"📤 Запрос экспорта CSV для vApp '{vapp_name}'")
     try:
-        token = get_bearer_token(CONFIG)
-        ns = {"v": "http://www.vmware.com/vcloud/v1.5"}
-
-        # получим XML нужного vApp
-        df = get_vapps(CONFIG, token)
-        row = df[df["Имя vApp"] == vapp_name]
-        if row.empty:
+        vapp = (await get_vapps(CONFIG)).find(vapp_name)
+        if vapp is None:
             await callback.answer("vApp не найден.", show_alert=True)
             return
-        href = row.iloc[0]["href"]
-        vapp_id = href.split("vapp-")[-1]
-        url = f"{CONFIG['base_url']}/api/vApp/vapp-{vapp_id}"
-        headers = {
-            "Accept": "application/*+xml;version=40.0.0-alpha",
-            "Authorization": f"Bearer {token}"
-        }
-        r = requests.get(url, headers=headers, verify=False, timeout=30)
-        r.raise_for_status()
-        root = ET.fromstring(r.text)
-        vms = root.findall("v:Children/v:Vm", ns)
-
-        data = []
-        total_cpu = total_ram = total_disk = total_snap = 0
-        for vm in vms:
-            name = vm.attrib.get("name", "-")
-            spec = vm.find("v:VmSpecSection", ns)
-            cpu = 0
-            ram_gb = disk_gb = 0.0
-            if spec is not None:
-                numcpu = spec.find("v:NumCpus", ns)
-                if numcpu is not None and numcpu.text:
-                    cpu = int(numcpu.text)
-                mem = spec.find("v:MemoryResourceMb/v:Configured", ns)
-                if mem is not None and mem.text.isdigit():
-                    ram_gb = round(int(mem.text) / 1024, 1)
-                for d in spec.findall("v:DiskSection/v:DiskSettings/v:SizeMb", ns):
-                    if d.text and d.text.isdigit():
-                        disk_gb += int(d.text) / 1024
-
-            nc = vm.find("v:NetworkConnectionSection/v:NetworkConnection", ns)
-            net = nc.attrib.get("network", "-") if nc is not None else "-"
-            ip = ""
-            ip_el = nc.find("v:IpAddress", ns) if nc is not None else None
-            if ip_el is not None and ip_el.text:
-                ip = ip_el.text
-
-            storage = vm.find("v:StorageProfile", ns)
-            storage_name = storage.attrib.get("name", "-") if storage is not None else "-"
-
-            snap_count = 0
-            snap_size_gb = 0.0
-            snap_section = vm.find("v:SnapshotSection", ns)
-            if snap_section is not None:
-                for s in snap_section.findall("v:Snapshot", ns):
-                    snap_count += 1
-                    try:
-                        snap_size_gb += int(s.attrib.get("size", "0")) / 1024**3
-                    except ValueError:
-                        pass
-
-            total_cpu += cpu
-            total_ram += ram_gb
-            total_disk += disk_gb
-            total_snap += snap_size_gb
-
-            data.append({
-                "Имя ВМ": name,
-                "Network": net,
-                "IP‑Address": ip,
-                "CPU": cpu,
-                "RAM(GB)": ram_gb,
-                "Disk(GB)": round(disk_gb, 1),
-                "Storage": storage_name,
-                "Snaps": snap_count,
-                "Snap Size(GB)": round(snap_size_gb, 1)
-            })
+        details = await get_vapp_details(vapp)
+        vms = details.vms
+
+        data = [{
+            "Имя ВМ": vm.name,
+            "Network": vm.network,
+            "IP‑Address": vm.ip,
+            "CPU": vm.cpu,
+            "RAM(GB)": vm.ram_gb,
+            "Disk(GB)": round(vm.disk_gb, 1),
+            "Storage": vm.storage,
+            "Snaps": vm.snap_count,
+            "Snap Size(GB)": round(vm.snap_gb, 1)
+        } for vm in vms]
+        total_cpu, total_ram, total_disk, total_snap = details.totals()
 
         # добавим итоговую строку
         data.append({
@@ -1032,16 +883,13 @@ async def callback_vapp_info_csv(callback: types.CallbackQuery):
         logger.info(f"🧮 Собрано {len(vms)} ВМ для CSV '{vapp_name}'")
 
         # генерим CSV
-        df_out = pd.DataFrame(data)
-        buf = io.StringIO()
-        df_out.to_csv(buf, index=False)
-        buf.seek(0)
+        body = csv_bytes(list(data[0]), [list(row.values()) for row in data])
         await callback.message.answer_document(
-            types.BufferedInputFile(buf.read().encode("utf-8"), filename=f"{vapp_name}.csv"),
+            types.BufferedInputFile(body, filename=f"{vapp_name}.csv"),
             caption=f"📄 Экспорт vApp <b>{vapp_name}</b>",
             parse_mode="HTML"
         )
-        logger.info(f"✅ Файл CSV ('{vapp_name}.csv') отправлен, {len(df_out)} строк.")
+        logger.info(f"✅ Файл CSV ('{vapp_name}.csv') отправлен, {len(data)} строк.")
         await callback.answer()
     except Exception as e:
         logger.exception(f"Ошибка CSV‑экспорта vApp {vapp_name}: {e}")
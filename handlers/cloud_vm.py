@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import bisect
+import html
+import re
+import time
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from globals.config import VCD_CONFIG, VCD_INVENTORY_FRESH_SECONDS, VCD_INVENTORY_REFRESH_SECONDS
+from logger.logger import logger
+from utils.async_cache import StaleWhileRevalidate
+from utils.vcd_client import vcd
+from handlers.cloud_vapp import STATUS_TEXT, status_indicator, csv_bytes, data_age_line
+
+
+# ------------------------------------------------------------------------------
+# ROUTER
+# ------------------------------------------------------------------------------
+router = Router(name=__name__)
+
+CONFIG = VCD_CONFIG
+
+# Атрибуты VMRecord, которые нужны списку ВМ (остальные VCD не присылает)
+VM_QUERY_FIELDS = ("name,containerName,status,numberOfCpus,memoryMB,"
+                   "storageProfileName,ipAddress,totalStorageAllocatedMb")
+# Сколько найденных ВМ показывать в ответе /vmfind
+VMFIND_MAX_RESULTS = 20
+
+_TOKEN_SPLIT = re.compile(r"[^\w]+")
+_IP_QUERY = re.compile(r"^\d{1,3}(\.\d{0,3}){0,3}$")
+
+
+# ------------------------------------------------------------------------------
+# ЗАПИСИ ВМ
+# ------------------------------------------------------------------------------
+class VmQueryRecord:
+    """Одна ВМ из /api/query?type=vm: ресурсы, статус, vApp и основной IP."""
+
+    __slots__ = ("status", "name", "vapp", "vcpu", "ram_gb", "disk_gb", "storage", "ip")
+
+    def __init__(self, status: str, name: str, vapp: str, vcpu: int, ram_gb: float,
+                 disk_gb: float, storage: str, ip: str):
+        self.status = status
+        self.name = name
+        self.vapp = vapp
+        self.vcpu = vcpu
+        self.ram_gb = ram_gb
+        self.disk_gb = disk_gb
+        self.storage = storage
+        self.ip = ip
+
+    @classmethod
+    def from_query(cls, rec: dict) -> "VmQueryRecord":
+        return cls(
+            status=status_indicator(rec.get("status", "")),
+            name=rec.get("name", "—"),
+            vapp=rec.get("containerName", "—"),
+            vcpu=int(rec.get("numberOfCpus", 0)),
+            ram_gb=int(rec.get("memoryMB", 0)) / 1024,
+            disk_gb=int(rec.get("totalStorageAllocatedMb", 0)) / 1024,
+            storage=rec.get("storageProfileName", "—"),
+            ip=rec.get("ipAddress", ""),
+        )
+
+
+def name_tokens(name: str) -> set[str]:
+    """Слова имени в нижнем регистре + имя целиком: «web-01.prod» → web, 01, prod, web-01.prod."""
+    name = name.lower()
+    return {t for t in _TOKEN_SPLIT.split(name) if t} | {name}
+
+
+def ip_prefixes(ip: str) -> list[str]:
+    """Префиксы по октетам: 10.0.1.5 → 10, 10.0, 10.0.1, 10.0.1.5."""
+    octets = ip.split(".")
+    return [".".join(octets[:i]) for i in range(1, len(octets) + 1)]
+
+
+class VmInventory:
+    """
+    Все ВМ VDC + обратные индексы для /vmfind.
+
+    Слово имени → номера ВМ (поиск по началу слова — бинарный поиск по
+    отсортированному словарю), префикс IP по октетам → номера ВМ.
+    Запрос не просматривает весь список.
+    """
+
+    def __init__(self, records: list[VmQueryRecord]):
+        self.records = records
+        self.by_token: dict[str, list[int]] = {}
+        self.by_ip: dict[str, list[int]] = {}
+        for i, vm in enumerate(records):
+            for token in name_tokens(vm.name):
+                self.by_token.setdefault(token, []).append(i)
+            if vm.ip:
+                for prefix in ip_prefixes(vm.ip):
+                    self.by_ip.setdefault(prefix, []).append(i)
+        self._tokens = sorted(self.by_token)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def _token_matches(self, word: str) -> set[int]:
+        """ВМ, у которых есть слово имени, начинающееся с word."""
+        found = set()
+        i = bisect.bisect_left(self._tokens, word)
+        while i < len(self._tokens) and self._tokens[i].startswith(word):
+            found.update(self.by_token[self._tokens[i]])
+            i += 1
+        return found
+
+    def search(self, query: str) -> list[VmQueryRecord]:
+        """ВМ по IP (или его началу по октетам) либо по словам имени — все слова сразу."""
+        query = query.strip().lower()
+        if _IP_QUERY.match(query):
+            hits = set(self.by_ip.get(query.rstrip("."), ()))
+        else:
+            hits = None
+            for word in _TOKEN_SPLIT.split(query):
+                if not word:
+                    continue
+                matches = self._token_matches(word)
+                hits = matches if hits is None else hits & matches
+                if not hits:
+                    break
+        return [self.records[i] for i in sorted(hits or ())]
+
+    def totals(self) -> tuple[int, float, float]:
+        """Сумма vCPU, RAM (ГБ) и диска (ГБ) по всем ВМ."""
+        return (sum(vm.vcpu for vm in self.records),
+                sum(vm.ram_gb for vm in self.records),
+                sum(vm.disk_gb for vm in self.records))
+
+
+# ------------------------------------------------------------------------------
+# CLOUD UTILS
+# ------------------------------------------------------------------------------
+async def _load_vms(cfg) -> VmInventory:
+    """Все ВМ VDC одним постраничным запросом вместо открытия каждой vApp."""
+    start = time.time()
+    logger.info("🚀 Запрос списка ВМ")
+    records = await vcd.query_records("vm", {
+        "filterEncoded": "true",
+        "filter": f"(vdc=={cfg['vdc_id']};isVAppTemplate==false)",
+        "fields": VM_QUERY_FIELDS,
+    })
+    inventory = VmInventory([VmQueryRecord.from_query(rec) for rec in records])
+    logger.info(f"✅ Получено {len(inventory)} ВМ, {time.time()-start:.2f}s")
+    return inventory
+
+
+# Список ВМ: как и список vApp — из памяти, устаревший обновляется в фоне
+vm_inventory = StaleWhileRevalidate(
+    "VM inventory", lambda: _load_vms(CONFIG),
+    fresh_for=VCD_INVENTORY_FRESH_SECONDS, refresh_interval=VCD_INVENTORY_REFRESH_SECONDS,
+)
+
+
+async def get_vms() -> VmInventory:
+    try:
+        return await vm_inventory.get()
+    except Exception as e:
+        logger.exception(f"❌ Ошибка получения списка ВМ: {e}")
+        return vm_inventory.value if vm_inventory.value is not None else VmInventory([])
+
+
+def render_all_vms_csv(inventory: VmInventory) -> bytes:
+    """CSV по всем ВМ VDC со строкой ИТОГО."""
+    header = ["Статус (текст)", "Имя ВМ", "vApp", "IP", "vCPU", "RAM (ГБ)", "Диск (ГБ)", "Storage"]
+    rows = [
+        [STATUS_TEXT.get(vm.status, vm.status), vm.name, vm.vapp, vm.ip,
+         vm.vcpu, round(vm.ram_gb, 1), round(vm.disk_gb, 1), vm.storage]
+        for vm in inventory
+    ]
+    total_cpu, total_ram, total_disk = inventory.totals()
+    rows.append(["", "ИТОГО", f"VM count: {len(inventory)}", "",
+                 total_cpu, round(total_ram, 1), round(total_disk, 1), ""])
+    return csv_bytes(header, rows)
+
+
+def render_vmfind(query: str, found: list[VmQueryRecord]) -> str:
+    query = html.escape(query)
+    if not found:
+        return f"🔍 По запросу <b>{query}</b> ВМ не найдены."
+    lines = [f"🔍 <b>{query}</b>: найдено ВМ — {len(found)}"]
+    for vm in found[:VMFIND_MAX_RESULTS]:
+        lines.append(f"{vm.status} <b>{html.escape(vm.name)}</b> — {vm.ip or 'нет IP'}\n"
+                     f"    📦 {html.escape(vm.vapp)} · {vm.vcpu} vCPU · {vm.ram_gb:.1f} ГБ RAM · "
+                     f"{vm.disk_gb:.1f} ГБ · {html.escape(vm.storage)}")
+    if len(found) > VMFIND_MAX_RESULTS:
+        lines.append(f"… и ещё {len(found) - VMFIND_MAX_RESULTS}, уточни запрос или выгрузи CSV")
+    lines.append(data_age_line(vm_inventory))
+    return "\n".join(lines)
+
+
+# ------------------------------------------------------------------------------
+# HANDLERS
+# ------------------------------------------------------------------------------
+@router.message(Command("vmfind"))
+async def vmfind(message: types.Message, command: CommandObject):
+    """Команда /vmfind <имя|IP> — поиск ВМ по всему VDC"""
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Использование: /vmfind <имя ВМ или IP>\n"
+                             "Например: /vmfind web prod или /vmfind 10.0.1")
+        return
+    try:
+        inventory = await get_vms()
+        await message.answer(render_vmfind(query, inventory.search(query)), parse_mode="HTML")
+    except Exception as e:
+        logger.exception(f"Ошибка /vmfind: {e}")
+        await message.answer("❌ Ошибка поиска ВМ.")
+
+
+@router.callback_query(lambda c: c.data == "allvm_csv")
+async def callback_allvm_csv(callback: types.CallbackQuery):
+    """Экспорт CSV по всем ВМ VDC."""
+    logger.info("📤 Запрошен экспорт CSV для всех ВМ")
+    try:
+        inventory = await get_vms()
+        if not inventory:
+            await callback.answer("⚠️ Нет данных о ВМ.", show_alert=True)
+            return
+
+        await callback.message.answer_document(
+            types.BufferedInputFile(render_all_vms_csv(inventory), filename="VMs_All_Info.csv"),
+            caption=f"📄 Экспорт всех ВМ\n{data_age_line(vm_inventory)}",
+            parse_mode="HTML"
+        )
+        logger.info(f"✅ CSV экспорт успешен: {len(inventory)} ВМ + итого")
+        await callback.answer()
+
+    except Exception as e:
+        logger.exception(f"❌ Ошибка экспорта всех ВМ в CSV: {e}")
+        await callback.answer("Ошибка CSV‑экспорта.", show_alert=True)
@@ -3,9 +3,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from database.db import Database
 from logger.logger import logger
-from utils.messages import format_incident_message
-from utils.keyboards import get_incident_keyboard
-from globals.config import GROUP_ID, TOPIC_ID
+from utils.messages import format_active_line
 from datetime import datetime
 
 router = Router()
@@ -26,9 +24,12 @@ async def help_handler(message: Message):
         "/rules - инструкция по работе с ботом\n"
         "/stats - статистика по инцидентам\n"
         "/active - список активных инцидентов\n"
+        "/maintenance - окна обслуживания (подавление алертов)\n"
+        "/bulk - массовое закрытие/отклонение инцидентов\n"
         "/vpn - управление конфигурациями Wireguard\n"
         "/cloudinfo - информация о ресурсах Cloud\n"
-        "/cloudvapp - статистика и информация по vApp + snapshots + VM"
+        "/cloudvapp - статистика и информация по vApp + snapshots + VM\n"
+        "/vmfind - поиск ВМ по имени или IP"
     )
 
 @router.message(Command(commands=["rules"]))
@@ -52,11 +53,12 @@ async def stats_handler(message: Message, db: Database):
     try:
         # Получаем статистику из базы данных
         async with db.pool.acquire() as conn:
-            total = await conn.fetchval("SELECT COUNT(*) FROM incidents")
-            open_count = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'open'")
-            in_progress = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'in_progress'")
-            closed = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'closed'")
-            rejected = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'rejected'")
+            total = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE NOT suppressed")
+            open_count = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'open' AND NOT suppressed")
+            in_progress = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'in_progress' AND NOT suppressed")
+            closed = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'closed' AND NOT suppressed")
+            rejected = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE status = 'rejected' AND NOT suppressed")
+            suppressed = await conn.fetchval("SELECT COUNT(*) FROM incidents WHERE suppressed")
         
         response = (
             "📊 Статистика инцидентов:\n\n"
@@ -64,7 +66,8 @@ async def stats_handler(message: Message, db: Database):
             f"• Открыто: {open_count}\n"
             f"• В работе: {in_progress}\n"
             f"• Закрыто: {closed}\n"
-            f"• Отклонено: {rejected}"
+            f"• Отклонено: {rejected}\n"
+            f"• Подавлено (обслуживание, флаппинг): {suppressed}"
         )
         await message.answer(response)
     except Exception as e:
@@ -78,32 +81,19 @@ async def active_incidents_handler(message: Message, db: Database):
         # Получаем активные инциденты
         async with db.pool.acquire() as conn:
             incidents = await conn.fetch(
-                "SELECT * FROM incidents WHERE status IN ('open', 'in_progress') ORDER BY created_at DESC"
+                "SELECT * FROM incidents WHERE status IN ('open', 'in_progress') AND NOT suppressed "
+                "AND parent_id IS NULL "
+                "ORDER BY created_at DESC"
             )
         
         if not incidents:
             await message.answer("ℹ️ Активных инцидентов нет.")
             return
             
-        response = "🚨 Активные инциденты:\n\n"
-        for incident in incidents:
-            incident_dict = dict(incident)
-            
-            # Формируем информацию о назначенном пользователе
-            assigned_info = f" - {incident_dict['assigned_to_username']}" if incident_dict['assigned_to_username'] else ""
-            
-            # Формируем ссылку на инцидент
-            if incident_dict.get('message_id'):
-                chat_id = str(GROUP_ID).replace('-100', '')
-                incident_link = f"https://t.me/c/{chat_id}/{incident_dict['message_id']}"
-            else:
-                incident_link = f"(ID: #{incident_dict['id']})"
-            
-            response += (
-                f"• #{incident_dict['id']} - {incident_dict['event']} "
-                f"({incident_dict['status']}){assigned_info} - {incident_link}\n"
-            )
-        
+        response = "🚨 Активные инциденты:\n\n" + "".join(
+            format_active_line(dict(incident)) for incident in incidents
+        )
+
         await message.answer(response)
     except Exception as e:
         logger.error(f"Ошибка при получении активных инцидентов: {e}")
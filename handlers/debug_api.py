@@ -0,0 +1,83 @@
+import secrets
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from logger.logger import logger
+from globals.config import DEBUG_API_TOKEN, PROFILE_MAX_SECONDS
+from utils.profiler import profile_cpu, profile_memory, ProfilerBusyError
+from utils.circuit_breaker import STATE_VALUE
+from utils.vcd_client import vcd
+
+router = APIRouter(prefix="/debug")
+
+
+def check_debug_token(token: str | None):
+    """Служебные эндпоинты доступны только с токеном из DEBUG_API_TOKEN."""
+    if not DEBUG_API_TOKEN:
+        # не настроено — делаем вид, что эндпоинта нет
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not secrets.compare_digest(token, DEBUG_API_TOKEN):
+        logger.warning("Отказ в доступе к /debug: неверный токен")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/profile")
+async def debug_profile(
+    seconds: int = Query(10, ge=1, le=PROFILE_MAX_SECONDS),
+    mode: str = Query("cpu", pattern="^(cpu|mem)$"),
+    x_debug_token: str | None = Header(default=None),
+):
+    """
+    Профилирование живого процесса на N секунд.
+    mode=cpu — файл pstats, mode=mem — diff снимков tracemalloc.
+    """
+    check_debug_token(x_debug_token)
+    logger.info(f"Запрошено профилирование через API: mode={mode}, seconds={seconds}")
+
+    try:
+        if mode == "mem":
+            filename, payload = await profile_memory(seconds)
+            media_type = "text/plain; charset=utf-8"
+        else:
+            filename, payload, _ = await profile_cpu(seconds)
+            media_type = "application/octet-stream"
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return Response(
+        content=payload,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# Метрики групп эндпоинтов VCD: (имя, тип, описание, поле stats())
+VCD_METRICS = [
+    ("vcd_circuit_state", "gauge", "VCD circuit breaker state: 0 closed, 1 half-open, 2 open", "state"),
+    ("vcd_circuit_failures", "gauge", "Consecutive failed VCD requests", "failures"),
+    ("vcd_circuit_opened_total", "counter", "Times the VCD circuit breaker opened", "opened_total"),
+    ("vcd_circuit_rejected_total", "counter", "VCD requests rejected by an open circuit", "rejected_total"),
+    ("vcd_request_attempts_total", "counter", "VCD request attempts, retries included", "attempts_total"),
+    ("vcd_request_retries_total", "counter", "VCD request retries", "retries_total"),
+    ("vcd_request_failures_total", "counter", "VCD attempts failed with a network error, timeout, 429 or 5xx",
+     "failures_total"),
+]
+
+
+def render_metrics() -> str:
+    """Метрики в текстовом формате Prometheus."""
+    stats = vcd.stats()
+    lines = []
+    for name, kind, help_text, field in VCD_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for group, values in stats.items():
+            value = values[field]
+            if field == "state":
+                value = STATE_VALUE[value]
+            lines.append(f'{name}{{endpoint="{group}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics")
+async def debug_metrics(x_debug_token: str | None = Header(default=None)):
+    """Состояние автоматов и счётчики запросов к VCD (для Prometheus)."""
+    check_debug_token(x_debug_token)
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
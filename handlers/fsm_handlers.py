@@ -3,13 +3,12 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.exceptions import TelegramBadRequest
 from database.db import Database
 from logger.logger import logger
-from globals.config import GROUP_ID, TOPIC_ID
 from datetime import datetime
-from utils.messages import format_incident_message
-from utils.keyboards import get_incident_keyboard
+from utils.notifier import refresh_incident
+from utils.keyed_lock import incident_locks
+from utils.escalation import escalations
 from datetime import datetime, timezone
 
 router = Router()
@@ -18,31 +17,12 @@ class IncidentStates(StatesGroup):
     waiting_for_comment = State()
     waiting_for_reassign = State()
 
-async def safe_edit_message(
-    bot, 
-    chat_id: int, 
-    message_id: int, 
-    text: str, 
-    reply_markup: InlineKeyboardMarkup = None
-):
-    """Безопасное редактирование сообщения с обработкой ошибок"""
-    try:
-        await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            parse_mode="HTML",
-            reply_markup=reply_markup
-        )
-        return True
-    except TelegramBadRequest as e:
-        if "message to edit not found" in str(e).lower() or "message is not modified" in str(e).lower():
-            logger.warning(f"Message edit failed: {e}")
-        else:
-            logger.error(f"Telegram API error during message edit: {e}", exc_info=True)
-    except Exception as e:
-        logger.error(f"Unexpected error during message edit: {e}", exc_info=True)
-    return False
+async def release_inflight(state: FSMContext):
+    """Снимает метку «в процессе», поставленную CallbackDedupMiddleware."""
+    key = (await state.get_data()).get("inflight_key")
+    if key:
+        incident_locks.release(tuple(key))
+
 
 @router.callback_query(F.data.startswith("take_"))
 async def take_in_work(callback: CallbackQuery, state: FSMContext):
@@ -157,33 +137,27 @@ async def self_assign_incident(callback: CallbackQuery, state: FSMContext, db: D
 
         logger.info(f"User {username} (ID: {user_id}) self-assigned to incident #{incident_id}")
 
-        success = await db.update_incident(
-            incident_id=incident_id,
-            assigned_to_username=username,
-            assigned_to_user_id=user_id
-        )
+        async with incident_locks.lock(incident_id):
+            success = await db.update_incident(
+                incident_id=incident_id,
+                assigned_to_username=username,
+                assigned_to_user_id=user_id
+            )
 
-        if not success:
-            await callback.answer("❌ Failed to update incident")
-            return
+            if not success:
+                await callback.answer("❌ Failed to update incident")
+                return
 
-        incident = await db.get_incident(incident_id)
-        if not incident:
-            await callback.answer("❌ Incident not found")
-            return
+            incident = await db.get_incident(incident_id)
+            if not incident:
+                await callback.answer("❌ Incident not found")
+                return
 
-        text = format_incident_message(incident)
-        keyboard = await get_incident_keyboard(incident_id, db)
-
-        await safe_edit_message(
-            callback.bot,
-            GROUP_ID,
-            callback.message.message_id - 1,
-            text,
-            keyboard
-        )
+            await refresh_incident(db, incident, bot=callback.bot,
+                                   fallback_message_id=callback.message.message_id - 1)
 
         await callback.message.answer(f"✅ You've been assigned to incident #{incident_id}")
+        await release_inflight(state)
         await state.clear()
         await callback.answer()
     except Exception as e:
@@ -192,6 +166,7 @@ async def self_assign_incident(callback: CallbackQuery, state: FSMContext, db: D
 
 @router.callback_query(F.data == "cancel_reassign")
 async def cancel_reassign(callback: CallbackQuery, state: FSMContext):
+    await release_inflight(state)
     await state.clear()
     await callback.message.answer("❌ Reassignment canceled")
     await callback.answer()
@@ -209,33 +184,27 @@ async def process_reassign(message: Message, state: FSMContext, db: Database):
 
         logger.info(f"Reassigning incident #{incident_id} to {username}")
 
-        success = await db.update_incident(
-            incident_id=incident_id,
-            assigned_to_username=username,
-            assigned_to_user_id=None  # User ID unknown for manual assignment
-        )
+        async with incident_locks.lock(incident_id):
+            success = await db.update_incident(
+                incident_id=incident_id,
+                assigned_to_username=username,
+                assigned_to_user_id=None  # User ID unknown for manual assignment
+            )
 
-        if not success:
-            await message.answer("❌ Failed to update incident")
-            return
+            if not success:
+                await message.answer("❌ Failed to update incident")
+                return
 
-        incident = await db.get_incident(incident_id)
-        if not incident:
-            await message.answer("❌ Incident not found")
-            return
+            incident = await db.get_incident(incident_id)
+            if not incident:
+                await message.answer("❌ Incident not found")
+                return
 
-        text = format_incident_message(incident)
-        keyboard = await get_incident_keyboard(incident_id, db)
-
-        await safe_edit_message(
-            message.bot,
-            GROUP_ID,
-            data.get("original_message_id"),
-            text,
-            keyboard
-        )
+            await refresh_incident(db, incident, bot=message.bot,
+                                   fallback_message_id=data.get("original_message_id"))
 
         await message.answer(f"✅ Incident #{incident_id} reassigned to {username}")
+        await release_inflight(state)
         await state.clear()
     except Exception as e:
         logger.error(f"Error in process_reassign: {e}", exc_info=True)
@@ -283,26 +252,29 @@ async def process_comment(message: Message, state: FSMContext, db: Database):
                 "comment": comment
             }
 
-        success = await db.update_incident(incident_id, **update_data)
-        if not success:
-            await message.answer("❌ Failed to update incident")
-            return
+        async with incident_locks.lock(incident_id):
+            success = await db.update_incident(incident_id, **update_data)
+            if not success:
+                await message.answer("❌ Failed to update incident")
+                return
 
-        incident = await db.get_incident(incident_id)
-        if not incident:
-            await message.answer("❌ Incident not found")
-            return
+            # взят в работу, отклонён или закрыт — напоминания больше не нужны
+            escalations.disarm(incident_id)
 
-        text = format_incident_message(incident)
-        keyboard = await get_incident_keyboard(incident_id, db)
+            # закрытие родителя закрывает и весь каскад
+            children = []
+            if action in ("close", "reject"):
+                children = await db.close_children(
+                    incident_id, update_data["status"], username, user_id, comment
+                )
 
-        await safe_edit_message(
-            message.bot,
-            GROUP_ID,
-            original_message_id,
-            text,
-            keyboard
-        )
+            incident = await db.get_incident(incident_id)
+            if not incident:
+                await message.answer("❌ Incident not found")
+                return
+
+            await refresh_incident(db, incident, bot=message.bot,
+                                   fallback_message_id=original_message_id)
 
         action_text = {
             "take": "taken in work",
@@ -310,6 +282,8 @@ async def process_comment(message: Message, state: FSMContext, db: Database):
             "close": "closed"
         }.get(action, "processed")
 
+        if children:
+            action_text += f" (+{len(children)} related)"
         await message.answer(f"✅ Incident #{incident_id} {action_text}!")
         logger.info(f"Incedent #{incident_id} processed: action={action}, user={username}")
 
@@ -319,6 +293,7 @@ async def process_comment(message: Message, state: FSMContext, db: Database):
         logger.error(f"Error processing comment: {e}", exc_info=True)
         await message.answer("❌ An error occurred while processing your request")
     finally:
+        await release_inflight(state)
         await state.clear()
 
 @router.callback_query(F.data.startswith("reopen_"))
@@ -331,37 +306,32 @@ async def reopen_incident(callback: CallbackQuery, state: FSMContext, db: Databa
 
         logger.info(f"User {username} (ID: {user_id}) reopening incident #{incident_id}")
 
-        # Обновляем статус инцидента на "open"
-        success = await db.update_incident(
-            incident_id=incident_id,
-            status="open",
-            assigned_to_username=None,
-            assigned_to_user_id=None,
-            closed_by_username=None,
-            closed_by_user_id=None,
-            closed_at=None,
-            comment=None
-        )
-
-        if not success:
-            await callback.answer("❌ Failed to reopen incident")
-            return
-
-        incident = await db.get_incident(incident_id)
-        if not incident:
-            await callback.answer("❌ Incident not found")
-            return
-
-        text = format_incident_message(incident)
-        keyboard = await get_incident_keyboard(incident_id, db)
-
-        await safe_edit_message(
-            callback.bot,
-            GROUP_ID,
-            callback.message.message_id,
-            text,
-            keyboard
-        )
+        async with incident_locks.lock(incident_id):
+            # Обновляем статус инцидента на "open"
+            success = await db.update_incident(
+                incident_id=incident_id,
+                status="open",
+                assigned_to_username=None,
+                assigned_to_user_id=None,
+                closed_by_username=None,
+                closed_by_user_id=None,
+                closed_at=None,
+                comment=None
+            )
+
+            if not success:
+                await callback.answer("❌ Failed to reopen incident")
+                return
+
+            await escalations.rearm(incident_id)
+
+            incident = await db.get_incident(incident_id)
+            if not incident:
+                await callback.answer("❌ Incident not found")
+                return
+
+            await refresh_incident(db, incident, bot=callback.bot,
+                                   fallback_message_id=callback.message.message_id)
 
         await callback.answer(f"✅ Incident #{incident_id} reopened")
     except Exception as e:
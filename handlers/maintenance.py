@@ -0,0 +1,136 @@
+import html
+import re
+from datetime import datetime, timedelta, timezone
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from logger.logger import logger
+from utils.maintenance import maintenance, validate_pattern
+from utils.messages import TIME_FORMAT
+
+router = Router()
+
+USAGE = (
+    "🛠 Окна обслуживания — алерты с подходящих узлов сохраняются, но не отправляются.\n\n"
+    "Использование:\n"
+    "/maintenance add &lt;узел&gt; &lt;с&gt; &lt;по&gt; [комментарий]\n"
+    "/maintenance list\n"
+    "/maintenance del &lt;id&gt;\n\n"
+    "Узел: имя, префикс с * (db-*) или * для всех.\n"
+    "Время (UTC-0): now, +30m / +2h / +1d, ЧЧ:ММ (сегодня) или 2025-01-31T22:00"
+)
+
+_RELATIVE = re.compile(r"^\+(\d+)([mhd])$")
+_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+
+def parse_time(value: str, now: datetime, base: datetime | None = None) -> datetime:
+    """
+    Разбирает время окна. Относительное (+2h) для конца окна считается от
+    начала (base); ЧЧ:ММ раньше base переносится на следующий день.
+    """
+    value = value.strip().lower()
+    anchor = base or now
+    if value == "now":
+        return now
+
+    match = _RELATIVE.match(value)
+    if match:
+        return anchor + timedelta(**{_UNITS[match.group(2)]: int(match.group(1))})
+
+    if re.fullmatch(r"\d{1,2}:\d{2}", value):
+        hours, minutes = map(int, value.split(":"))
+        result = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+        if base is not None and result <= base:
+            result += timedelta(days=1)
+        return result
+
+    result = datetime.fromisoformat(value)
+    return result if result.tzinfo else result.replace(tzinfo=timezone.utc)
+
+
+def format_window(window: dict) -> str:
+    starts_at = window["starts_at"].astimezone(timezone.utc).strftime(TIME_FORMAT)
+    ends_at = window["ends_at"].astimezone(timezone.utc).strftime(TIME_FORMAT)
+    line = f"• #{window['id']} <b>{html.escape(window['node_pattern'])}</b>: {starts_at} — {ends_at}"
+    if window.get("comment"):
+        line += f" ({html.escape(window['comment'])})"
+    return line
+
+
+@router.message(Command("maintenance"))
+async def cmd_maintenance(message: Message):
+    user = message.from_user
+    username = f"@{user.username}" if user.username else user.full_name
+    args = message.text.split(maxsplit=5)
+
+    logger.info(f"/maintenance вызвал [{user.id}|{username}] → args={args[1:]}")
+
+    if len(args) < 2:
+        await message.answer(USAGE)
+        return
+
+    action = args[1].lower()
+    try:
+        if action == "list":
+            await _list_windows(message)
+        elif action == "add" and len(args) >= 5:
+            await _add_window(message, args, username)
+        elif action == "del" and len(args) == 3 and args[2].lstrip("#").isdigit():
+            await _delete_window(message, int(args[2].lstrip("#")))
+        else:
+            await message.answer(USAGE)
+    except Exception as e:
+        logger.error(f"Ошибка /maintenance {action}: {e}", exc_info=True)
+        await message.answer("⚠️ Произошла ошибка при работе с окнами обслуживания. Попробуйте позже.")
+
+
+async def _list_windows(message: Message):
+    now = datetime.now(timezone.utc)
+    windows = [w for w in maintenance.active() if w["ends_at"] > now]
+    if not windows:
+        await message.answer("ℹ️ Окон обслуживания нет.")
+        return
+    await message.answer("🛠 Окна обслуживания:\n\n" + "\n".join(format_window(w) for w in windows))
+
+
+async def _add_window(message: Message, args: list[str], username: str):
+    pattern = args[2]
+    comment = args[5] if len(args) > 5 else None
+    now = datetime.now(timezone.utc)
+
+    try:
+        validate_pattern(pattern)
+        starts_at = parse_time(args[3], now)
+        ends_at = parse_time(args[4], now, base=starts_at)
+    except ValueError as e:
+        await message.answer(f"❌ {html.escape(str(e))}\n\n{USAGE}")
+        return
+
+    if ends_at <= starts_at or ends_at <= now:
+        await message.answer("❌ Конец окна должен быть позже начала и позже текущего времени.")
+        return
+
+    window = await maintenance.add(
+        pattern, starts_at, ends_at,
+        comment=comment,
+        created_by_username=username,
+        created_by_user_id=message.from_user.id,
+        chat_id=message.chat.id,
+        topic_id=message.message_thread_id
+    )
+    if not window:
+        await message.answer("❌ Не удалось сохранить окно обслуживания")
+        return
+
+    logger.info(f"Окно обслуживания #{window['id']} создано: {pattern} {starts_at} — {ends_at}")
+    await message.answer("✅ Окно обслуживания создано:\n" + format_window(window))
+
+
+async def _delete_window(message: Message, window_id: int):
+    window = await maintenance.remove(window_id)
+    if not window:
+        await message.answer(f"❌ Окно #{window_id} не найдено")
+        return
+    logger.info(f"Окно обслуживания #{window_id} удалено")
+    await message.answer(f"🗑 Окно обслуживания #{window_id} удалено")
@@ -0,0 +1,76 @@
+import html
+from aiogram import Router
+from aiogram.types import Message, BufferedInputFile
+from aiogram.filters import Command
+from logger.logger import logger
+from globals.config import ADMIN_IDS, PROFILE_MAX_SECONDS
+from utils.profiler import profile_cpu, profile_memory, clamp_seconds, ProfilerBusyError
+
+router = Router()
+
+DEFAULT_SECONDS = 10
+CAPTION_LIMIT = 1000  # лимит подписи к документу (1024) с запасом на теги
+
+USAGE = (
+    "❌ Неправильный вызов.\n\n"
+    "Использование:\n"
+    f"🔬 /profile N — cProfile на N секунд (1…{PROFILE_MAX_SECONDS}), файл .pstats\n"
+    "🧠 /profile mem N — рост памяти (tracemalloc diff) за N секунд"
+)
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message):
+    telegram_id = message.from_user.id
+    username = message.from_user.username or message.from_user.full_name
+    args = message.text.split()
+
+    logger.info(f"/profile вызвал [{telegram_id}|@{username}] → args={args}")
+
+    # --- проверка прав ---
+    if telegram_id not in ADMIN_IDS:
+        await message.answer(
+            "❌ Такой команды не существует!\n\n"
+            "ℹ️ Посмотреть список всех доступных команд можно здесь: /help"
+        )
+        logger.warning(f"⛔ Пользователь [{telegram_id}|@{username}] попытался вызвать /profile без доступа")
+        return
+
+    # --- разбор аргументов: /profile [mem] [N] ---
+    mode = "cpu"
+    rest = args[1:]
+    if rest and rest[0] == "mem":
+        mode = "mem"
+        rest = rest[1:]
+
+    if len(rest) > 1 or (rest and not rest[0].isdigit()):
+        await message.answer(USAGE)
+        return
+    seconds = clamp_seconds(int(rest[0]) if rest else DEFAULT_SECONDS)
+
+    await message.answer(f"⏳ Профилирование ({mode}) на {seconds} с…")
+
+    try:
+        if mode == "mem":
+            filename, payload = await profile_memory(seconds)
+            caption = f"🧠 tracemalloc diff за {seconds} с"
+        else:
+            filename, payload, summary = await profile_cpu(seconds)
+            caption = (
+                f"🔬 cProfile за {seconds} с\n"
+                f"<pre>{html.escape(summary[:CAPTION_LIMIT - 100])}</pre>"
+            )
+    except ProfilerBusyError:
+        await message.answer("⚠️ Профилирование уже выполняется, попробуйте позже.")
+        return
+    except Exception as e:
+        logger.error(f"/profile: ошибка профилирования: {e}", exc_info=True)
+        await message.answer(f"❌ Ошибка профилирования: {e}")
+        return
+
+    await message.answer_document(
+        BufferedInputFile(payload, filename=filename),
+        caption=caption,
+        parse_mode="HTML",
+    )
+    logger.info(f"[admin:{telegram_id}] получил профиль {filename} ({len(payload)} байт)")
@@ -16,6 +16,7 @@ from aiogram.types import BufferedInputFile
 from hashlib import sha1
 from globals.config import WG_SERVERS
 from logger.logger import logger
+from utils.edit_coalescer import edit_coalescer
 
 
 # ===================================================
@@ -212,15 +213,20 @@ async def _send_or_edit(target, text, state: FSMContext,
     # если есть старое меню и разрешено редактирование
     if message_id and not force_new:
         try:
-            await target.bot.edit_message_text(
+            # меню интерактивное — без задержки, но одинаковые правки
+            # и правки из одной итерации цикла склеиваются
+            await edit_coalescer.edit(
+                target.bot,
                 chat_id=target.chat.id,
                 message_id=message_id,
                 text=text,
                 parse_mode=parse_mode,
-                reply_markup=reply_markup
+                reply_markup=reply_markup,
+                window=0
             )
             return
         except Exception as e:
+            edit_coalescer.forget(target.chat.id, message_id)
             if "can't be edited" not in str(e):
                 try:
                     await target.bot.delete_message(target.chat.id, message_id)
@@ -229,9 +235,24 @@ async def _send_or_edit(target, text, state: FSMContext,
             # если нельзя редактировать — создаём заново
 
     sent = await target.answer(text, parse_mode=parse_mode, reply_markup=reply_markup)
+    edit_coalescer.remember(target.chat.id, sent.message_id, text, reply_markup)
     await state.update_data(last_menu_id=sent.message_id)
 
 
+async def _edit_menu(query: CallbackQuery, text, parse_mode=None, reply_markup=None):
+    """Правка меню под кнопкой — тоже через склейку, иначе она не узнает
+    о новом содержимом и отбросит возврат «Назад» к прежнему экрану."""
+    await edit_coalescer.edit(
+        query.bot,
+        chat_id=query.message.chat.id,
+        message_id=query.message.message_id,
+        text=text,
+        parse_mode=parse_mode,
+        reply_markup=reply_markup,
+        window=0
+    )
+
+
 # ===================================================
 # /vpn — список всех конфигураций
 # ===================================================
@@ -494,7 +515,7 @@ async def iface_edit_start(query: CallbackQuery, state: FSMContext):
     kb.inline_keyboard.append([InlineKeyboardButton(text="⬅ Назад", callback_data=f"iface:{iface}")])
 
     await state.update_data(iface=iface)
-    await query.message.edit_text("Выбери параметр для изменения:", reply_markup=kb)
+    await _edit_menu(query, "Выбери параметр для изменения:", reply_markup=kb)
     await query.answer()
     logger.debug(f"[VPN] Интерфейс {iface}: показан список параметров для изменения")
 
@@ -524,7 +545,7 @@ async def iface_field_selected(query: CallbackQuery, state: FSMContext):
         f"Введите новое значение для *{field}*.\n"
         f"Текущее: `{current_value}`"
     )
-    await query.message.edit_text(text, parse_mode="Markdown", reply_markup=kb)
+    await _edit_menu(query, text, parse_mode="Markdown", reply_markup=kb)
     await query.answer()
     logger.debug(f"[VPN] Интерфейс {iface}, поле {field}: текущее значение '{current_value}' показано пользователю")
 
@@ -919,7 +940,7 @@ async def peer_edit_field_selected(query: CallbackQuery, state: FSMContext):
     ])
 
     # редактируем существующее сообщение, а не создаём новое
-    await query.message.edit_text(text, parse_mode="Markdown", reply_markup=kb)
+    await _edit_menu(query, text, parse_mode="Markdown", reply_markup=kb)
     await query.answer()
 
 
@@ -1,11 +1,22 @@
+import asyncio
+import hashlib
 import logging
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from aiogram import Bot
+from database.db import INCIDENT_FIELDS
+from globals.config import SSE_HEARTBEAT_SECONDS, ALERT_RETRY_AFTER
 from logger.logger import logger
-from globals.config import BOT_TOKEN, GROUP_ID, TOPIC_ID
-from utils.messages import format_incident_message
-from utils.keyboards import get_incident_keyboard
+from utils.admission import alert_admission, Saturated
+from utils.alert_router import alert_router
+from utils.broadcaster import incident_events
+from utils.correlation import correlator
+from utils.outbox import SEND_INCIDENT
+from utils.escalation import escalations
+from utils.flapping import flap_detector
+from utils.json_response import FastJSONResponse
+from utils.maintenance import maintenance
+from utils.notifier import send_incident, reserve_now
 
 router = APIRouter()
 
@@ -16,17 +27,52 @@ class ZabbixAlert(BaseModel):
     trigger: str
     severity: str
     details: str
+    # PROBLEM / OK; без состояния алерт считается новым срабатыванием
+    state: str | None = None
 
-@router.post("/alert")
+
+RECOVERY_STATES = {"ok", "resolved", "recovery", "0"}
+
+
+def parse_state(state: str | None) -> bool | None:
+    """True — проблема, False — восстановление, None — не передано."""
+    if state is None or not state.strip():
+        return None
+    return state.strip().lower() not in RECOVERY_STATES
+
+async def admit_alert():
+    """Допуск на /alert: при перегрузке — 429, Zabbix повторит отправку."""
+    try:
+        async with alert_admission.slot():
+            yield
+    except Saturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many alerts in flight, retry later",
+            headers={"Retry-After": str(ALERT_RETRY_AFTER)}
+        )
+
+
+@router.post("/alert", dependencies=[Depends(admit_alert)])
 async def receive_alert(alert: ZabbixAlert, request: Request):
     try:
         logger.info(f"Received Zabbix alert: #{alert.incident_id}")
         
         # Получаем экземпляр базы данных из состояния приложения
         db = request.app.state.db
-        
-        # Сохранение в базу данных
-        incident_id = await db.create_incident({
+
+        # Узел в окне обслуживания — сохраняем с пометкой и ничего не отправляем
+        window = maintenance.find(alert.node)
+
+        # История смен состояния триггера: флаппинг приглушает повторы
+        problem = parse_state(alert.state)
+        flap = flap_detector.observe(alert.node, alert.trigger, problem)
+        if problem is False:
+            # восстановление инцидент не создаёт, только пополняет историю
+            return {"status": "recorded", "flapping": flap.flapping}
+        throttled = flap.flapping and not flap.notify
+
+        data = {
             "event": alert.event,
             "node": alert.node,
             "trigger": alert.trigger,
@@ -37,37 +83,237 @@ async def receive_alert(alert: ZabbixAlert, request: Request):
             "assigned_to_user_id": None,
             "closed_by_username": None,
             "closed_by_user_id": None,
-            "message_id": None  # Будет обновлено после отправки сообщения
-        })
-        
+            "message_id": None,  # Будет обновлено после отправки сообщения
+            "suppressed": window is not None or throttled,
+            "maintenance_id": window["id"] if window else None,
+            "flapping": flap.flapping,
+            "parent_id": None
+        }
+
+        # Каскад: алерт с того же (или зависимого) узла, не критичнее и с тем же
+        # маршрутом, сохраняется дочерним к недавнему инциденту
+        parent, incident_id = None, None
+        if window is None and not throttled:
+            parent, incident_id = await correlator.attach(db, data)
+
+        # Отдельный API‑процесс: в Telegram отправляет процесс бота (задание в outbox)
+        queued = (getattr(request.app.state, "use_outbox", False)
+                  and window is None and not throttled and parent is None)
+
+        if parent is None:
+            # Сохранение в базу данных
+            incident_id = await db.create_incident(data, outbox_kind=SEND_INCIDENT if queued else None)
+
         if incident_id == -1:
             raise HTTPException(status_code=500, detail="Failed to save incident")
-        
+
+        if window:
+            logger.info(f"Incident #{incident_id} suppressed by maintenance window #{window['id']}")
+            return {
+                "status": "suppressed",
+                "incident_id": incident_id,
+                "maintenance_id": window["id"]
+            }
+
+        if throttled:
+            logger.info(f"Incident #{incident_id} throttled: trigger is flapping ({flap.percent:.0f}%)")
+            return {
+                "status": "throttled",
+                "incident_id": incident_id,
+                "flap_percent": round(flap.percent, 1)
+            }
+
+        if parent:
+            logger.info(f"Incident #{incident_id} correlated with parent #{parent['id']}")
+            correlator.schedule_refresh(db, parent["id"])
+            return {
+                "status": "correlated",
+                "incident_id": incident_id,
+                "parent_id": parent["id"]
+            }
+
         # Получаем данные инцидента
         incident = await db.get_incident(incident_id)
-        text = format_incident_message(incident)
-        
-        # Передаём существующий экземпляр db в функцию
-        keyboard = await get_incident_keyboard(incident_id, db)
-
-        # Отправка в Telegram
-        async with Bot(token=BOT_TOKEN) as bot:
-            message = await bot.send_message(
-                chat_id=GROUP_ID,
-                message_thread_id=int(TOPIC_ID),
-                text=text,
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
-            
-            # Сохраняем ID сообщения в базу данных
-            await db.update_incident(
-                incident_id=incident_id,
-                message_id=message.message_id
-            )
-         
-        return {"status": "success", "message_id": message.message_id}
+        # регистрируем до отправки, чтобы одновременный всплеск тоже склеился
+        correlator.register(incident)
+
+        if queued:
+            logger.info(f"Incident #{incident_id} queued for delivery")
+            return {"status": "queued", "incident_id": incident_id}
+
+        # Отправка в Telegram во все чаты/темы маршрута
+        targets = alert_router.resolve(alert.severity, alert.node, alert.trigger)
+        if not reserve_now(targets):
+            # лимит чата исчерпан (шторм): ждать токен в запросе нельзя —
+            # отправку выполнит обработчик outbox в фоне
+            if await db.enqueue_outbox(SEND_INCIDENT, incident_id) is None:
+                raise HTTPException(status_code=500, detail="Failed to queue incident")
+            logger.info(f"Incident #{incident_id} queued: Telegram rate limit reached")
+            return {"status": "queued", "incident_id": incident_id}
+        sent = await send_incident(db, incident, targets, reserved=True)
+        if not sent:
+            raise HTTPException(status_code=502, detail="Failed to deliver incident to Telegram")
+
+        # Таймеры напоминаний, пока инцидент не возьмут в работу
+        escalations.arm(incident)
+
+        return {
+            "status": "success",
+            "message_id": sent[0].message_id,
+            "targets": len(sent)
+        }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing alert: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- REST API только для чтения (дашборды) ---
+DEFAULT_FIELDS = [
+    "id", "event", "node", "trigger", "status", "severity", "created_at",
+    "updated_at", "assigned_to_username", "closed_at", "child_count"
+]
+MAX_PAGE_SIZE = 500
+
+
+def _split(value: str | None) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()] if value else []
+
+
+def _parse_fields(value: str | None) -> list[str]:
+    fields = _split(value) or DEFAULT_FIELDS
+    unknown = [f for f in fields if f not in INCIDENT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def _json_response(content, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+@router.get("/incidents/stats")
+async def incident_stats(request: Request):
+    try:
+        db = request.app.state.db
+        # версия таблицы из индексов: при неизменных данных ответ 304 без подсчёта
+        etag = _etag("stats", *await db.get_incidents_version())
+        if _not_modified(request, etag):
+            return _not_modified_response(etag)
+        stats = await db.get_incident_stats()
+        return _json_response(stats, etag)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting incident stats: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to get incident stats")
+
+
+@router.get("/incidents")
+async def list_incidents(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: int | None = Query(None, ge=1, description="next_cursor предыдущей страницы"),
+    fields: str | None = Query(None, description="Колонки через запятую"),
+    status: str | None = Query(None, description="open,in_progress,..."),
+    node: str | None = None,
+    severity: str | None = Query(None, description="Уровни через запятую"),
+    include_suppressed: bool = False
+):
+    try:
+        db = request.app.state.db
+        field_list = _parse_fields(fields)
+
+        etag = _etag("list", *await db.get_incidents_version(), str(request.url.query))
+        if _not_modified(request, etag):
+            return _not_modified_response(etag)
+
+        # берём на одну запись больше, чтобы понять, есть ли следующая страница
+        rows = await db.list_incidents(
+            field_list, limit + 1,
+            before_id=cursor,
+            status=_split(status),
+            node=node,
+            severity=_split(severity),
+            include_suppressed=include_suppressed
+        )
+        items = rows[:limit]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return _json_response({"items": items, "next_cursor": next_cursor}, etag)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing incidents: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to list incidents")
+
+
+@router.get("/incidents/stream")
+async def incident_stream(request: Request):
+    """SSE: событие incident на каждую вставку/изменение инцидента."""
+    subscriber = incident_events.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers",
+                            headers={"Retry-After": "30"})
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # комментарий‑пинг держит соединение через прокси
+                    yield ": ping\n\n"
+                    continue
+                if payload is None:
+                    # клиент не успевал читать и был отключён
+                    break
+                yield f"event: incident\ndata: {payload}\n\n"
+        finally:
+            incident_events.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/incidents/{incident_id}")
+async def read_incident(request: Request, incident_id: int, fields: str | None = None):
+    db = request.app.state.db
+    field_list = _parse_fields(fields) if fields else list(INCIDENT_FIELDS)
+
+    try:
+        incident = await db.fetch_incident(incident_id)
+    except Exception as e:
+        # сбой БД — не «нет такого инцидента»: клиент должен повторить запрос
+        logger.error(f"Error reading incident #{incident_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail="Failed to read incident")
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    etag = _etag("incident", incident_id, incident["updated_at"], tuple(field_list))
+    if _not_modified(request, etag):
+        return _not_modified_response(etag)
+    return _json_response({f: incident.get(f) for f in field_list}, etag)
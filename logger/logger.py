@@ -1,4 +1,5 @@
 import logging
+import logging.handlers
 import sys
 import io
 from pathlib import Path
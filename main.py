@@ -1,30 +1,88 @@
+import argparse
 import asyncio
 import signal
-from aiogram import Bot, Dispatcher
-from aiogram.client.bot import DefaultBotProperties
+from contextlib import asynccontextmanager
+from aiogram import Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from fastapi import FastAPI
 import uvicorn
 from database.db import Database
 from handlers import commands, fsm_handlers, unknown, zabbix_api, vpn
 from handlers import logs_pm
+from handlers import profile_pm, debug_api
 from handlers import cloud
-from handlers import cloud_vapp
+from handlers import cloud_vapp, cloud_vm
+from handlers import maintenance as maintenance_cmd
+from handlers import bulk
 from logger.logger import logger
-from globals.config import BOT_TOKEN, DB_DSN
+from globals.config import DB_DSN, RUN_MODE, API_WORKERS, API_HOST, API_PORT, METRICS_PORT, VCD_CONFIG
 from middlewares.admin_filter import AdminAccessMiddleware
+from middlewares.callback_dedup import CallbackDedupMiddleware
+from middlewares.secondary_bot import SecondaryBotMiddleware
+from utils.bot_pool import bot_pool
+from utils.broadcaster import on_incident_notify
+from database.queries import INCIDENT_CHANNEL
+from utils.correlation import correlator
+from utils.escalation import escalations
+from utils.maintenance import maintenance
+from utils.outbox import outbox_worker
+from utils.vcd_client import vcd
+
+RUN_MODES = ("all", "api", "bot")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Отдельный API‑процесс (--mode api): своё подключение к БД, индексы
+    подавления и каскадов. Отправку в Telegram выполняет процесс бота —
+    новые инциденты передаются ему через outbox.
+    В режиме all БД уже подключена Application, здесь ничего не делаем.
+    """
+    if getattr(app.state, "db", None) is not None:
+        yield
+        return
+
+    db = Database()
+    if not await db.connect(DB_DSN):
+        raise RuntimeError("Database connection failed")
+    app.state.db = db
+    app.state.use_outbox = True
+    correlator.use_db_lookup = True
+    correlator.use_outbox = True
+    db.add_listener(INCIDENT_CHANNEL, on_incident_notify)
+    await maintenance.start(db, summaries=False)
+    await correlator.load(db)
+    logger.info("API worker started")
+    try:
+        yield
+    finally:
+        await maintenance.stop()
+        await db.stop_listeners()
+        await db.pool.close()
+        app.state.db = None
+        logger.info("API worker stopped")
+
 
 # --- FastAPI-приложение (API сервер) ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(zabbix_api.router)
+app.include_router(debug_api.router)
+
+# --- Служебный HTTP процесса бота (--mode bot): метрики VCD и профилирование ---
+debug_app = FastAPI()
+debug_app.include_router(debug_api.router)
 
 
 class Application:
-    def __init__(self):
+    def __init__(self, mode: str = "all"):
+        self.mode = mode
         self.bot = None
+        self.bots = []
         self.dp = None
         self.db = None
         self.server = None
+        self.debug_server = None
         self.tasks = []
 
     async def start(self):
@@ -38,14 +96,41 @@ class Application:
             if not await self.db.connect(DB_DSN):
                 raise RuntimeError("Database connection failed")
 
-            # сохраняем БД в FastAPI-состояние
+            # сохраняем БД в FastAPI-состояние; в одном процессе с ботом
+            # инциденты отправляются сразу, без outbox
             app.state.db = self.db
+            app.state.use_outbox = False
+
+            # изменения инцидентов из Postgres → SSE‑подписчики /incidents/stream
+            self.db.add_listener(INCIDENT_CHANNEL, on_incident_notify)
+
+            # боты из BOT_TOKENS: основной — команды, все — рассылка алертов
+            # и нажатия кнопок на своих сообщениях
+            self.bots = bot_pool.all()
+            self.bot = bot_pool.primary
+
+            # таймеры эскалации (срабатывают только на реплике‑лидере)
+            await escalations.start(self.db, DB_DSN)
+            # окна обслуживания: индекс в памяти + итоги по окончании окон
+            await maintenance.start(self.db)
+            # недавние инциденты — родители для каскадов после рестарта
+            await correlator.load(self.db)
+            # задания от отдельных API‑процессов (--mode api)
+            outbox_worker.start(self.db)
+            # список vApp держим тёплым, чтобы /cloudvapp открывался без ожидания VCD
+            if VCD_CONFIG["base_url"]:
+                cloud_vapp.vapp_inventory.start()
+                cloud_vm.vm_inventory.start()
 
             # --- Подготовка и запуск основных задач ---
             self.tasks.append(asyncio.create_task(self.run_bot()))
-            self.tasks.append(asyncio.create_task(self.run_api()))
+            if self.mode == "all":
+                self.tasks.append(asyncio.create_task(self.run_api()))
+            elif METRICS_PORT:
+                # к VCD ходит только этот процесс — его метрики и снимаем
+                self.tasks.append(asyncio.create_task(self.run_debug_api()))
 
-            # дожидаемся завершения обеих
+            # дожидаемся завершения всех
             await asyncio.gather(*self.tasks)
 
         except Exception as e:
@@ -55,30 +140,32 @@ class Application:
     async def run_bot(self):
         """Запуск Telegram бота"""
         try:
-            self.bot = Bot(
-                token=BOT_TOKEN,
-                default=DefaultBotProperties(parse_mode="HTML")
-            )
             storage = MemoryStorage()
             self.dp = Dispatcher(storage=storage)
 
             self.dp["db"] = self.db
 
             # --- Middleware ---
+            self.dp.message.outer_middleware(SecondaryBotMiddleware(bot_pool.primary_id))
             self.dp.message.middleware(AdminAccessMiddleware())
             self.dp.callback_query.middleware(AdminAccessMiddleware())
+            self.dp.callback_query.middleware(CallbackDedupMiddleware())
 
             # --- Подключение всех обработчиков ---
             self.dp.include_router(commands.router)
             self.dp.include_router(fsm_handlers.router)
             self.dp.include_router(vpn.router)
             logs_pm.register_logs_pm_handler(self.dp)  # 👈 Подключаем /logs
+            self.dp.include_router(profile_pm.router)
+            self.dp.include_router(maintenance_cmd.router)
+            self.dp.include_router(bulk.router)
             self.dp.include_router(cloud.router)
             self.dp.include_router(cloud_vapp.router)
+            self.dp.include_router(cloud_vm.router)
             self.dp.include_router(unknown.router)
 
-            logger.info("Telegram bot started and ready")
-            await self.dp.start_polling(self.bot)
+            logger.info(f"Telegram bot started and ready ({len(self.bots)} token(s))")
+            await self.dp.start_polling(*self.bots)
 
         except asyncio.CancelledError:
             logger.info("Bot task cancelled")
@@ -91,8 +178,8 @@ class Application:
         try:
             config = uvicorn.Config(
                 app,
-                host="0.0.0.0",
-                port=7000,
+                host=API_HOST,
+                port=API_PORT,
                 log_level="info",
                 access_log=False,
             )
@@ -105,6 +192,25 @@ class Application:
             logger.critical(f"API failed: {str(e)}", exc_info=True)
             await self.stop()
 
+    async def run_debug_api(self):
+        """Запуск служебного HTTP (/debug/*) в режиме bot"""
+        try:
+            config = uvicorn.Config(
+                debug_app,
+                host=API_HOST,
+                port=METRICS_PORT,
+                log_level="warning",
+                access_log=False,
+            )
+            self.debug_server = uvicorn.Server(config)
+            logger.info(f"Debug server started on port {METRICS_PORT}")
+            await self.debug_server.serve()
+        except asyncio.CancelledError:
+            logger.info("Debug server task cancelled")
+        except Exception as e:
+            # без метрик бот продолжает работать
+            logger.error(f"Debug server failed: {str(e)}", exc_info=True)
+
     async def stop(self):
         """Корректное завершение работы"""
         logger.info("Stopping application...")
@@ -114,12 +220,22 @@ class Application:
             if not task.done():
                 task.cancel()
 
-        # Закрываем сессию Telegram‑бота
-        if self.bot:
-            await self.bot.session.close()
+        await outbox_worker.stop()
+        await escalations.stop()
+        await maintenance.stop()
+        await cloud_vapp.vapp_inventory.stop()
+        await cloud_vm.vm_inventory.stop()
+        await vcd.close()
+
+        # Закрываем сессии Telegram‑ботов
+        if self.bots:
+            await bot_pool.close()
+            self.bots = []
             logger.info("Telegram bot stopped")
 
         # Закрываем БД
+        if self.db:
+            await self.db.stop_listeners()
         if self.db and self.db.pool:
             await self.db.pool.close()
             logger.info("Database connection closed")
@@ -135,10 +251,10 @@ def handle_sigint(signum, frame):
 
 
 # --- Основная точка входа ---
-async def main():
+async def main(mode: str = "all"):
     signal.signal(signal.SIGINT, handle_sigint)
 
-    app_instance = Application()
+    app_instance = Application(mode)
     try:
         await app_instance.start()
     except asyncio.CancelledError:
@@ -151,8 +267,37 @@ async def main():
         await app_instance.stop()
 
 
+def run_api_workers(workers: int):
+    """Только API: uvicorn сам запускает воркеры и управляет ими."""
+    logger.info(f"Starting API server with {workers} worker(s)...")
+    uvicorn.run(
+        "main:app",
+        host=API_HOST,
+        port=API_PORT,
+        workers=workers,
+        log_level="info",
+        access_log=False,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Zabbix Telegram bot")
+    parser.add_argument("--mode", choices=RUN_MODES, default=RUN_MODE,
+                        help="all — бот и API в одном процессе, api — только API, bot — только бот")
+    parser.add_argument("--workers", type=int, default=API_WORKERS,
+                        help="число процессов uvicorn в режиме api")
+    args = parser.parse_args()
+    if args.mode not in RUN_MODES:
+        parser.error(f"unknown RUN_MODE '{args.mode}', expected one of: {', '.join(RUN_MODES)}")
+    return args
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.mode == "api":
+        run_api_workers(max(1, args.workers))
+        raise SystemExit(0)
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.mode))
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, exiting")
\ No newline at end of file
@@ -0,0 +1,74 @@
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+from typing import Callable, Any, Dict, Awaitable
+from logger.logger import logger
+from utils.keyed_lock import KeyedLockRegistry, incident_locks
+
+# Кнопки инцидентов: callback_data вида "<action>_<incident_id>"
+INCIDENT_ACTIONS = {"take", "reject", "close", "reassign", "selfassign", "reopen"}
+# Действия, после которых бот ждёт ввода (комментарий или @username)
+FSM_ACTIONS = {"take", "reject", "close", "reassign"}
+
+
+def parse_incident_callback(data: str | None) -> tuple[int, str] | None:
+    """Возвращает (incident_id, action) для кнопок инцидента или None."""
+    if not data or "_" not in data:
+        return None
+    action, _, raw_id = data.partition("_")
+    if action not in INCIDENT_ACTIONS or not raw_id.isdigit():
+        return None
+    return int(raw_id), action
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Отсекает повторные нажатия одной и той же кнопки инцидента.
+
+    На время обработки ставится метка (incident_id, action); дубликат сразу
+    получает ответ «уже выполняется». Если обработчик запустил FSM‑диалог
+    (ждём комментарий), метка остаётся до его завершения — её снимают
+    обработчики комментария — или до истечения TTL.
+    """
+
+    def __init__(self, registry: KeyedLockRegistry = incident_locks):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any]
+    ) -> Any:
+        parsed = parse_incident_callback(event.data)
+        if parsed is None:
+            return await handler(event, data)
+
+        key = parsed
+        if not self.registry.try_acquire(key):
+            logger.info(f"Duplicate callback {event.data} from {event.from_user.id} dropped")
+            await event.answer("⏳ Already in progress")
+            return
+
+        state = data.get("state")
+        previous_key = None
+        if state is not None:
+            previous_key = (await state.get_data()).get("inflight_key")
+
+        keep = False
+        try:
+            result = await handler(event, data)
+            # обработчик перевёл пользователя в ожидание ввода — держим метку
+            keep = (
+                key[1] in FSM_ACTIONS
+                and state is not None
+                and await state.get_state() is not None
+            )
+            return result
+        finally:
+            if keep:
+                await state.update_data(inflight_key=list(key))
+                # предыдущий незавершённый диалог этого пользователя перезаписан
+                if previous_key and tuple(previous_key) != key:
+                    self.registry.release(tuple(previous_key))
+            else:
+                self.registry.release(key)
@@ -0,0 +1,34 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+from typing import Callable, Any, Dict, Awaitable
+
+
+class SecondaryBotMiddleware(BaseMiddleware):
+    """
+    Команды в группах отвечает только основной бот.
+
+    Дополнительные боты из BOT_TOKENS тоже опрашиваются — им приходят нажатия
+    кнопок и ответы на их сообщения (комментарии FSM), — но общую команду
+    вроде /stats в группе видят все боты сразу. Такие команды дополнительным
+    ботам пропускаем, если они не адресованы им явно (/stats@имя_бота).
+    """
+
+    def __init__(self, primary_id: int):
+        self.primary_id = primary_id
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        bot = data["bot"]
+        if (
+            bot.id != self.primary_id
+            and event.chat.type != "private"
+            and event.text
+            and event.text.startswith("/")
+            and "@" not in event.text.split(maxsplit=1)[0]
+        ):
+            return
+        return await handler(event, data)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# globals.config требует переменные окружения — для тестов хватит заглушек
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("GROUP_ID", "-1000000000000")
+os.environ.setdefault("DATABASE_URL", "postgres://test@localhost/test")
+
+# модули проекта импортируются от корня, как при запуске main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from handlers import zabbix_api
+from utils.admission import AdmissionLimiter, Saturated
+
+
+def test_queue_full_is_rejected_at_once():
+    async def scenario():
+        limiter = AdmissionLimiter("test", limit=1, queue_size=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(2)]
+        try:
+            # один держит слот, второй — в очереди
+            while (limiter.active, limiter.waiting) != (1, 1):
+                await asyncio.sleep(0.001)
+            with pytest.raises(Saturated):
+                async with limiter.slot():
+                    pass
+        finally:
+            release.set()
+            await asyncio.gather(*holders)
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["active"] == stats["waiting"] == 0
+
+
+def test_queue_timeout():
+    async def scenario():
+        limiter = AdmissionLimiter("test", limit=1, queue_size=5, queue_timeout=0.01)
+        async with limiter.slot():
+            with pytest.raises(Saturated):
+                async with limiter.slot():
+                    pass
+        # слот освобождён — следующий запрос проходит
+        async with limiter.slot():
+            pass
+        return limiter.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+
+def test_alert_answers_429_with_retry_after(monkeypatch):
+    limiter = AdmissionLimiter("test", limit=1, queue_size=0, queue_timeout=1)
+    limiter.active = 1  # единственный слот занят
+    monkeypatch.setattr(zabbix_api, "alert_admission", limiter)
+
+    app = FastAPI()
+    app.include_router(zabbix_api.router)
+    response = TestClient(app).post("/alert", json={
+        "incident_id": 1, "event": "e", "node": "n", "trigger": "t", "severity": "High", "details": ""
+    })
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(zabbix_api.ALERT_RETRY_AFTER)
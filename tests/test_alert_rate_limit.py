@@ -0,0 +1,83 @@
+import time
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from handlers import zabbix_api
+from utils import notifier
+from utils.alert_router import RouteTarget
+from utils.rate_limiter import RateLimiter
+
+TARGET = RouteTarget(-100, 5)
+BOT = SimpleNamespace(id=42)
+ALERT = {"incident_id": 1, "event": "Down", "node": "web-01", "trigger": "ping", "severity": "High", "details": ""}
+
+
+class FakeDB:
+    def __init__(self):
+        self.queued = []
+
+    async def create_incident(self, data, outbox_kind=None):
+        return 7
+
+    async def get_incident(self, incident_id):
+        return {"id": incident_id, "node": "web-01", "severity": "High", "trigger": "ping"}
+
+    async def enqueue_outbox(self, kind, incident_id=None, payload="{}"):
+        self.queued.append((kind, incident_id))
+        return 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(notifier, "chat_limiter", RateLimiter(20, per=60, burst=5))
+    monkeypatch.setattr(notifier, "global_limiter", RateLimiter(25))
+    monkeypatch.setattr(notifier.bot_pool, "for_chat", lambda chat_id, topic_id=None: BOT)
+    monkeypatch.setattr(zabbix_api.alert_router, "resolve", lambda *args: [TARGET])
+    monkeypatch.setattr(zabbix_api.maintenance, "find", lambda node: None)
+    monkeypatch.setattr(zabbix_api.flap_detector, "observe",
+                        lambda *args: SimpleNamespace(flapping=False, notify=True, percent=0.0))
+
+    async def attach(db, data):
+        return None, None
+    monkeypatch.setattr(zabbix_api.correlator, "attach", attach)
+    monkeypatch.setattr(zabbix_api.correlator, "register", lambda incident: None)
+    monkeypatch.setattr(zabbix_api.escalations, "arm", lambda incident: None)
+
+    app = FastAPI()
+    app.include_router(zabbix_api.router)
+    app.state.db = FakeDB()
+    app.state.use_outbox = False
+    return TestClient(app)
+
+
+def test_alert_returns_promptly_when_chat_bucket_is_empty(client, monkeypatch):
+    sent = []
+
+    async def send_incident(db, incident, targets, reserved=False):
+        sent.append(reserved)
+        return [SimpleNamespace(message_id=len(sent))]
+    monkeypatch.setattr(zabbix_api, "send_incident", send_incident)
+
+    statuses = []
+    start = time.monotonic()
+    for _ in range(8):
+        statuses.append(client.post("/alert", json=ALERT).json()["status"])
+    elapsed = time.monotonic() - start
+
+    # burst 5: первые уходят сразу, остальные — в outbox без ожидания лимита
+    assert statuses == ["success"] * 5 + ["queued"] * 3
+    assert sent == [True] * 5
+    assert client.app.state.db.queued == [("send_incident", 7)] * 3
+    assert elapsed < 2
+
+
+def test_reserve_now_is_all_or_nothing(monkeypatch):
+    monkeypatch.setattr(notifier, "chat_limiter", RateLimiter(20, per=60, burst=1))
+    monkeypatch.setattr(notifier, "global_limiter", RateLimiter(25))
+    monkeypatch.setattr(notifier.bot_pool, "for_chat", lambda chat_id, topic_id=None: BOT)
+
+    # две цели в одном чате, а токен один — не берём ни одного
+    assert not notifier.reserve_now([TARGET, RouteTarget(-100, 6)])
+    assert notifier.reserve_now([TARGET])
+    assert not notifier.reserve_now([TARGET])
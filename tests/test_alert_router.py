@@ -0,0 +1,60 @@
+import pytest
+from utils.alert_router import RouteTarget, RoutingTable
+
+DEFAULT = [RouteTarget(-100, 1)]
+DISASTER = RouteTarget(-100, 200)
+OPS = RouteTarget(-200, None)
+DATABASES = RouteTarget(-100, 300)
+DISKS = RouteTarget(-100, 301)
+
+ROUTES = [
+    {"name": "disaster", "severity": ["Disaster"],
+     "targets": [{"chat_id": -100, "topic_id": 200}, {"chat_id": -200}], "continue": True},
+    {"name": "databases", "node": ["db-*", "pg-master"], "targets": [{"chat_id": -100, "topic_id": 300}]},
+    {"name": "disks", "trigger": ["disk space", "^filesystem .* read-only"], "severity": ["Average", "High"],
+     "targets": [{"chat_id": -100, "topic_id": 301}]},
+]
+
+
+@pytest.fixture
+def table():
+    return RoutingTable(ROUTES, DEFAULT)
+
+
+def test_no_match_goes_to_default(table):
+    assert table.resolve("Warning", "web-01", "CPU load") == DEFAULT
+
+
+def test_node_prefix_and_exact(table):
+    assert table.resolve("Warning", "DB-01", "CPU load") == [DATABASES]
+    assert table.resolve("Warning", "pg-master", "CPU load") == [DATABASES]
+    assert table.resolve("Warning", "pg-master-2", "CPU load") == DEFAULT
+
+
+def test_trigger_regex_and_severity(table):
+    assert table.resolve("High", "web-01", "Low Disk Space on /") == [DISKS]
+    assert table.resolve("High", "web-01", "Filesystem / is read-only") == [DISKS]
+    # правило disks только для Average/High
+    assert table.resolve("Warning", "web-01", "Low disk space on /") == DEFAULT
+
+
+def test_continue_collects_targets(table):
+    assert table.resolve("Disaster", "db-01", "down") == [DISASTER, OPS, DATABASES]
+
+
+def test_first_rule_without_continue_stops(table):
+    # databases подходит раньше disks и останавливает поиск
+    assert table.resolve("High", "db-01", "disk space") == [DATABASES]
+
+
+def test_duplicate_targets_are_merged():
+    routes = [
+        {"severity": "High", "targets": [{"chat_id": -100, "topic_id": 5}], "continue": True},
+        {"node": "*", "targets": [{"chat_id": -100, "topic_id": 5}]},
+    ]
+    assert RoutingTable(routes, DEFAULT).resolve("High", "x", "t") == [RouteTarget(-100, 5)]
+
+
+def test_route_without_targets_is_rejected():
+    with pytest.raises(ValueError):
+        RoutingTable([{"name": "empty"}], DEFAULT)
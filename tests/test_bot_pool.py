@@ -0,0 +1,47 @@
+import asyncio
+from collections import Counter
+import pytest
+from utils.bot_pool import BotPool
+
+TOKENS = ["111:aaa", "222:bbb", "333:ccc"]
+
+
+@pytest.fixture
+def pool():
+    pool = BotPool(TOKENS)
+    yield pool
+    asyncio.run(pool.close())
+
+
+def test_primary_and_fallback(pool):
+    assert pool.primary_id == 111
+    assert pool.primary.id == 111
+    # неизвестный бот (токен убран из конфига) — основной
+    assert pool.get(999).id == 111
+    assert pool.get(222).id == 222
+    assert pool.get(222) is pool.get(222)
+
+
+def test_chat_is_sticky_and_spread(pool):
+    chats = [(-100 - i, i % 3) for i in range(300)]
+    first = [pool.for_chat(chat, topic).id for chat, topic in chats]
+    assert first == [pool.for_chat(chat, topic).id for chat, topic in chats]
+    counts = Counter(first)
+    assert set(counts) == {111, 222, 333}
+    assert min(counts.values()) > 50
+
+
+def test_adding_token_moves_only_part_of_chats(pool):
+    bigger = BotPool(TOKENS + ["444:ddd"])
+    chats = [(-100 - i, None) for i in range(400)]
+    moved = [chat for chat in chats if pool.for_chat(*chat).id != bigger.for_chat(*chat).id]
+    # переезжают только чаты, доставшиеся новому токену
+    assert all(bigger.for_chat(*chat).id == 444 for chat in moved)
+    assert len(moved) < len(chats) / 2
+    asyncio.run(bigger.close())
+
+
+def test_single_token_is_always_primary():
+    pool = BotPool(TOKENS[:1])
+    assert pool.for_chat(-100, 5).id == 111
+    asyncio.run(pool.close())
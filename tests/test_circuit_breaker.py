@@ -0,0 +1,79 @@
+import pytest
+from utils import circuit_breaker
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_after=30)
+    for _ in range(2):
+        breaker.before()
+        breaker.failure()
+    assert breaker.state == CLOSED
+    breaker.before()
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert breaker.opened_total == 1
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+    assert breaker.rejected_total == 1
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_after=30)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=30)
+    breaker.failure()
+    clock[0] += 30
+    breaker.before()
+    assert breaker.state == HALF_OPEN
+    # пока проба не завершилась, остальные запросы отклоняются
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=30)
+    breaker.failure()
+    clock[0] += 31
+    breaker.before()
+    breaker.success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+    breaker.before()
+
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_after=30)
+    for _ in range(5):
+        breaker.failure()
+    clock[0] += 30
+    breaker.before()
+    breaker.failure()
+    assert breaker.state == OPEN
+    assert breaker.opened_total == 2
+    clock[0] += 29
+    with pytest.raises(CircuitOpen):
+        breaker.before()
+
+
+def test_release_allows_next_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_after=30)
+    breaker.failure()
+    clock[0] += 30
+    breaker.before()
+    breaker.release()
+    breaker.before()
+    assert breaker.state == HALF_OPEN
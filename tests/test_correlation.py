@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from utils import correlation
+from utils.alert_router import RouteTarget
+from utils.correlation import Correlator, DependencyMap, severity_at_most
+
+OPS, DBA = RouteTarget(-100, 1), RouteTarget(-100, 2)
+
+
+def test_severity_at_most():
+    assert severity_at_most("Warning", "High")
+    assert severity_at_most("high", "High")
+    assert severity_at_most("Высокая", "Disaster")
+    assert severity_at_most("2", "Average")
+    assert not severity_at_most("Disaster", "Warning")
+    # неизвестная критичность совпадает только сама с собой
+    assert severity_at_most("Custom", "custom")
+    assert not severity_at_most("Custom", "Disaster")
+    assert not severity_at_most("Warning", "Custom")
+
+
+def test_dependency_map_upstream():
+    deps = DependencyMap({"hv-01": ["vm-*", "db-01"], "sw-01": "hv-01"})
+    assert deps.upstream("VM-42") == ["hv-01"]
+    assert deps.upstream("hv-01") == ["sw-01"]
+    assert deps.upstream("web-01") == []
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    def resolve(severity, node, trigger):
+        return [DBA] if node.startswith("db") else [OPS]
+    monkeypatch.setattr(correlation.alert_router, "resolve", resolve)
+
+
+def alert(node="hv-01", severity="Warning"):
+    return {"node": node, "severity": severity, "trigger": "t"}
+
+
+def test_fits(routes):
+    parent = {"id": 1, "node": "hv-01", "severity": "High", "trigger": "down"}
+    assert Correlator.fits(parent, alert(severity="Average"))
+    assert Correlator.fits(parent, alert(severity="High"))
+    # критичнее родителя — отдельный инцидент
+    assert not Correlator.fits(parent, alert(severity="Disaster"))
+    # другой маршрут — отдельный инцидент
+    assert not Correlator.fits(parent, alert(node="db-01"))
+
+
+class FakeDB:
+    def __init__(self, closed=()):
+        self.closed = set(closed)
+        self.children = []
+
+    async def create_child_incident(self, data, parent_id):
+        if parent_id in self.closed:
+            return None
+        self.children.append((parent_id, data["node"]))
+        return 100 + len(self.children)
+
+
+def make_correlator(tmp_path):
+    deps = tmp_path / "deps.json"
+    deps.write_text('{"hv-01": ["vm-*"]}')
+    return Correlator(window=60, map_path=str(deps))
+
+
+def test_attach_to_same_or_upstream_node(tmp_path, routes):
+    correlator, db = make_correlator(tmp_path), FakeDB()
+    correlator.register({"id": 1, "node": "hv-01", "severity": "High", "trigger": "down"})
+
+    parent, incident_id = asyncio.run(correlator.attach(db, alert(node="vm-7")))
+    assert parent["id"] == 1 and incident_id == 101
+    parent, incident_id = asyncio.run(correlator.attach(db, alert(node="web-01")))
+    assert (parent, incident_id) == (None, None)
+    assert db.children == [(1, "vm-7")]
+
+
+def test_closed_parent_is_forgotten(tmp_path, routes):
+    correlator, db = make_correlator(tmp_path), FakeDB(closed={1})
+    correlator.register({"id": 1, "node": "hv-01", "severity": "High", "trigger": "down"})
+    assert asyncio.run(correlator.attach(db, alert())) == (None, None)
+    assert correlator.candidates("hv-01") == []
@@ -0,0 +1,110 @@
+import asyncio
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText
+from utils.edit_coalescer import EditCoalescer
+
+CHAT, MESSAGE = -100, 7
+
+
+class FakeBot:
+    def __init__(self, error: str | None = None):
+        self.calls = []
+        self.error = error
+
+    async def edit_message_text(self, **kwargs):
+        self.calls.append(kwargs["text"])
+        if self.error:
+            raise TelegramBadRequest(EditMessageText(text=kwargs["text"]), self.error)
+
+
+def test_same_content_is_dropped():
+    async def scenario():
+        coalescer, bot = EditCoalescer(window=0), FakeBot()
+        coalescer.remember(CHAT, MESSAGE, "peer list")
+        assert await coalescer.edit(bot, CHAT, MESSAGE, "peer list") is False
+        return bot.calls
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_back_navigation_after_edit_through_coalescer():
+    # список → экран ввода поля → «Назад» к тому же списку
+    async def scenario():
+        coalescer, bot = EditCoalescer(window=0), FakeBot()
+        coalescer.remember(CHAT, MESSAGE, "peer list")
+        assert await coalescer.edit(bot, CHAT, MESSAGE, "field prompt") is True
+        assert await coalescer.edit(bot, CHAT, MESSAGE, "peer list") is True
+        return bot.calls
+
+    assert asyncio.run(scenario()) == ["field prompt", "peer list"]
+
+
+def test_forget_after_direct_edit():
+    async def scenario():
+        coalescer, bot = EditCoalescer(window=0), FakeBot()
+        coalescer.remember(CHAT, MESSAGE, "peer list")
+        # правка в обход склейки
+        coalescer.forget(CHAT, MESSAGE)
+        assert await coalescer.edit(bot, CHAT, MESSAGE, "peer list") is True
+        return bot.calls
+
+    assert asyncio.run(scenario()) == ["peer list"]
+
+
+def test_rapid_edits_are_merged():
+    async def scenario():
+        coalescer, bot = EditCoalescer(window=0.05), FakeBot()
+        results = await asyncio.gather(*(
+            coalescer.edit(bot, CHAT, MESSAGE, f"v{i}") for i in range(5)
+        ))
+        return results, bot.calls
+
+    results, calls = asyncio.run(scenario())
+    assert calls == ["v4"]
+    assert results == [True] * 5
+
+
+def test_chat_id_string_and_int_share_key():
+    async def scenario():
+        coalescer, bot = EditCoalescer(window=0), FakeBot()
+        coalescer.remember(str(CHAT), MESSAGE, "text")
+        return await coalescer.edit(bot, CHAT, MESSAGE, "text")
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_not_modified_is_not_an_error():
+    async def scenario():
+        coalescer = EditCoalescer(window=0)
+        bot = FakeBot("Bad Request: message is not modified")
+        first = await coalescer.edit(bot, CHAT, MESSAGE, "text")
+        # содержимое запомнено — повтор уже без запроса
+        second = await coalescer.edit(bot, CHAT, MESSAGE, "text")
+        return first, second, bot.calls
+
+    assert asyncio.run(scenario()) == (False, False, ["text"])
+
+
+def test_vpn_menu_back_navigation(monkeypatch):
+    from types import SimpleNamespace
+    from handlers import vpn
+
+    coalescer, bot = EditCoalescer(window=0), FakeBot()
+    monkeypatch.setattr(vpn, "edit_coalescer", coalescer)
+
+    class State:
+        async def get_data(self):
+            return {"last_menu_id": MESSAGE}
+
+    chat = SimpleNamespace(id=CHAT)
+    query = SimpleNamespace(bot=bot, message=SimpleNamespace(chat=chat, message_id=MESSAGE))
+    target = SimpleNamespace(bot=bot, chat=chat)
+
+    async def scenario():
+        coalescer.remember(CHAT, MESSAGE, "peer list")
+        await vpn._edit_menu(query, "field prompt")
+        # «Отмена» перерисовывает прежнее меню через _send_or_edit
+        await vpn._send_or_edit(target, "peer list", State())
+
+    asyncio.run(scenario())
+    assert bot.calls == ["field prompt", "peer list"]
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from utils import escalation
+from utils.escalation import EscalationManager
+
+RULES = {"*": [
+    {"after": 5, "mention": "", "text": "step 1"},
+    {"after": 10, "mention": "", "text": "step 2"},
+    {"after": 30, "mention": "@oncall", "text": "step 3"},
+]}
+
+
+def make_manager():
+    manager = EscalationManager(rules=RULES)
+    manager.leader = SimpleNamespace(is_leader=True)
+    return manager
+
+
+def incident(minutes_ago: float, level: int = 0) -> dict:
+    return {"id": 1, "severity": "High", "status": "open", "escalation_level": level,
+            "escalate_from": datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)}
+
+
+def scheduled_steps(manager) -> list[int]:
+    return sorted(timer.args[1] for timer in manager.scheduler._heap if not timer.cancelled)
+
+
+def test_fresh_incident_schedules_all_steps():
+    manager = make_manager()
+    assert manager.arm(incident(0)) == 3
+    assert scheduled_steps(manager) == [0, 1, 2]
+
+
+def test_overdue_steps_collapse_to_the_highest():
+    # 12 минут без реакции: шаги 5 и 10 мин просрочены, отправится только второй
+    manager = make_manager()
+    assert manager.arm(incident(12)) == 2
+    assert scheduled_steps(manager) == [1, 2]
+
+
+def test_all_steps_overdue_fire_once():
+    manager = make_manager()
+    assert manager.arm(incident(120)) == 1
+    assert scheduled_steps(manager) == [2]
+
+
+def test_level_already_reached():
+    manager = make_manager()
+    assert manager.arm(incident(120, level=3)) == 0
+    assert manager.arm(incident(12, level=2)) == 1
+    assert scheduled_steps(manager) == [2]
+
+
+def test_not_leader_or_not_open():
+    manager = make_manager()
+    manager.leader = SimpleNamespace(is_leader=False)
+    assert manager.arm(incident(0)) == 0
+    manager.leader = SimpleNamespace(is_leader=True)
+    assert manager.arm({**incident(0), "status": "in_progress"}) == 0
+
+
+def test_failover_sends_one_message(monkeypatch):
+    replies = []
+
+    async def reply_to_incident(db, incident, text):
+        replies.append(text)
+        return 1
+    monkeypatch.setattr(escalation, "reply_to_incident", reply_to_incident)
+
+    class DB:
+        def __init__(self):
+            self.level = 0
+
+        async def mark_escalated(self, incident_id, level):
+            if level <= self.level:
+                return None
+            self.level = level
+            return {"id": incident_id}
+
+    async def scenario():
+        manager = make_manager()
+        manager.db = DB()
+        manager.scheduler.start()
+        manager.arm(incident(45))
+        await asyncio.sleep(0.05)
+        await manager.scheduler.stop()
+        return manager.db.level
+
+    assert asyncio.run(scenario()) == 3
+    assert replies == ["step 3\n@oncall"]
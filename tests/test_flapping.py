@@ -0,0 +1,75 @@
+import pytest
+from utils.flapping import FlapDetector, HISTORY_MASK, flap_percent
+
+
+def make_detector(**kwargs):
+    params = dict(sample_seconds=60, high=50, low=25, notify_interval=600, ttl=3600, max_keys=100)
+    params.update(kwargs)
+    return FlapDetector(**params)
+
+
+def test_flap_percent_bounds():
+    assert flap_percent(0) == 0
+    assert flap_percent(HISTORY_MASK) == 0
+    # чередование 0101… — смена на каждом шаге
+    assert flap_percent(int("10" * 10 + "1", 2)) == pytest.approx(100)
+
+
+def test_newer_changes_weigh_more():
+    # одна смена: самая новая (между битами 0 и 1) и самая старая (между 19 и 20)
+    assert flap_percent(0b1) > flap_percent(1 << 20)
+
+
+def test_steady_problem_is_not_flapping():
+    detector = make_detector()
+    for i in range(10):
+        result = detector.observe("web-01", "CPU", True, now=i)
+    assert not result.flapping
+    assert result.notify
+
+
+def test_alternating_states_start_flapping():
+    detector = make_detector()
+    results = [detector.observe("web-01", "CPU", i % 2 == 0, now=i) for i in range(20)]
+    assert results[-1].flapping
+    assert results[-1].percent >= 50
+    # начало флаппинга сообщается, следующие события — приглушаются
+    first = next(i for i, r in enumerate(results) if r.flapping)
+    assert results[first].notify
+    assert not any(r.notify for r in results[first + 1:])
+
+
+def test_quiet_period_ends_flapping():
+    detector = make_detector()
+    for i in range(20):
+        detector.observe("web-01", "CPU", i % 2 == 0, now=i)
+    # полчаса тишины = 30 устойчивых отсчётов, история целиком без смен
+    result = detector.observe("web-01", "CPU", False, now=20 + 1800)
+    assert not result.flapping
+    assert result.percent < 25
+
+
+def test_impulse_alerts_flap():
+    detector = make_detector()
+    for i in range(12):
+        result = detector.observe("web-01", "CPU", None, now=i)
+    assert result.flapping
+
+
+def test_keys_are_case_insensitive_and_separate():
+    detector = make_detector()
+    for i in range(20):
+        detector.observe("WEB-01", "CPU", i % 2 == 0, now=i)
+    assert detector.observe("web-01", "cpu", True, now=20).flapping
+    assert not detector.observe("web-02", "CPU", True, now=20).flapping
+
+
+def test_lru_eviction():
+    detector = make_detector(max_keys=2, ttl=100)
+    detector.observe("a", "t", True, now=0)
+    detector.observe("b", "t", True, now=1)
+    detector.observe("c", "t", True, now=2)
+    assert len(detector) == 2
+    # через ttl все старые ключи вытесняются
+    detector.observe("d", "t", True, now=500)
+    assert len(detector) == 1
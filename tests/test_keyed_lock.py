@@ -0,0 +1,53 @@
+import asyncio
+from utils import keyed_lock
+from utils.keyed_lock import KeyedLockRegistry
+
+
+def test_double_click_is_rejected_until_release():
+    locks = KeyedLockRegistry(ttl=60)
+    assert locks.try_acquire(("take", 1))
+    assert not locks.try_acquire(("take", 1))
+    # другой инцидент — своя метка
+    assert locks.try_acquire(("take", 2))
+    locks.release(("take", 1))
+    assert locks.try_acquire(("take", 1))
+
+
+def test_mark_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(keyed_lock.time, "monotonic", lambda: now[0])
+    locks = KeyedLockRegistry(ttl=10)
+    assert locks.try_acquire("k")
+    assert locks.is_held("k")
+    now[0] += 10
+    assert not locks.is_held("k")
+    assert locks.try_acquire("k")
+
+
+def test_max_keys_drops_oldest():
+    locks = KeyedLockRegistry(ttl=60, max_keys=2)
+    for key in ("a", "b", "c"):
+        assert locks.try_acquire(key)
+    assert len(locks) == 2
+    assert not locks.is_held("a")
+    assert locks.is_held("c")
+
+
+def test_lock_serializes_same_key_and_cleans_up():
+    locks = KeyedLockRegistry()
+    order = []
+
+    async def worker(key, name):
+        async with locks.lock(key):
+            order.append(f"{name} in")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} out")
+
+    async def scenario():
+        await asyncio.gather(worker(1, "a"), worker(1, "b"), worker(2, "c"))
+
+    asyncio.run(scenario())
+    # a и b не пересекаются, c с ними не ждёт
+    assert order.index("a out") < order.index("b in")
+    assert order.index("c in") < order.index("a out")
+    assert len(locks) == 0
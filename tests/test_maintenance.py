@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from utils.maintenance import IntervalIndex, MaintenanceIndex, validate_pattern
+
+
+def test_empty_index():
+    assert IntervalIndex([]).find(10) is None
+
+
+def test_half_open_bounds():
+    index = IntervalIndex([(10, 20, "a")])
+    assert index.find(9.9) is None
+    assert index.find(10) == "a"
+    assert index.find(19.9) == "a"
+    assert index.find(20) is None
+
+
+def test_gap_between_intervals():
+    index = IntervalIndex([(30, 40, "b"), (10, 20, "a")])
+    assert index.find(15) == "a"
+    assert index.find(25) is None
+    assert index.find(35) == "b"
+
+
+def test_long_interval_covers_later_starts():
+    # длинное окно начинается раньше коротких и заканчивается позже них
+    index = IntervalIndex([(0, 100, "long"), (10, 20, "short"), (30, 40, "other")])
+    assert index.find(15) == "long"
+    assert index.find(50) == "long"
+    assert index.find(100) is None
+
+
+def test_overlap_returns_latest_end():
+    index = IntervalIndex([(0, 50, "a"), (10, 80, "b")])
+    assert index.find(20) == "b"
+    assert index.find(60) == "b"
+
+
+def _window(window_id, pattern, start, end):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return {"id": window_id, "node_pattern": pattern,
+            "starts_at": base + timedelta(hours=start), "ends_at": base + timedelta(hours=end)}
+
+
+def test_maintenance_index_by_pattern():
+    windows = [_window(1, "db-*", 0, 2), _window(2, "web-01", 1, 3), _window(3, "*", 10, 11)]
+    index = MaintenanceIndex(windows)
+    at = lambda hours: (datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(hours=hours)).timestamp()
+
+    assert index.find("DB-MAIN", at(1))["id"] == 1
+    assert index.find("web-01", at(2.5))["id"] == 2
+    assert index.find("web-02", at(2.5)) is None
+    assert index.find("anything", at(10.5))["id"] == 3
+    assert index.find("db-main", at(5)) is None
+
+
+def test_validate_pattern():
+    validate_pattern("web-*")
+    with pytest.raises(ValueError):
+        validate_pattern("web-*-prod")
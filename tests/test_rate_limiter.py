@@ -0,0 +1,38 @@
+import pytest
+from utils.rate_limiter import TokenBucket, RateLimiter
+
+
+def test_burst_then_wait():
+    bucket = TokenBucket(rate=2, capacity=2)
+    start = bucket.updated
+    assert bucket.reserve(start) == 0
+    assert bucket.reserve(start) == 0
+    assert bucket.reserve(start) == pytest.approx(0.5)
+    # резерв уже занят — следующий ждёт дольше
+    assert bucket.reserve(start) == pytest.approx(1.0)
+
+
+def test_refill_is_capped():
+    bucket = TokenBucket(rate=1, capacity=3)
+    start = bucket.updated
+    for _ in range(3):
+        bucket.reserve(start)
+    assert bucket.reserve(start + 100) == 0
+    assert bucket.tokens == pytest.approx(2)
+
+
+def test_penalize_delays_next_reservation():
+    bucket = TokenBucket(rate=1, capacity=1)
+    start = bucket.updated
+    bucket.penalize(5)
+    assert bucket.reserve(start) == pytest.approx(6)
+
+
+def test_limiter_evicts_least_recent_key():
+    limiter = RateLimiter(limit=10, max_keys=2)
+    first = limiter.bucket("a")
+    limiter.bucket("b")
+    limiter.bucket("a")
+    limiter.bucket("c")
+    assert limiter.bucket("a") is first
+    assert len(limiter._buckets) == 2
@@ -0,0 +1,66 @@
+import asyncio
+from utils.async_cache import StaleWhileRevalidate
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("VCD down")
+        return f"v{self.calls}"
+
+
+def test_first_load_waits_and_is_shared():
+    async def scenario():
+        loader = Loader()
+        cache = StaleWhileRevalidate("test", loader, fresh_for=60)
+        values = await asyncio.gather(*(cache.get() for _ in range(5)))
+        return values, loader.calls
+
+    assert asyncio.run(scenario()) == (["v1"] * 5, 1)
+
+
+def test_stale_value_is_served_and_refreshed_in_background():
+    async def scenario():
+        loader = Loader()
+        cache = StaleWhileRevalidate("test", loader, fresh_for=60)
+        await cache.get()
+        cache.loaded_at -= 120  # данные устарели
+        stale = await cache.get()
+        await asyncio.sleep(0.05)
+        return stale, await cache.get(), loader.calls
+
+    assert asyncio.run(scenario()) == ("v1", "v2", 2)
+
+
+def test_failed_refresh_keeps_previous_value():
+    async def scenario():
+        loader = Loader()
+        cache = StaleWhileRevalidate("test", loader, fresh_for=60)
+        await cache.get()
+        loaded_at = cache.loaded_at
+        loader.fail = True
+        try:
+            await cache.refresh()
+        except RuntimeError:
+            pass
+        return cache.value, cache.loaded_at == loaded_at
+
+    assert asyncio.run(scenario()) == ("v1", True)
+
+
+def test_periodic_refresh():
+    async def scenario():
+        loader = Loader()
+        cache = StaleWhileRevalidate("test", loader, fresh_for=60, refresh_interval=0.02)
+        cache.start()
+        await asyncio.sleep(0.08)
+        await cache.stop()
+        return loader.calls
+
+    assert asyncio.run(scenario()) >= 3
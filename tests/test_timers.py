@@ -0,0 +1,66 @@
+import asyncio
+import time
+from utils.timers import TimerScheduler
+
+
+def test_timers_fire_in_order():
+    async def scenario():
+        scheduler, fired = TimerScheduler("test"), []
+
+        async def record(name):
+            fired.append(name)
+
+        scheduler.start()
+        now = time.time()
+        scheduler.call_at(now + 0.04, "g", record, "late")
+        scheduler.call_at(now + 0.01, "g", record, "early")
+        # в прошлом — срабатывает сразу
+        scheduler.call_at(now - 5, "g", record, "overdue")
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return fired
+
+    assert asyncio.run(scenario()) == ["overdue", "early", "late"]
+
+
+def test_cancel_group():
+    async def scenario():
+        scheduler, fired = TimerScheduler("test"), []
+
+        async def record(name):
+            fired.append(name)
+
+        scheduler.start()
+        now = time.time()
+        scheduler.call_at(now + 0.02, 1, record, "a1")
+        scheduler.call_at(now + 0.03, 1, record, "a2")
+        scheduler.call_at(now + 0.02, 2, record, "b")
+        assert scheduler.pending() == 3
+        assert scheduler.cancel(1) == 2
+        assert scheduler.pending(1) == 0
+        await asyncio.sleep(0.08)
+        await scheduler.stop()
+        return fired, scheduler.pending()
+
+    assert asyncio.run(scenario()) == (["b"], 0)
+
+
+def test_failing_callback_does_not_stop_scheduler():
+    async def scenario():
+        scheduler, fired = TimerScheduler("test"), []
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        async def record(name):
+            fired.append(name)
+
+        scheduler.start()
+        now = time.time()
+        scheduler.call_at(now, "g", boom)
+        scheduler.call_at(now + 0.01, "g", record, "after")
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return fired
+
+    assert asyncio.run(scenario()) == ["after"]
@@ -0,0 +1,18 @@
+from utils.vcd_client import RecordStream
+
+PAGE = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<QueryResultRecords xmlns="http://www.vmware.com/vcloud/v1.5" total="2" page="1">'
+        b'<Link rel="nextPage" href="x"/>'
+        b'<VMRecord name="web-01" status="POWERED_ON" ipAddress="10.0.1.5"/>'
+        b'<VMRecord name="db-01" status="POWERED_OFF"/>'
+        b'</QueryResultRecords>')
+
+
+def test_record_stream_by_chunks():
+    stream = RecordStream()
+    for i in range(0, len(PAGE), 7):
+        stream.feed(PAGE[i:i + 7])
+    records = stream.close()
+    assert stream.total == 2
+    assert [r["name"] for r in records] == ["web-01", "db-01"]
+    assert records[0]["ipAddress"] == "10.0.1.5"
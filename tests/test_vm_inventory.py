@@ -0,0 +1,25 @@
+from handlers.cloud_vm import VmInventory, VmQueryRecord
+
+
+def _vm(name, ip=""):
+    return VmQueryRecord(status="🟢", name=name, vapp="app", vcpu=2, ram_gb=4, disk_gb=40, storage="Gold", ip=ip)
+
+
+def test_vm_search():
+    inventory = VmInventory([
+        _vm("web-01.prod", "10.0.1.5"),
+        _vm("web-02.test", "10.0.2.7"),
+        _vm("db-01.prod", "10.1.0.3"),
+    ])
+    names = lambda found: [vm.name for vm in found]
+
+    assert names(inventory.search("web")) == ["web-01.prod", "web-02.test"]
+    assert names(inventory.search("we pro")) == ["web-01.prod"]
+    assert names(inventory.search("WEB-01.PROD")) == ["web-01.prod"]
+    assert names(inventory.search("10.0")) == ["web-01.prod", "web-02.test"]
+    assert names(inventory.search("10.0.")) == ["web-01.prod", "web-02.test"]
+    assert names(inventory.search("10.0.1.5")) == ["web-01.prod"]
+    # префикс по октетам, а не по символам
+    assert inventory.search("10.0.1.50") == []
+    assert inventory.search("mail") == []
+    assert inventory.totals() == (6, 12, 120)
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from globals.config import ALERT_MAX_CONCURRENCY, ALERT_QUEUE_SIZE, ALERT_QUEUE_TIMEOUT
+from logger.logger import logger
+
+REJECT_LOG_INTERVAL = 10  # сводка отказов в лог не чаще раза за N секунд
+
+
+class Saturated(Exception):
+    """Лимит и очередь ожидания заняты — запрос нужно повторить позже."""
+
+
+class AdmissionLimiter:
+    """
+    Ограничение одновременных запросов с ограниченной очередью ожидания.
+
+    Не больше limit запросов выполняются одновременно, ещё queue_size ждут
+    свободного места не дольше queue_timeout. Всё, что сверх, сразу
+    получает Saturated — шторм не растёт очередью в памяти и не забирает
+    весь пул соединений БД.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._rejected_logged = 0
+        self._last_log = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.active + self.waiting >= self.limit + self.queue_size:
+            self._reject("queue is full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("queue timeout")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        now = time.monotonic()
+        if now - self._last_log >= REJECT_LOG_INTERVAL:
+            logger.warning(f"{self.name}: overloaded ({reason}), rejected "
+                           f"{self.rejected - self._rejected_logged} request(s); "
+                           f"active={self.active}, waiting={self.waiting}")
+            self._rejected_logged = self.rejected
+            self._last_log = now
+        raise Saturated(reason)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+        }
+
+
+# Приём алертов от Zabbix (/alert)
+alert_admission = AdmissionLimiter("alert ingest", ALERT_MAX_CONCURRENCY,
+                                   ALERT_QUEUE_SIZE, ALERT_QUEUE_TIMEOUT)
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import time
+from typing import NamedTuple
+from globals.config import GROUP_ID, TOPIC_ID, ALERT_ROUTES_FILE, ALERT_ROUTES_RELOAD_SECONDS
+from logger.logger import logger
+
+
+class RouteTarget(NamedTuple):
+    chat_id: int
+    topic_id: int | None = None
+
+
+DEFAULT_TARGET = RouteTarget(int(GROUP_ID), int(TOPIC_ID) if TOPIC_ID else None)
+
+
+class PrefixTrie:
+    """
+    Префиксное дерево шаблонов вида "web-*".
+    match() возвращает OR битовых масок всех шаблонов‑префиксов строки
+    за один проход по её символам.
+    """
+
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, prefix: str, mask: int):
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node[None] = node.get(None, 0) | mask
+
+    def match(self, value: str) -> int:
+        node = self.root
+        mask = node.get(None, 0)
+        for ch in value:
+            node = node.get(ch)
+            if node is None:
+                break
+            mask |= node.get(None, 0)
+        return mask
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+class NodeMatcher:
+    """Точные имена узлов (dict) + шаблоны с '*' на конце (trie) + '*' для всех."""
+
+    __slots__ = ("exact", "prefixes", "any_mask")
+
+    def __init__(self):
+        self.exact: dict[str, int] = {}
+        self.prefixes = PrefixTrie()
+        self.any_mask = 0
+
+    def add(self, pattern: str, mask: int):
+        pattern = pattern.strip().lower()
+        if pattern == "*":
+            self.any_mask |= mask
+        elif pattern.endswith("*") and "*" not in pattern[:-1]:
+            self.prefixes.add(pattern[:-1], mask)
+        elif "*" in pattern:
+            raise ValueError(f"Шаблон узла '{pattern}': поддерживается только '*' в конце")
+        else:
+            self.exact[pattern] = self.exact.get(pattern, 0) | mask
+
+    def match(self, node: str) -> int:
+        node = node.lower()
+        mask = self.any_mask | self.exact.get(node, 0)
+        if self.prefixes:
+            mask |= self.prefixes.match(node)
+        return mask
+
+
+class RoutingTable:
+    """
+    Скомпилированная таблица маршрутизации алертов.
+
+    Каждое правило получает свой бит. Для алерта считаются маски подходящих
+    правил по узлу (dict + trie) и по критичности (dict), и только для
+    оставшихся кандидатов проверяются регулярки триггера (по одной
+    скомпилированной регулярке на правило).
+    """
+
+    def __init__(self, routes: list[dict], default: list[RouteTarget]):
+        self.default = default or [DEFAULT_TARGET]
+        self.rules: list[tuple[str, list[RouteTarget], bool]] = []
+        self.nodes = NodeMatcher()
+        self.severities: dict[str, int] = {}
+        self.any_severity = 0
+        self.any_trigger = 0
+        self.trigger_rules: dict[int, re.Pattern] = {}
+
+        for bit, route in enumerate(routes):
+            mask = 1 << bit
+            name = route.get("name") or f"route#{bit}"
+            targets = [_parse_target(t) for t in route.get("targets", [])]
+            if not targets:
+                raise ValueError(f"Маршрут '{name}': не заданы targets")
+            self.rules.append((name, targets, bool(route.get("continue", False))))
+
+            for pattern in _as_list(route.get("node")) or ["*"]:
+                self.nodes.add(pattern, mask)
+
+            severities = _as_list(route.get("severity"))
+            if severities:
+                for sev in severities:
+                    key = sev.strip().lower()
+                    self.severities[key] = self.severities.get(key, 0) | mask
+            else:
+                self.any_severity |= mask
+
+            triggers = _as_list(route.get("trigger"))
+            if triggers:
+                alternatives = "|".join(f"(?:{t})" for t in triggers)
+                flags = re.IGNORECASE if route.get("ignore_case", True) else 0
+                self.trigger_rules[bit] = re.compile(alternatives, flags)
+            else:
+                self.any_trigger |= mask
+
+    def resolve(self, severity: str, node: str, trigger: str) -> list[RouteTarget]:
+        mask = self.nodes.match(node)
+        if mask:
+            mask &= self.any_severity | self.severities.get(severity.strip().lower(), 0)
+
+        # кандидаты идут в порядке правил; регулярки триггера проверяются
+        # лениво и только до первого сработавшего правила без continue
+        targets: list[RouteTarget] = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            bit = low.bit_length() - 1
+            if not (low & self.any_trigger) and not self.trigger_rules[bit].search(trigger):
+                continue
+            _, rule_targets, keep_going = self.rules[bit]
+            for target in rule_targets:
+                if target not in targets:
+                    targets.append(target)
+            if not keep_going:
+                break
+        return targets or self.default
+
+
+def _as_list(value) -> list[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _parse_target(raw) -> RouteTarget:
+    if isinstance(raw, dict):
+        chat_id = int(raw.get("chat_id", GROUP_ID))
+        topic_id = raw.get("topic_id")
+        return RouteTarget(chat_id, int(topic_id) if topic_id is not None else None)
+    # короткая запись: просто номер темы в основной группе
+    return RouteTarget(int(GROUP_ID), int(raw))
+
+
+def load_routing_table(path: str) -> RoutingTable:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    default = [_parse_target(t) for t in data.get("default", [])]
+    return RoutingTable(data.get("routes", []), default)
+
+
+class AlertRouter:
+    """Таблица маршрутов с горячей перезагрузкой по mtime файла."""
+
+    def __init__(self, path: str = ALERT_ROUTES_FILE, reload_interval: float = ALERT_ROUTES_RELOAD_SECONDS):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.table = RoutingTable([], [DEFAULT_TARGET])
+        self._mtime = None
+        self._checked_at = 0.0
+        self.maybe_reload(force=True)
+
+    def maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._mtime is not None:
+                logger.warning(f"Файл маршрутов {self.path} удалён — все алерты в основную тему")
+                self.table = RoutingTable([], [DEFAULT_TARGET])
+                self._mtime = None
+            return
+
+        if mtime == self._mtime:
+            return
+        try:
+            self.table = load_routing_table(self.path)
+            self._mtime = mtime
+            logger.info(f"Маршруты алертов загружены из {self.path}: {len(self.table.rules)} правил")
+        except Exception as e:
+            # оставляем предыдущую рабочую таблицу
+            self._mtime = mtime
+            logger.error(f"Ошибка загрузки маршрутов {self.path}: {e}", exc_info=True)
+
+    def resolve(self, severity: str, node: str, trigger: str) -> list[RouteTarget]:
+        self.maybe_reload()
+        return self.table.resolve(severity, node, trigger)
+
+
+alert_router = AlertRouter()
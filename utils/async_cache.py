@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import OrderedDict
+from logger.logger import logger
+
+
+class AsyncTTLCache:
+    """
+    Кэш результатов корутин с TTL.
+
+    Одновременные запросы одного ключа ждут одну и ту же загрузку (отмена
+    одного ожидающего её не прерывает). Ошибки не кэшируются — следующий
+    запрос попробует снова. С serve_stale при ошибке загрузки отдаётся
+    прежнее (устаревшее) значение, если оно есть. Ключей не больше
+    max_keys, лишние вытесняются по давности.
+    """
+
+    def __init__(self, ttl: float, max_keys: int = 256, serve_stale: bool = False):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.serve_stale = serve_stale
+        self._items: OrderedDict = OrderedDict()
+        self._inflight: dict = {}
+
+    async def get(self, key, loader):
+        """Значение по ключу; loader() — корутина‑загрузчик при промахе."""
+        item = self._items.get(key)
+        if item is not None and item[0] > time.monotonic():
+            return item[1]
+        return await asyncio.shield(self._start(key, loader))
+
+    def prefetch(self, key, loader):
+        """Начать загрузку в фоне, если значения нет или оно устарело."""
+        item = self._items.get(key)
+        if item is None or item[0] <= time.monotonic():
+            self._start(key, loader)
+
+    def _start(self, key, loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._load(key, loader))
+            # ошибку забирает ожидающий; если все ушли — не шумим в лог
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader()
+        except Exception as e:
+            item = self._items.get(key)
+            if not self.serve_stale or item is None:
+                raise
+            logger.warning(f"Cache load failed for {key!r}, serving stale value: {e}")
+            return item[1]
+        else:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_keys:
+                self._items.popitem(last=False)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key=None):
+        """Сбрасывает ключ (или весь кэш)."""
+        if key is None:
+            self._items.clear()
+        else:
+            self._items.pop(key, None)
+
+    def stale(self, key) -> bool:
+        """Значение есть, но устарело — с serve_stale: последняя загрузка не удалась."""
+        item = self._items.get(key)
+        return item is not None and item[0] <= time.monotonic()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StaleWhileRevalidate:
+    """
+    Одно значение (например, список vApp), которое отдаётся из памяти сразу.
+
+    Старше fresh_for — всё равно отдаётся сразу, а в фоне запускается
+    обновление. Ждут только первая загрузка и явный refresh(); одновременные
+    обновления не дублируются. Неудачное обновление оставляет прежнее
+    значение. start() дополнительно обновляет значение раз в refresh_interval,
+    чтобы отчёты открывались с тёплым кэшем.
+    """
+
+    def __init__(self, name: str, loader, fresh_for: float, refresh_interval: float = 0):
+        self.name = name
+        self._loader = loader
+        self.fresh_for = fresh_for
+        self.refresh_interval = refresh_interval
+        self.value = None
+        self.loaded_at: float | None = None  # time.time() последней успешной загрузки
+        self._inflight: asyncio.Task | None = None
+        self._periodic: asyncio.Task | None = None
+
+    @property
+    def age(self) -> float | None:
+        """Возраст данных, сек (None — ещё не загружены)."""
+        return None if self.loaded_at is None else max(0.0, time.time() - self.loaded_at)
+
+    async def get(self):
+        if self.loaded_at is None:
+            return await self.refresh()
+        if self.age > self.fresh_for:
+            self._start_refresh()
+        return self.value
+
+    async def refresh(self):
+        """Обновить сейчас и дождаться (общий запрос с уже идущим обновлением)."""
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._load(), name=f"{self.name} refresh")
+            self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def _load(self):
+        started = time.monotonic()
+        value = await self._loader()
+        self.value = value
+        self.loaded_at = time.time()
+        logger.info(f"{self.name}: refreshed in {time.monotonic() - started:.2f}s")
+        return value
+
+    def _log_failure(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{self.name}: refresh failed: {task.exception()}")
+
+    def start(self):
+        if self.refresh_interval > 0 and (self._periodic is None or self._periodic.done()):
+            self._periodic = asyncio.create_task(self._run(), name=f"{self.name} periodic refresh")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # уже в логе из _log_failure
+            await asyncio.sleep(self.refresh_interval)
+
+    async def stop(self):
+        for task in (self._periodic, self._inflight):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._periodic = self._inflight = None
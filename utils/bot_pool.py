@@ -0,0 +1,87 @@
+import bisect
+import hashlib
+from aiogram import Bot
+from aiogram.client.bot import DefaultBotProperties
+from globals.config import BOT_TOKENS
+from logger.logger import logger
+
+# Точек на кольце на один токен: чем больше, тем ровнее делятся чаты
+VIRTUAL_NODES = 64
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def bot_id_from_token(token: str) -> int:
+    """ID бота — числовая часть токена до двоеточия."""
+    return int(token.split(":", 1)[0])
+
+
+class BotPool:
+    """
+    Несколько ботов для исходящих сообщений.
+
+    Новое сообщение уходит через бота, выбранного консистентным хэшированием
+    по (чат, тема): все сообщения одной темы идут через один токен и не
+    обгоняют друг друга, а добавление токена переносит лишь часть тем.
+    Правки и ответы — только через бота, который отправил сообщение
+    (bot_id хранится рядом с message_id). Первый токен — основной:
+    он же обслуживает старые сообщения без bot_id.
+    """
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = {bot_id_from_token(token): token for token in tokens}
+        self.primary_id = bot_id_from_token(tokens[0])
+        self._bots: dict[int, Bot] = {}
+
+        ring = sorted(
+            (_hash(f"{bot_id}#{i}"), bot_id)
+            for bot_id in self.tokens
+            for i in range(VIRTUAL_NODES)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_ids = [bot_id for _, bot_id in ring]
+
+    def __len__(self):
+        return len(self.tokens)
+
+    @property
+    def primary(self) -> Bot:
+        return self.get(self.primary_id)
+
+    def get(self, bot_id: int | None = None) -> Bot:
+        """Бот по ID; для неизвестного или пустого ID — основной."""
+        if bot_id is None:
+            bot_id = self.primary_id
+        elif bot_id not in self.tokens:
+            logger.warning(f"Bot {bot_id} is not configured anymore, using primary bot")
+            bot_id = self.primary_id
+
+        bot = self._bots.get(bot_id)
+        if bot is None:
+            bot = self._bots[bot_id] = Bot(
+                token=self.tokens[bot_id],
+                default=DefaultBotProperties(parse_mode="HTML")
+            )
+        return bot
+
+    def for_chat(self, chat_id, topic_id: int | None = None) -> Bot:
+        """Бот для новых сообщений в чат/тему."""
+        if len(self.tokens) == 1:
+            return self.primary
+        point = _hash(f"{chat_id}:{topic_id or 0}")
+        index = bisect.bisect(self._ring_hashes, point) % len(self._ring_hashes)
+        return self.get(self._ring_ids[index])
+
+    def all(self) -> list[Bot]:
+        """Все боты, основной — первый."""
+        return [self.get(bot_id) for bot_id in self.tokens]
+
+    async def close(self):
+        for bot in self._bots.values():
+            await bot.session.close()
+        self._bots.clear()
+
+
+bot_pool = BotPool(BOT_TOKENS)
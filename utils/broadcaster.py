@@ -0,0 +1,68 @@
+import asyncio
+from globals.config import SSE_QUEUE_SIZE, SSE_MAX_SUBSCRIBERS
+from logger.logger import logger
+
+
+class Subscriber:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.dropped = False
+
+
+class Broadcaster:
+    """
+    Рассылка событий любому числу подписчиков.
+
+    publish() не ждёт никого: у каждого подписчика своя ограниченная очередь,
+    и если она переполнена (клиент не успевает читать), подписчик
+    отключается — один медленный клиент не тормозит цикл и остальных.
+    Отключённый подписчик получает None последним элементом очереди.
+    """
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE, max_subscribers: int = SSE_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscriber] = set()
+
+    def subscribe(self) -> Subscriber | None:
+        """Новый подписчик или None, если достигнут лимит."""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        # освобождаем очередь и кладём маркер конца потока
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        logger.warning("Slow stream subscriber dropped")
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+# События изменений инцидентов (из LISTEN incident_changes)
+incident_events = Broadcaster()
+
+# После переподключения LISTEN события могли потеряться — клиенту пора перечитать данные
+RESYNC_EVENT = '{"op":"resync"}'
+
+
+def on_incident_notify(payload: str | None):
+    incident_events.publish(payload if payload is not None else RESYNC_EVENT)
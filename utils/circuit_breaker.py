@@ -0,0 +1,74 @@
+import time
+from logger.logger import logger
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+# Числовое значение состояния для метрик
+STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Автомат разомкнут — запрос не отправляется, пока сервис не оживёт."""
+
+
+class CircuitBreaker:
+    """
+    Автомат для внешнего сервиса.
+
+    После failure_threshold сбоев подряд размыкается: следующие reset_after
+    секунд запросы сразу получают CircuitOpen, а не ждут таймаута. Затем
+    пропускается один пробный запрос (half-open): успех замыкает автомат,
+    сбой снова размыкает его на reset_after.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_after: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    def before(self):
+        """Перед запросом: CircuitOpen, если запрос сейчас пускать нельзя."""
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self.rejected_total += 1
+        raise CircuitOpen(f"{self.name}: circuit open")
+
+    def success(self):
+        if self.state != CLOSED:
+            logger.info(f"{self.name}: circuit closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self._probing = False
+            self.opened_total += 1
+            logger.warning(f"{self.name}: circuit open for {self.reset_after:.0f}s "
+                           f"after {self.failures} failure(s)")
+
+    def release(self):
+        """Пробный запрос завершился без вердикта (отмена, ошибка клиента)."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import time
+from globals.config import (
+    CORRELATION_WINDOW_SECONDS, CORRELATION_REFRESH_DELAY,
+    DEPENDENCY_MAP_FILE, ALERT_ROUTES_RELOAD_SECONDS
+)
+from logger.logger import logger
+from utils.alert_router import NodeMatcher, alert_router
+from utils.notifier import refresh_incident
+from utils.outbox import REFRESH_INCIDENT
+
+# Критичность Zabbix по возрастанию (английские, русские названия и номера)
+SEVERITY_RANK = {
+    "not classified": 0, "не классифицировано": 0, "0": 0,
+    "information": 1, "информация": 1, "1": 1,
+    "warning": 2, "предупреждение": 2, "2": 2,
+    "average": 3, "средняя": 3, "3": 3,
+    "high": 4, "высокая": 4, "4": 4,
+    "disaster": 5, "чрезвычайная": 5, "5": 5,
+}
+
+
+def severity_at_most(severity: str, limit: str) -> bool:
+    """severity не выше limit; неизвестная критичность равна только самой себе."""
+    severity, limit = severity.strip().lower(), limit.strip().lower()
+    if severity == limit:
+        return True
+    rank, limit_rank = SEVERITY_RANK.get(severity), SEVERITY_RANK.get(limit)
+    return rank is not None and limit_rank is not None and rank <= limit_rank
+
+
+class DependencyMap:
+    """
+    Карта зависимостей узлов: {"hv-01": ["vm-*", "db-01"], ...}.
+    upstream(node) возвращает узлы, от которых зависит node, — один проход
+    NodeMatcher (bit на каждый вышестоящий узел).
+    """
+
+    def __init__(self, data: dict | None = None):
+        self.parents: list[str] = []
+        self.matcher = NodeMatcher()
+        for bit, (parent, children) in enumerate((data or {}).items()):
+            self.parents.append(parent.strip().lower())
+            for pattern in ([children] if isinstance(children, str) else children):
+                self.matcher.add(pattern, 1 << bit)
+
+    def upstream(self, node: str) -> list[str]:
+        mask = self.matcher.match(node)
+        result = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            result.append(self.parents[low.bit_length() - 1])
+        return result
+
+
+class Correlator:
+    """
+    Склейка каскадов алертов в родительский инцидент с дочерними.
+
+    Отправленный инцидент становится родителем на window секунд: алерты
+    с того же узла или с узлов, зависящих от него по карте зависимостей,
+    сохраняются дочерними (parent_id) без отдельного сообщения, а у
+    родителя растёт child_count. Дочерним становится только алерт не
+    критичнее родителя и с теми же адресатами маршрута — иначе он ушёл бы
+    не туда или потерялся бы под менее важным родителем. Сообщение
+    родителя перерисовывается отложенно — одна правка на пачку дочерних
+    алертов.
+    """
+
+    def __init__(self, window: float = CORRELATION_WINDOW_SECONDS,
+                 map_path: str = DEPENDENCY_MAP_FILE,
+                 refresh_delay: float = CORRELATION_REFRESH_DELAY,
+                 reload_interval: float = ALERT_ROUTES_RELOAD_SECONDS):
+        self.window = window
+        self.map_path = map_path
+        self.refresh_delay = refresh_delay
+        self.reload_interval = reload_interval
+        self.dependencies = DependencyMap()
+        self._mtime = None
+        self._checked_at = 0.0
+        # узел -> (родитель: id, node, severity, trigger; до какого момента к нему присоединяем)
+        self._recent: dict[str, tuple[dict, float]] = {}
+        self._prune_at = 1024
+        self._refreshing: dict[int, asyncio.Task] = {}
+        self._dirty: set[int] = set()
+        # несколько API‑воркеров: родитель мог быть создан в другом процессе
+        self.use_db_lookup = False
+        # перерисовку выполняет процесс бота (задание в outbox)
+        self.use_outbox = False
+        self.maybe_reload(force=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.map_path).st_mtime
+        except FileNotFoundError:
+            if self._mtime is not None:
+                logger.warning(f"Карта зависимостей {self.map_path} удалена — склейка только по узлу")
+                self.dependencies = DependencyMap()
+                self._mtime = None
+            return
+
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.map_path, encoding="utf-8") as f:
+                self.dependencies = DependencyMap(json.load(f))
+            self._mtime = mtime
+            logger.info(f"Карта зависимостей загружена из {self.map_path}: "
+                        f"{len(self.dependencies.parents)} узлов")
+        except Exception as e:
+            # оставляем предыдущую рабочую карту
+            self._mtime = mtime
+            logger.error(f"Ошибка загрузки карты зависимостей {self.map_path}: {e}", exc_info=True)
+
+    async def load(self, db):
+        """Восстанавливает недавних родителей из БД после рестарта."""
+        if not self.enabled:
+            return
+        for incident in await db.get_recent_parents(self.window):
+            self._remember(incident, incident['created_at'].timestamp() + self.window)
+
+    def register(self, incident: dict):
+        """Отправленный инцидент становится кандидатом в родители."""
+        if self.enabled:
+            self._remember(incident, time.time() + self.window)
+
+    def _remember(self, incident: dict, expires_at: float):
+        parent = {key: incident[key] for key in ("id", "node", "severity", "trigger")}
+        self._recent[parent['node'].lower()] = (parent, expires_at)
+        if len(self._recent) > self._prune_at:
+            now = time.time()
+            self._recent = {k: v for k, v in self._recent.items() if v[1] > now}
+            self._prune_at = max(1024, 2 * len(self._recent))
+
+    def related_nodes(self, node: str) -> list[str]:
+        """Сам узел и все вышестоящие по карте зависимостей."""
+        self.maybe_reload()
+        return [node.lower(), *self.dependencies.upstream(node)]
+
+    def candidates(self, node: str) -> list[dict]:
+        now = time.time()
+        result = []
+        for name in self.related_nodes(node):
+            entry = self._recent.get(name)
+            if entry is None:
+                continue
+            if entry[1] <= now:
+                del self._recent[name]
+            elif all(entry[0]['id'] != parent['id'] for parent in result):
+                result.append(entry[0])
+        return result
+
+    @staticmethod
+    def fits(parent: dict, alert: dict) -> bool:
+        """Алерт не критичнее родителя и уходит тем же адресатам."""
+        if not severity_at_most(alert['severity'], parent['severity']):
+            return False
+        targets = alert_router.resolve(alert['severity'], alert['node'], alert['trigger'])
+        parent_targets = alert_router.resolve(parent['severity'], parent['node'], parent['trigger'])
+        return set(targets) == set(parent_targets)
+
+    def forget(self, parent_id: int):
+        self._recent = {k: v for k, v in self._recent.items() if v[0]['id'] != parent_id}
+
+    async def attach(self, db, incident: dict) -> tuple[dict | None, int | None]:
+        """
+        Сохраняет алерт дочерним инцидентом подходящего активного родителя:
+        вставка и child_count + 1 — в одной транзакции (db.create_child_incident).
+        Возвращает (родитель, ID инцидента) или (None, None) — родителя нет,
+        алерт нужно сохранить обычным инцидентом.
+        """
+        if not self.enabled:
+            return None, None
+        for parent in self.candidates(incident['node']):
+            if not self.fits(parent, incident):
+                continue
+            incident_id = await db.create_child_incident(incident, parent['id'])
+            if incident_id is not None:
+                return parent, incident_id
+            # родитель уже закрыт — больше к нему не присоединяем
+            self.forget(parent['id'])
+
+        if self.use_db_lookup:
+            found = await db.find_recent_parent(self.related_nodes(incident['node']), self.window)
+            if found is not None and self.fits(found, incident):
+                incident_id = await db.create_child_incident(incident, found['id'])
+                if incident_id is not None:
+                    self._remember(found, found['created_at'].timestamp() + self.window)
+                    return found, incident_id
+        return None, None
+
+    def schedule_refresh(self, db, parent_id: int):
+        """Отложенная перерисовка сообщения родителя (одна на пачку алертов)."""
+        self._dirty.add(parent_id)
+        if parent_id in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh_later(db, parent_id))
+        self._refreshing[parent_id] = task
+
+    async def _refresh_later(self, db, parent_id: int):
+        try:
+            # алерты, пришедшие во время перерисовки, дают ещё один проход
+            while parent_id in self._dirty:
+                await asyncio.sleep(self.refresh_delay)
+                self._dirty.discard(parent_id)
+                if self.use_outbox:
+                    await db.enqueue_outbox(REFRESH_INCIDENT, parent_id)
+                    continue
+                parent = await db.get_incident(parent_id)
+                if parent:
+                    await refresh_incident(db, parent)
+        except Exception as e:
+            logger.error(f"Failed to refresh parent incident #{parent_id}: {e}", exc_info=True)
+        finally:
+            self._dirty.discard(parent_id)
+            self._refreshing.pop(parent_id, None)
+
+
+correlator = Correlator()
@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup
+from globals.config import EDIT_DEBOUNCE_SECONDS
+from logger.logger import logger
+
+
+class _PendingEdit:
+    __slots__ = ("bot", "kwargs", "digest", "future")
+
+    def __init__(self, bot, kwargs: dict, digest: str, future: asyncio.Future):
+        self.bot = bot
+        self.kwargs = kwargs
+        self.digest = digest
+        self.future = future
+
+
+def _key(chat_id, message_id: int) -> tuple:
+    # GROUP_ID приходит из окружения строкой, а message.chat.id — числом
+    try:
+        chat_id = int(chat_id)
+    except (TypeError, ValueError):
+        pass
+    return chat_id, message_id
+
+
+class EditCoalescer:
+    """
+    Склейка правок одного и того же сообщения Telegram.
+
+    Ключ — (chat_id, message_id). Для каждого сообщения помним хэш последнего
+    отправленного текста и клавиатуры: такая же правка отбрасывается локально,
+    без запроса к API и без ошибки "message is not modified". Правки, пришедшие
+    в пределах окна debounce, сливаются в один вызов edit_message_text с
+    последним содержимым; все ожидающие получают его результат.
+    """
+
+    def __init__(self, window: float = EDIT_DEBOUNCE_SECONDS, max_entries: int = 4096):
+        self.window = window
+        self.max_entries = max_entries
+        self._sent: OrderedDict = OrderedDict()
+        self._pending: dict = {}
+        self._tasks: set = set()
+        self._inflight: dict = {}
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup: InlineKeyboardMarkup | None) -> str:
+        markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup is not None else ""
+        return hashlib.blake2b(f"{text}\0{markup}".encode(), digest_size=16).hexdigest()
+
+    def remember(self, chat_id: int, message_id: int, text: str,
+                 reply_markup: InlineKeyboardMarkup | None = None):
+        """Запоминает содержимое только что отправленного сообщения."""
+        self._store(_key(chat_id, message_id), self.fingerprint(text, reply_markup))
+
+    def forget(self, chat_id: int, message_id: int):
+        """Забывает сообщение (удалено или изменено в обход склейки)."""
+        self._sent.pop(_key(chat_id, message_id), None)
+
+    def _store(self, key, digest: str):
+        self._sent[key] = digest
+        self._sent.move_to_end(key)
+        while len(self._sent) > self.max_entries:
+            self._sent.popitem(last=False)
+
+    async def edit(self, bot, chat_id: int, message_id: int, text: str,
+                   reply_markup: InlineKeyboardMarkup | None = None,
+                   parse_mode: str | None = None, window: float | None = None) -> bool:
+        """
+        Редактирует сообщение с учётом склейки.
+        Возвращает True, если запрос к API был выполнен, и False, если правка
+        оказалась пустой. Ошибки Telegram (кроме "not modified") пробрасываются.
+        """
+        key = _key(chat_id, message_id)
+        digest = self.fingerprint(text, reply_markup)
+        kwargs = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": parse_mode,
+            "reply_markup": reply_markup,
+        }
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            # уже ждём отправки — подменяем содержимое на более свежее
+            pending.bot, pending.kwargs, pending.digest = bot, kwargs, digest
+            logger.debug(f"Правка {key} склеена с ожидающей")
+            return await asyncio.shield(pending.future)
+
+        if key not in self._inflight and self._sent.get(key) == digest:
+            logger.debug(f"Правка {key} пропущена: содержимое не изменилось")
+            return False
+
+        loop = asyncio.get_running_loop()
+        pending = _PendingEdit(bot, kwargs, digest, loop.create_future())
+        # помечаем исключение прочитанным, даже если все ожидающие отменены
+        pending.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = pending
+        delay = self.window if window is None else window
+        task = asyncio.create_task(self._flush_later(key, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(pending.future)
+
+    async def _flush_later(self, key, delay: float):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # даём шанс склеиться правкам из той же итерации цикла
+            await asyncio.sleep(0)
+
+        # предыдущая правка этого сообщения ещё в полёте — дожидаемся её,
+        # чтобы более старое содержимое не перезаписало новое
+        previous = self._inflight.get(key)
+        if previous is not None and not previous.done():
+            await asyncio.wait({previous})
+
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        self._inflight[key] = asyncio.current_task()
+        try:
+            await self._send(key, pending)
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def _send(self, key, pending: _PendingEdit):
+        if self._sent.get(key) == pending.digest:
+            pending.future.set_result(False)
+            return
+
+        try:
+            await pending.bot.edit_message_text(**pending.kwargs)
+        except TelegramBadRequest as e:
+            error = str(e).lower()
+            if "message is not modified" in error:
+                self._store(key, pending.digest)
+                pending.future.set_result(False)
+                return
+            if "message to edit not found" in error:
+                self._sent.pop(key, None)
+            pending.future.set_exception(e)
+            return
+        except Exception as e:
+            pending.future.set_exception(e)
+            return
+
+        self._store(key, pending.digest)
+        pending.future.set_result(True)
+
+
+# Общий экземпляр для всего процесса
+edit_coalescer = EditCoalescer()
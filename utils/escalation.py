@@ -0,0 +1,148 @@
+import asyncio
+import time
+from database.leader import AdvisoryLeader
+from globals.config import ESCALATION_RULES, ESCALATION_RESYNC_SECONDS
+from logger.logger import logger
+from utils.notifier import reply_to_incident
+from utils.timers import TimerScheduler
+
+# Ключ pg_advisory_lock для лидера эскалаций (любой фиксированный bigint)
+ESCALATION_LOCK_KEY = 0x7A62_0031
+
+
+class EscalationManager:
+    """
+    Эскалация инцидентов, которые долго остаются в статусе open.
+
+    Шаги берутся из ESCALATION_RULES по критичности ("*" — для остальных),
+    сроки считаются от escalate_from. Таймеры живут в одном TimerScheduler
+    (группа — ID инцидента) и выполняются только на реплике‑лидере; при
+    получении лидерства и затем периодически они восстанавливаются из БД.
+    Выполненный шаг фиксируется в escalation_level, поэтому рестарт или
+    смена лидера не повторяют уже отправленные напоминания, а из шагов,
+    просроченных за время простоя, срабатывает только старший.
+    """
+
+    def __init__(self, rules: dict = ESCALATION_RULES, resync_interval: float = ESCALATION_RESYNC_SECONDS):
+        self.rules = rules
+        self.resync_interval = resync_interval
+        self.scheduler = TimerScheduler("escalation")
+        self.db = None
+        self.leader: AdvisoryLeader | None = None
+        self._resync_task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rules)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader is not None and self.leader.is_leader
+
+    def steps_for(self, severity: str) -> list[dict]:
+        key = (severity or "").strip().lower()
+        return self.rules.get(key) or self.rules.get("*") or []
+
+    async def start(self, db, dsn: str):
+        if not self.enabled:
+            logger.info("Escalation rules are not configured, escalation disabled")
+            return
+        self.db = db
+        self.scheduler.start()
+        self.leader = AdvisoryLeader(dsn, ESCALATION_LOCK_KEY, name="escalation")
+        self.leader.start(on_elected=self.rebuild, on_lost=self._on_lost)
+        self._resync_task = asyncio.create_task(self._resync_loop(), name="escalation-resync")
+
+    async def stop(self):
+        if self._resync_task:
+            self._resync_task.cancel()
+            self._resync_task = None
+        if self.leader:
+            await self.leader.stop()
+        await self.scheduler.stop()
+        self.scheduler.clear()
+
+    def arm(self, incident: dict) -> int:
+        """Планирует оставшиеся шаги эскалации инцидента; возвращает их число."""
+        if not self.is_leader or incident.get('status', 'open') != 'open':
+            return 0
+        steps = self.steps_for(incident['severity'])
+        level = incident.get('escalation_level') or 0
+        if level >= len(steps):
+            return 0
+
+        anchor = incident.get('escalate_from') or incident.get('created_at')
+        now = time.time()
+        start = anchor.timestamp() if anchor else now
+        # после рестарта или смены лидера сроки нескольких шагов могли уже
+        # пройти: отправляем только старший из них (он и выставит уровень),
+        # а не пачку напоминаний разом
+        first = level
+        while first + 1 < len(steps) and start + steps[first + 1]["after"] * 60 <= now:
+            first += 1
+        incident_id = incident['id']
+        for index in range(first, len(steps)):
+            step = steps[index]
+            self.scheduler.call_at(start + step["after"] * 60, incident_id,
+                                   self._fire, incident_id, index, step)
+        return len(steps) - first
+
+    def disarm(self, incident_id: int) -> int:
+        """Отменяет все ожидающие шаги (инцидент взят в работу или закрыт)."""
+        return self.scheduler.cancel(incident_id)
+
+    async def rearm(self, incident_id: int):
+        """Эскалация заново — после переоткрытия инцидента."""
+        self.disarm(incident_id)
+        if not self.enabled:
+            return
+        incident = await self.db.reset_escalation(incident_id)
+        if incident:
+            self.arm(incident)
+
+    async def rebuild(self):
+        """Полностью пересобирает таймеры из открытых инцидентов в БД."""
+        self.scheduler.clear()
+        armed = sum(self.arm(incident) for incident in await self.db.get_escalation_candidates())
+        logger.info(f"Escalation timers rebuilt: {armed} pending steps")
+
+    async def _resync(self):
+        # подхватываем инциденты, созданные другими репликами
+        for incident in await self.db.get_escalation_candidates():
+            if not self.scheduler.pending(incident['id']):
+                self.arm(incident)
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(self.resync_interval)
+            if not self.is_leader:
+                continue
+            try:
+                await self._resync()
+            except Exception as e:
+                logger.error(f"Escalation resync failed: {e}", exc_info=True)
+
+    async def _on_lost(self):
+        self.scheduler.clear()
+        logger.warning("Escalation leadership lost, timers dropped")
+
+    async def _fire(self, incident_id: int, index: int, step: dict):
+        if not self.is_leader:
+            return
+        incident = await self.db.mark_escalated(incident_id, index + 1)
+        if incident is None:
+            # уже взят в работу/закрыт или шаг выполнен другой репликой
+            return
+
+        text = step["text"] or (
+            f"⏰ <b>Инцидент №{incident_id}</b> не взят в работу "
+            f"уже {step['after']:g} мин"
+        )
+        if step["mention"]:
+            text += f"\n{step['mention']}"
+
+        delivered = await reply_to_incident(self.db, incident, text)
+        logger.info(f"Incident #{incident_id} escalated to level {index + 1} ({delivered} messages)")
+
+
+escalations = EscalationManager()
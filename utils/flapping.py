@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from globals.config import (
+    FLAP_SAMPLE_SECONDS, FLAP_HIGH_THRESHOLD, FLAP_LOW_THRESHOLD,
+    FLAP_NOTIFY_INTERVAL, FLAP_TTL_SECONDS, FLAP_MAX_KEYS
+)
+
+# Как в Nagios: 21 последнее состояние = 20 переходов,
+# вес перехода растёт от 0.8 (самый старый) до 1.2 (самый новый)
+HISTORY_SIZE = 21
+HISTORY_MASK = (1 << HISTORY_SIZE) - 1
+_WEIGHTS = [1.2 - 0.4 * i / (HISTORY_SIZE - 2) for i in range(HISTORY_SIZE - 1)]
+
+
+def flap_percent(bits: int) -> float:
+    """Взвешенный процент смен состояния; бит 0 — самое новое состояние."""
+    changes = (bits ^ (bits >> 1)) & (HISTORY_MASK >> 1)
+    total = 0.0
+    while changes:
+        low = changes & -changes
+        changes ^= low
+        total += _WEIGHTS[low.bit_length() - 1]
+    return total * 100 / (HISTORY_SIZE - 1)
+
+
+class FlapState:
+    __slots__ = ("bits", "problem", "last_seen", "flapping", "notified_at")
+
+    def __init__(self, now: float):
+        self.bits = 0
+        self.problem = False
+        self.last_seen = now
+        self.flapping = False
+        self.notified_at = 0.0
+
+    def push(self, problem: bool, count: int = 1):
+        count = min(count, HISTORY_SIZE)
+        fill = (1 << count) - 1 if problem else 0
+        self.bits = ((self.bits << count) | fill) & HISTORY_MASK
+        self.problem = problem
+
+
+class FlapResult(NamedTuple):
+    flapping: bool
+    percent: float
+    notify: bool
+
+
+class FlapDetector:
+    """
+    Детектор флаппинга триггеров по ключу (узел, триггер).
+
+    История — 21 бит в одном int. Тихие периоды добавляют «устойчивые»
+    отсчёты (по одному на FLAP_SAMPLE_SECONDS), поэтому затихший триггер
+    сам выходит из флаппинга. Гистерезис: флаппинг начинается при
+    проценте ≥ high и заканчивается при < low. Пока триггер флаппит,
+    уведомление разрешается не чаще раза в notify_interval.
+    Ключи хранятся в LRU: не больше max_keys, простаивающие дольше ttl
+    вытесняются.
+    """
+
+    def __init__(
+        self,
+        sample_seconds: float = FLAP_SAMPLE_SECONDS,
+        high: float = FLAP_HIGH_THRESHOLD,
+        low: float = FLAP_LOW_THRESHOLD,
+        notify_interval: float = FLAP_NOTIFY_INTERVAL,
+        ttl: float = FLAP_TTL_SECONDS,
+        max_keys: int = FLAP_MAX_KEYS
+    ):
+        self.sample_seconds = sample_seconds
+        self.high = high
+        self.low = low
+        self.notify_interval = notify_interval
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._states: OrderedDict[tuple[str, str], FlapState] = OrderedDict()
+
+    def observe(self, node: str, trigger: str, problem: bool | None = None,
+                now: float | None = None) -> FlapResult:
+        """
+        Учитывает событие триггера. problem=None — алерт без состояния:
+        считается новым срабатыванием, а восстановление между двумя
+        срабатываниями подразумевается (тихий период считается OK).
+        """
+        now = time.time() if now is None else now
+
+        key = (node.lower(), trigger.lower())
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = FlapState(now)
+        else:
+            self._states.move_to_end(key)
+            quiet = int((now - state.last_seen) // self.sample_seconds)
+            if quiet > 0:
+                state.push(state.problem, quiet)
+
+        if problem is None:
+            # импульс: проблема, сразу за ней подразумеваемое восстановление
+            if state.bits & 1:
+                state.push(False)
+            state.push(True)
+            state.problem = False
+        else:
+            state.push(problem)
+        state.last_seen = now
+        # после вставки: текущий ключ — самый свежий и не вытесняется
+        self._evict(now)
+
+        percent = flap_percent(state.bits)
+        started = False
+        if state.flapping and percent < self.low:
+            state.flapping = False
+        elif not state.flapping and percent >= self.high:
+            state.flapping = started = True
+
+        # начало флаппинга сообщаем сразу, дальше — не чаще notify_interval
+        notify = not state.flapping or started or now - state.notified_at >= self.notify_interval
+        if notify:
+            state.notified_at = now
+        return FlapResult(state.flapping, percent, notify)
+
+    def _evict(self, now: float):
+        states = self._states
+        while states:
+            key, state = next(iter(states.items()))
+            if len(states) <= self.max_keys and now - state.last_seen < self.ttl:
+                break
+            del states[key]
+
+    def __len__(self):
+        return len(self._states)
+
+
+flap_detector = FlapDetector()
@@ -0,0 +1,31 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен — без него работает стандартный json
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """JSON в bytes: orjson, если установлен, иначе json из стандартной библиотеки."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,39 +1,62 @@
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from logger.logger import logger
 
+
+# --- Фабрики клавиатур по статусу инцидента (без обращений к БД) ---
+def _open_keyboard(incident_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="Take", callback_data=f"take_{incident_id}"),
+            InlineKeyboardButton(text="Reject", callback_data=f"reject_{incident_id}")
+        ]
+    ])
+
+
+def _in_progress_keyboard(incident_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text="Reassign", callback_data=f"reassign_{incident_id}"),
+            InlineKeyboardButton(text="Close", callback_data=f"close_{incident_id}")
+        ]
+    ])
+
+
+def _finished_keyboard(incident_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Reopen", callback_data=f"reopen_{incident_id}")]
+    ])
+
+
+INCIDENT_KEYBOARDS = {
+    'open': _open_keyboard,
+    'in_progress': _in_progress_keyboard,
+    'closed': _finished_keyboard,
+    'rejected': _finished_keyboard,
+}
+
+
+@lru_cache(maxsize=2048)
+def build_incident_keyboard(incident_id: int, status: str) -> InlineKeyboardMarkup | None:
+    """
+    Клавиатура инцидента по его статусу.
+    Разметка не меняется для пары (id, статус), поэтому результат кэшируется;
+    возвращаемый объект не модифицируйте.
+    """
+    factory = INCIDENT_KEYBOARDS.get(status)
+    return factory(incident_id) if factory else None
+
+
 async def get_incident_keyboard(incident_id: int, db):
-    """Генерация клавиатуры для инцидента"""
+    """Генерация клавиатуры для инцидента (с чтением статуса из БД)"""
     try:
         incident = await db.get_incident(incident_id)
         if not incident:
             logger.warning(f"Incedent #{incident_id} not found for keyboard")
             return None
 
-        status = incident['status']
-
-        if status == 'open':
-            return InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="Take", callback_data=f"take_{incident_id}"),
-                    InlineKeyboardButton(text="Reject", callback_data=f"reject_{incident_id}")
-                ]
-            ])
-
-        elif status == 'in_progress':
-            return InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(text="Reassign", callback_data=f"reassign_{incident_id}"),
-                    InlineKeyboardButton(text="Close", callback_data=f"close_{incident_id}")
-                ]
-            ])
-
-        elif status in ['closed', 'rejected']:
-            return InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="Reopen", callback_data=f"reopen_{incident_id}")]
-            ])
-
-        return None
+        return build_incident_keyboard(incident_id, incident['status'])
 
     except Exception as e:
         logger.error(f"Error generating keyboard for incident #{incident_id}: {e}", exc_info=True)
-        return None
\ No newline at end of file
+        return None
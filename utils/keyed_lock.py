@@ -0,0 +1,80 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from globals.config import INFLIGHT_TTL_SECONDS, INFLIGHT_MAX_KEYS
+
+
+class KeyedLockRegistry:
+    """
+    Реестр блокировок по ключу.
+
+    Два вида блокировок:
+    * метки «в процессе» (try_acquire/release) — неблокирующие, с TTL:
+      повторный клик по той же кнопке сразу получает отказ, а забытая метка
+      (пользователь так и не ввёл комментарий) сама истекает;
+    * lock(key) — обычный asyncio.Lock на ключ для сериализации обновлений
+      одного инцидента; запись удаляется, когда ожидающих не осталось.
+
+    Память ограничена: просроченные метки вычищаются при каждом захвате,
+    а при превышении max_keys выбрасываются самые старые.
+    """
+
+    def __init__(self, ttl: float = INFLIGHT_TTL_SECONDS, max_keys: int = INFLIGHT_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._marks: OrderedDict = OrderedDict()
+        self._locks: dict = {}
+
+    # --- метки «в процессе» ---
+    def try_acquire(self, key, ttl: float | None = None) -> bool:
+        """Ставит метку, если её нет (или она истекла). True — метка наша."""
+        now = time.monotonic()
+        self._evict(now)
+
+        expires_at = self._marks.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+
+        self._marks[key] = now + (self.ttl if ttl is None else ttl)
+        self._marks.move_to_end(key)
+        while len(self._marks) > self.max_keys:
+            self._marks.popitem(last=False)
+        return True
+
+    def release(self, key):
+        self._marks.pop(key, None)
+
+    def is_held(self, key) -> bool:
+        expires_at = self._marks.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def _evict(self, now: float):
+        # метки добавляются в конец, так что самые старые — в начале
+        while self._marks:
+            key, expires_at = next(iter(self._marks.items()))
+            if expires_at > now:
+                break
+            self._marks.popitem(last=False)
+
+    # --- ожидающая блокировка ---
+    @asynccontextmanager
+    async def lock(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(key, None)
+
+    def __len__(self):
+        return len(self._marks) + len(self._locks)
+
+
+# Общий реестр для операций над инцидентами
+incident_locks = KeyedLockRegistry()
@@ -0,0 +1,213 @@
+import asyncio
+import bisect
+import html
+from datetime import datetime, timezone
+from database.queries import MAINTENANCE_CHANNEL
+from globals.config import MAINTENANCE_RELOAD_SECONDS
+from logger.logger import logger
+from utils.alert_router import NodeMatcher, DEFAULT_TARGET
+from utils.messages import TIME_FORMAT
+from utils.notifier import get_bot
+from utils.timers import TimerScheduler
+
+SUMMARY_MAX_LINES = 20
+
+
+class IntervalIndex:
+    """
+    Статическое дерево интервалов [start, end) для запросов «какой интервал
+    содержит точку t».
+
+    Интервалы отсортированы по началу; для каждой позиции хранится интервал
+    с максимальным концом среди всех, начавшихся не позже (неявное
+    дерево с агрегатом max(end) по префиксу). Запрос — один bisect, O(log n).
+    Перестраивается целиком при изменении набора окон — их немного,
+    а запросы идут на каждый алерт.
+    """
+
+    __slots__ = ("_starts", "_best_end", "_best_item")
+
+    def __init__(self, intervals: list[tuple[float, float, object]]):
+        intervals = sorted(intervals, key=lambda i: i[0])
+        self._starts = [start for start, _, _ in intervals]
+        self._best_end: list[float] = []
+        self._best_item: list = []
+        best_end, best_item = float("-inf"), None
+        for _, end, item in intervals:
+            if end > best_end:
+                best_end, best_item = end, item
+            self._best_end.append(best_end)
+            self._best_item.append(best_item)
+
+    def find(self, point: float):
+        """Интервал, содержащий point (с самым поздним концом), или None."""
+        pos = bisect.bisect_right(self._starts, point) - 1
+        if pos >= 0 and self._best_end[pos] > point:
+            return self._best_item[pos]
+        return None
+
+    def __len__(self):
+        return len(self._starts)
+
+
+class MaintenanceIndex:
+    """
+    Окна обслуживания, сгруппированные по шаблону узла: NodeMatcher даёт
+    маску подходящих шаблонов, у каждого шаблона своё IntervalIndex.
+    """
+
+    def __init__(self, windows: list[dict]):
+        by_pattern: dict[str, list] = {}
+        for window in windows:
+            pattern = window["node_pattern"].strip().lower()
+            by_pattern.setdefault(pattern, []).append(
+                (window["starts_at"].timestamp(), window["ends_at"].timestamp(), window)
+            )
+
+        self.nodes = NodeMatcher()
+        self.trees: list[IntervalIndex] = []
+        for bit, (pattern, intervals) in enumerate(by_pattern.items()):
+            self.nodes.add(pattern, 1 << bit)
+            self.trees.append(IntervalIndex(intervals))
+
+    def find(self, node: str, at: float) -> dict | None:
+        mask = self.nodes.match(node)
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            window = self.trees[low.bit_length() - 1].find(at)
+            if window is not None:
+                return window
+        return None
+
+
+def validate_pattern(pattern: str):
+    """Бросает ValueError, если шаблон узла не поддерживается."""
+    NodeMatcher().add(pattern, 1)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class MaintenanceManager:
+    """
+    Окна обслуживания: хранятся в БД, в памяти — MaintenanceIndex.
+    По окончании каждого окна в чат, где его создали, уходит одно итоговое
+    сообщение с подавленными алертами. Индекс перечитывается по NOTIFY
+    maintenance_changes (окна, созданные другими процессами) и раз в
+    reload_interval — на случай потерянного уведомления.
+    """
+
+    def __init__(self, reload_interval: float = MAINTENANCE_RELOAD_SECONDS):
+        self.reload_interval = reload_interval
+        self.index = MaintenanceIndex([])
+        self.windows: dict[int, dict] = {}
+        self.scheduler = TimerScheduler("maintenance")
+        self.db = None
+        self.summaries = True
+        self._reload_task: asyncio.Task | None = None
+        self._changed = asyncio.Event()
+
+    async def start(self, db, summaries: bool = True):
+        """summaries=False — только индекс для подавления (API‑процесс без бота)."""
+        self.db = db
+        self.summaries = summaries
+        self.scheduler.start()
+        # None после переподключения слушателя — тоже повод перечитать
+        db.add_listener(MAINTENANCE_CHANNEL, lambda _payload: self._changed.set())
+        await self.reload()
+        self._reload_task = asyncio.create_task(self._reload_loop(), name="maintenance-reload")
+
+    async def stop(self):
+        if self._reload_task:
+            self._reload_task.cancel()
+            self._reload_task = None
+        await self.scheduler.stop()
+        self.scheduler.clear()
+
+    async def reload(self):
+        windows = await self.db.get_maintenance_windows()
+        self.windows = {w["id"]: w for w in windows}
+        self.index = MaintenanceIndex(windows)
+
+        self.scheduler.clear()
+        if not self.summaries:
+            return
+        for window in windows:
+            # уже закончившиеся окна без итога сработают сразу
+            self.scheduler.call_at(window["ends_at"].timestamp(), window["id"],
+                                   self._summarize, window["id"])
+
+    async def _reload_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self.reload_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Maintenance windows reload failed: {e}", exc_info=True)
+
+    def find(self, node: str, at: datetime | None = None) -> dict | None:
+        """Окно, под которое попадает узел в момент at (по умолчанию — сейчас)."""
+        point = (at or datetime.now(timezone.utc)).timestamp()
+        return self.index.find(node, point)
+
+    async def add(self, node_pattern: str, starts_at: datetime, ends_at: datetime, **kwargs) -> dict | None:
+        window = await self.db.add_maintenance_window(
+            node_pattern.strip().lower(), _as_utc(starts_at), _as_utc(ends_at), **kwargs
+        )
+        if window:
+            await self.reload()
+        return window
+
+    async def remove(self, window_id: int) -> dict | None:
+        window = await self.db.delete_maintenance_window(window_id)
+        if window:
+            await self.reload()
+        return window
+
+    def active(self) -> list[dict]:
+        return sorted(self.windows.values(), key=lambda w: w["starts_at"])
+
+    async def _summarize(self, window_id: int):
+        window = await self.db.claim_maintenance_summary(window_id)
+        if window is None:
+            # итог уже отправлен другой репликой или окно продлили/удалили
+            return
+        self.windows.pop(window_id, None)
+
+        rows = await self.db.get_maintenance_summary(window_id)
+        total = sum(row["count"] for row in rows)
+        text = (
+            f"🛠 <b>Окно обслуживания #{window_id} завершено</b>\n"
+            f"🌐 <b>Узлы:</b> {html.escape(window['node_pattern'])}\n"
+            f"🕒 <b>Период:</b> {_as_utc(window['starts_at']).strftime(TIME_FORMAT)} — "
+            f"{_as_utc(window['ends_at']).strftime(TIME_FORMAT)}\n"
+            f"🔕 <b>Подавлено алертов:</b> {total}"
+        )
+        if window.get("comment"):
+            text += f"\n💬 <b>Комментарий:</b> {html.escape(window['comment'])}"
+        if rows:
+            text += "\n\n" + "\n".join(
+                f"• {html.escape(row['node'])} — {html.escape(row['trigger'])} "
+                f"({html.escape(row['severity'])}) ×{row['count']}"
+                for row in rows[:SUMMARY_MAX_LINES]
+            )
+            if len(rows) > SUMMARY_MAX_LINES:
+                text += f"\n… и ещё {len(rows) - SUMMARY_MAX_LINES}"
+
+        chat_id = window.get("chat_id") or DEFAULT_TARGET.chat_id
+        topic_id = window.get("topic_id") if window.get("chat_id") else DEFAULT_TARGET.topic_id
+        try:
+            await get_bot().send_message(chat_id=chat_id, message_thread_id=topic_id,
+                                         text=text, parse_mode="HTML")
+            logger.info(f"Maintenance window #{window_id} finished: {total} alerts suppressed")
+        except Exception as e:
+            logger.error(f"Failed to send summary of maintenance window #{window_id}: {e}")
+
+
+maintenance = MaintenanceManager()
@@ -1,32 +1,71 @@
+from collections import OrderedDict
+from datetime import timezone
+from globals.config import GROUP_ID
+
+STATUS_DISPLAY = {
+    'open': 'открыт',
+    'in_progress': 'в работе',
+    'rejected': 'отклонен',
+    'closed': 'закрыт'
+}
+
+STATUS_EMOJI = {
+    'open': '🔓',
+    'in_progress': '🛠️',
+    'rejected': '❌',
+    'closed': '🔒'
+}
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S UTC-0'
+
+# --- Кэш отрендеренных сообщений ---
+# Ключ (вид, id, updated_at): любое изменение инцидента через БД двигает
+# updated_at, поэтому устаревшая запись просто перестаёт находиться.
+RENDER_CACHE_SIZE = 2048
+_render_cache: OrderedDict = OrderedDict()
+
+
+def _cached_render(kind: str, incident: dict, render) -> str:
+    updated_at = incident.get('updated_at')
+    if updated_at is None:
+        return render(incident)
+
+    key = (kind, incident['id'], updated_at)
+    text = _render_cache.get(key)
+    if text is not None:
+        _render_cache.move_to_end(key)
+        return text
+
+    text = render(incident)
+    _render_cache[key] = text
+    if len(_render_cache) > RENDER_CACHE_SIZE:
+        _render_cache.popitem(last=False)
+    return text
+
+
+def clear_render_cache():
+    """Сбрасывает кэш (например, после ручной правки инцидентов в БД)."""
+    _render_cache.clear()
+
+
+def _as_utc(value):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
 def format_incident_message(incident: dict) -> str:
-    status_display = {
-        'open': 'открыт',
-        'in_progress': 'в работе',
-        'rejected': 'отклонен',
-        'closed': 'закрыт'
-    }.get(incident['status'], incident['status'])
-    
-    emoji = {
-        'open': '🔓',
-        'in_progress': '🛠️',
-        'rejected': '❌',
-        'closed': '🔒'
-    }.get(incident['status'], 'ℹ️')
-    
-    # Время создания (UTC-0)
-    created_time_utc = incident['created_at']
-    if created_time_utc.tzinfo is None:
-        created_time_utc = created_time_utc.replace(tzinfo=timezone.utc)
-    
-    # Время закрытия (UTC-0), если есть
-    closed_time_utc = None
-    if incident.get('closed_at'):
-        closed_time_utc = incident['closed_at']
-        if closed_time_utc.tzinfo is None:
-            closed_time_utc = closed_time_utc.replace(tzinfo=timezone.utc)
-
-    # Форматируем время создания (UTC-0)
-    created_time_str = created_time_utc.strftime('%Y-%m-%d %H:%M:%S UTC-0')
+    return _cached_render('message', incident, _render_incident_message)
+
+
+def _render_incident_message(incident: dict) -> str:
+    status = incident['status']
+    status_display = STATUS_DISPLAY.get(status, status)
+    emoji = STATUS_EMOJI.get(status, 'ℹ️')
+
+    # Время создания и закрытия (UTC-0)
+    created_time_utc = _as_utc(incident['created_at'])
+    closed_time_utc = _as_utc(incident.get('closed_at'))
 
     text = (
         f"{emoji} <b>Инцидент №{incident['id']}</b>\n"
@@ -36,26 +75,30 @@ def format_incident_message(incident: dict) -> str:
         f"🔄 <b>Состояние:</b> {status_display}\n"
         f"🔴 <b>Уровень критичности:</b> {incident['severity']}\n"
         f"📄 <b>Подробности:</b> {incident['details']}\n"
-        f"🕒 <b>Время создания:</b> {created_time_str}"
+        f"🕒 <b>Время создания:</b> {created_time_utc.strftime(TIME_FORMAT)}"
     )
 
+    if incident.get('child_count'):
+        text += f"\n🔗 <b>Связанные алерты:</b> {incident['child_count']}"
+
+    if incident.get('flapping'):
+        text += "\n🔁 <b>Флаппинг:</b> триггер часто меняет состояние, повторы приглушены"
+
     # Добавляем информацию о взятии в работу, если есть
-    if incident.get('assigned_to_username') and incident['status'] == 'in_progress':
+    if incident.get('assigned_to_username') and status == 'in_progress':
         text += f"\n👤 <b>В работе у:</b> {incident['assigned_to_username']}"
 
     # Добавляем информацию о закрытии (UTC-0)
     if closed_time_utc:
-        closed_time_str = closed_time_utc.strftime('%Y-%m-%d %H:%M:%S UTC-0')
         text += f"\n🔒 <b>Закрыл:</b> {incident['closed_by_username']}"
-        text += f"\n🕒 <b>Время закрытия:</b> {closed_time_str}"
-        
+        text += f"\n🕒 <b>Время закрытия:</b> {closed_time_utc.strftime(TIME_FORMAT)}"
+
         # Расчёт длительности (UTC-0)
-        duration = closed_time_utc - created_time_utc
-        total_seconds = duration.total_seconds()
+        total_seconds = (closed_time_utc - created_time_utc).total_seconds()
         hours = int(total_seconds // 3600)
         minutes = int((total_seconds % 3600) // 60)
         seconds = int(total_seconds % 60)
-        
+
         # Форматируем вывод в зависимости от длительности
         if hours > 0:
             text += f"\n⏱️ <b>Время решения:</b> {hours}ч {minutes}м"
@@ -63,9 +106,31 @@ def format_incident_message(incident: dict) -> str:
             text += f"\n⏱️ <b>Время решения:</b> {minutes}м {seconds}с"
         else:
             text += f"\n⏱️ <b>Время решения:</b> {seconds}с"
-    
+
     # Добавляем комментарий, если есть
     if incident.get('comment'):
         text += f"\n💬 <b>Комментарий:</b> {incident['comment']}"
-    
-    return text
\ No newline at end of file
+
+    return text
+
+
+def format_active_line(incident: dict) -> str:
+    """Строка инцидента для списка /active."""
+    return _cached_render('active', incident, _render_active_line)
+
+
+def _render_active_line(incident: dict) -> str:
+    # Формируем информацию о назначенном пользователе
+    assigned_info = f" - {incident['assigned_to_username']}" if incident['assigned_to_username'] else ""
+
+    # Формируем ссылку на инцидент
+    if incident.get('message_id'):
+        chat_id = str(incident.get('chat_id') or GROUP_ID).replace('-100', '')
+        incident_link = f"https://t.me/c/{chat_id}/{incident['message_id']}"
+    else:
+        incident_link = f"(ID: #{incident['id']})"
+
+    return (
+        f"• #{incident['id']} - {incident['event']} "
+        f"({incident['status']}){assigned_info} - {incident_link}\n"
+    )
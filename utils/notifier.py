@@ -0,0 +1,279 @@
+import asyncio
+from collections import defaultdict
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import ReplyParameters
+from globals.config import (
+    GROUP_ID, TOPIC_ID,
+    TELEGRAM_CHAT_RATE_PER_MINUTE, TELEGRAM_CHAT_BURST, TELEGRAM_GLOBAL_RATE_PER_SECOND
+)
+from logger.logger import logger
+from utils.alert_router import RouteTarget
+from utils.bot_pool import bot_pool
+from utils.edit_coalescer import edit_coalescer
+from utils.keyboards import build_incident_keyboard
+from utils.messages import format_incident_message
+from utils.rate_limiter import RateLimiter
+
+# Лимиты Telegram действуют на каждый токен отдельно:
+# ключи — (bot_id, chat_id) для чата и bot_id для бота в целом
+chat_limiter = RateLimiter(TELEGRAM_CHAT_RATE_PER_MINUTE, per=60, burst=TELEGRAM_CHAT_BURST)
+global_limiter = RateLimiter(TELEGRAM_GLOBAL_RATE_PER_SECOND)
+
+
+def get_bot() -> Bot:
+    """Основной бот (служебные сообщения, не привязанные к инциденту)."""
+    return bot_pool.primary
+
+
+def _bot_for(msg: dict, fallback: Bot | None = None) -> Bot:
+    """Бот, отправивший сообщение; у старых записей без bot_id — fallback или основной."""
+    if msg.get("bot_id"):
+        return bot_pool.get(msg["bot_id"])
+    return fallback or bot_pool.primary
+
+
+async def _acquire(bot: Bot, chat_id):
+    await chat_limiter.acquire((bot.id, str(chat_id)))
+    await global_limiter.acquire(bot.id)
+
+
+def reserve_now(targets: list[RouteTarget]) -> bool:
+    """
+    Забирает токены лимитов под отправку во все цели, если их хватает без
+    ожидания. Иначе ничего не трогает и возвращает False: ждать лимит
+    в запросе /alert нельзя — Zabbix повторит алерт по таймауту.
+    """
+    chats, bots = defaultdict(int), defaultdict(int)
+    for target in targets:
+        bot = bot_pool.for_chat(target.chat_id, target.topic_id)
+        chats[(bot.id, str(target.chat_id))] += 1
+        bots[bot.id] += 1
+    if any(chat_limiter.available(key) < n for key, n in chats.items()):
+        return False
+    if any(global_limiter.available(key) < n for key, n in bots.items()):
+        return False
+    # проверка и резерв — без await между ними, поэтому атомарны
+    for limiter, needed in ((chat_limiter, chats), (global_limiter, bots)):
+        for key, n in needed.items():
+            for _ in range(n):
+                limiter.reserve(key)
+    return True
+
+
+async def _send_one(target: RouteTarget, text: str, keyboard, reserved: bool = False):
+    bot = bot_pool.for_chat(target.chat_id, target.topic_id)
+    for attempt in range(2):
+        if attempt or not reserved:
+            await _acquire(bot, target.chat_id)
+        try:
+            message = await bot.send_message(
+                chat_id=target.chat_id,
+                message_thread_id=target.topic_id,
+                text=text,
+                parse_mode="HTML",
+                reply_markup=keyboard
+            )
+            break
+        except TelegramRetryAfter as e:
+            if attempt:
+                raise
+            logger.warning(f"Flood control for bot {bot.id} in chat {target.chat_id}: "
+                           f"retry after {e.retry_after}s")
+            chat_limiter.penalize((bot.id, str(target.chat_id)), e.retry_after)
+    edit_coalescer.remember(message.chat.id, message.message_id, text, keyboard)
+    return bot, message
+
+
+async def send_incident(db, incident: dict, targets: list[RouteTarget], reserved: bool = False) -> list:
+    """
+    Рассылает сообщение инцидента во все цели маршрута параллельно
+    (каждую — через своего бота из пула) и сохраняет ID всех отправленных
+    сообщений вместе с ботом. Возвращает список успешно отправленных
+    сообщений (первое — основное). reserved — токены лимитов уже взяты
+    reserve_now().
+    """
+    incident_id = incident['id']
+    text = format_incident_message(incident)
+    keyboard = build_incident_keyboard(incident_id, incident['status'])
+
+    results = await asyncio.gather(
+        *(_send_one(target, text, keyboard, reserved) for target in targets),
+        return_exceptions=True
+    )
+
+    sent = []
+    primary_bot = None
+    for target, result in zip(targets, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to send incident #{incident_id} to {target}: {result}")
+            continue
+        bot, message = result
+        if not sent:
+            primary_bot = bot
+        sent.append(message)
+        await db.add_incident_message(incident_id, message.chat.id, target.topic_id, message.message_id, bot.id)
+
+    if sent:
+        # основное сообщение — для ссылок в /active и старого кода
+        await db.update_incident(
+            incident_id=incident_id,
+            message_id=sent[0].message_id,
+            chat_id=sent[0].chat.id,
+            bot_id=primary_bot.id
+        )
+        logger.info(f"Incident #{incident_id} sent to {len(sent)}/{len(targets)} targets")
+    return sent
+
+
+async def refresh_incident(db, incident: dict, bot: Bot | None = None,
+                           fallback_message_id: int | None = None) -> int:
+    """
+    Перерисовывает все сообщения инцидента (текст + клавиатура).
+    Каждое сообщение правит отправивший его бот; bot — для старых записей
+    без bot_id. Для старых инцидентов без записей в incident_messages правит
+    fallback_message_id в основной группе. Возвращает число сообщений.
+    """
+    incident_id = incident['id']
+    text = format_incident_message(incident)
+    keyboard = build_incident_keyboard(incident_id, incident['status'])
+
+    messages = await db.get_incident_messages(incident_id)
+    if not messages:
+        message_id = incident.get('message_id') or fallback_message_id
+        if not message_id:
+            return 0
+        messages = [{
+            "chat_id": incident.get('chat_id') or GROUP_ID,
+            "message_id": message_id,
+            "bot_id": incident.get('bot_id')
+        }]
+
+    async def edit(msg):
+        try:
+            await edit_coalescer.edit(
+                _bot_for(msg, bot),
+                chat_id=msg["chat_id"],
+                message_id=msg["message_id"],
+                text=text,
+                parse_mode="HTML",
+                reply_markup=keyboard
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to refresh message {msg['chat_id']}/{msg['message_id']} "
+                           f"of incident #{incident_id}: {e}")
+            return False
+
+    results = await asyncio.gather(*(edit(msg) for msg in messages))
+    return sum(results)
+
+
+async def reply_to_incident(db, incident: dict, text: str, bot: Bot | None = None) -> int:
+    """
+    Отправляет text ответом на каждое сообщение инцидента (в его чат и тему).
+    Ответ уходит через бота, отправившего сообщение.
+    Возвращает число доставленных ответов.
+    """
+    incident_id = incident['id']
+
+    messages = await db.get_incident_messages(incident_id)
+    if not messages:
+        if not incident.get('message_id'):
+            return 0
+        messages = [{
+            "chat_id": incident.get('chat_id') or GROUP_ID,
+            "topic_id": int(TOPIC_ID) if TOPIC_ID else None,
+            "message_id": incident['message_id'],
+            "bot_id": incident.get('bot_id')
+        }]
+
+    async def reply(msg):
+        try:
+            await _bot_for(msg, bot).send_message(
+                chat_id=msg["chat_id"],
+                message_thread_id=msg.get("topic_id"),
+                text=text,
+                parse_mode="HTML",
+                reply_parameters=ReplyParameters(
+                    message_id=msg["message_id"],
+                    allow_sending_without_reply=True
+                )
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reply to message {msg['chat_id']}/{msg['message_id']} "
+                           f"of incident #{incident_id}: {e}")
+            return False
+
+    results = await asyncio.gather(*(reply(msg) for msg in messages))
+    return sum(results)
+
+
+async def _edit_limited(bot: Bot, msg: dict, text: str, keyboard) -> bool:
+    chat_id = msg["chat_id"]
+    for attempt in range(2):
+        await _acquire(bot, chat_id)
+        try:
+            await edit_coalescer.edit(
+                bot,
+                chat_id=chat_id,
+                message_id=msg["message_id"],
+                text=text,
+                parse_mode="HTML",
+                reply_markup=keyboard,
+                window=0
+            )
+            return True
+        except TelegramRetryAfter as e:
+            # Telegram сам сказал, сколько ждать — сдвигаем бакет чата и повторяем
+            logger.warning(f"Flood control for bot {bot.id} in chat {chat_id}: retry after {e.retry_after}s")
+            chat_limiter.penalize((bot.id, str(chat_id)), e.retry_after)
+        except Exception as e:
+            logger.warning(f"Failed to refresh message {chat_id}/{msg['message_id']}: {e}")
+            return False
+    return False
+
+
+async def refresh_many(db, incidents: list[dict], bot: Bot | None = None, progress=None) -> tuple[int, int]:
+    """
+    Перерисовывает сообщения многих инцидентов с соблюдением лимитов Telegram.
+    Чаты обрабатываются параллельно, сообщения одного чата — по очереди.
+    progress(done, total) вызывается после каждого сообщения.
+    Возвращает (обновлено, ошибок).
+    """
+    by_id = {incident['id']: incident for incident in incidents}
+    messages = await db.get_messages_for_incidents(list(by_id))
+
+    # старые инциденты без записей в incident_messages — только основное сообщение
+    known = {msg["incident_id"] for msg in messages}
+    for incident in incidents:
+        if incident['id'] not in known and incident.get('message_id'):
+            messages.append({
+                "incident_id": incident['id'],
+                "chat_id": incident.get('chat_id') or GROUP_ID,
+                "message_id": incident['message_id'],
+                "bot_id": incident.get('bot_id')
+            })
+
+    per_chat = defaultdict(list)
+    for msg in messages:
+        per_chat[str(msg["chat_id"])].append(msg)
+
+    total = len(messages)
+    done = failed = 0
+
+    async def worker(chat_messages: list[dict]):
+        nonlocal done, failed
+        for msg in chat_messages:
+            incident = by_id[msg["incident_id"]]
+            text = format_incident_message(incident)
+            keyboard = build_incident_keyboard(incident['id'], incident['status'])
+            if not await _edit_limited(_bot_for(msg, bot), msg, text, keyboard):
+                failed += 1
+            done += 1
+            if progress:
+                await progress(done, total)
+
+    await asyncio.gather(*(worker(chat_messages) for chat_messages in per_chat.values()))
+    return total - failed, failed
@@ -0,0 +1,113 @@
+import asyncio
+from database.queries import OUTBOX_CHANNEL
+from globals.config import OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS
+from logger.logger import logger
+from utils.alert_router import alert_router
+from utils.escalation import escalations
+from utils.notifier import send_incident, refresh_incident
+
+# Виды заданий: отправить новый инцидент в Telegram / перерисовать его сообщения
+SEND_INCIDENT = "send_incident"
+REFRESH_INCIDENT = "refresh_incident"
+
+
+async def _send_incident_job(db, job: dict):
+    incident = await db.get_incident(job["incident_id"])
+    if not incident:
+        return
+    if incident.get("message_id"):
+        # задание уже выполнялось (аренда истекла после отправки) — не дублируем
+        return
+    targets = alert_router.resolve(incident["severity"], incident["node"], incident["trigger"])
+    sent = await send_incident(db, incident, targets)
+    if not sent:
+        raise RuntimeError("incident was not delivered to any target")
+    escalations.arm(incident)
+
+
+async def _refresh_incident_job(db, job: dict):
+    incident = await db.get_incident(job["incident_id"])
+    if incident:
+        await refresh_incident(db, incident)
+
+
+HANDLERS = {
+    SEND_INCIDENT: _send_incident_job,
+    REFRESH_INCIDENT: _refresh_incident_job,
+}
+
+
+class OutboxWorker:
+    """
+    Обработчик outbox в процессе бота.
+
+    Просыпается по NOTIFY outbox (и раз в poll_interval на случай потерянного
+    уведомления), забирает пачку заданий через FOR UPDATE SKIP LOCKED с арендой
+    lease_seconds и выполняет их. Неудачное задание откладывается с растущей
+    паузой; после max_attempts попыток оно удаляется с записью в лог.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_SECONDS,
+                 lease_seconds: float = OUTBOX_LEASE_SECONDS, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db = None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self, db):
+        self.db = db
+        db.add_listener(OUTBOX_CHANNEL, lambda _payload: self._wakeup.set())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="outbox-worker")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self._drain_once():
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox worker error: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _drain_once(self) -> bool:
+        jobs = await self.db.claim_outbox(self.batch_size, self.lease_seconds)
+        if jobs:
+            await asyncio.gather(*(self._process(job) for job in jobs))
+        return len(jobs) == self.batch_size
+
+    async def _process(self, job: dict):
+        handler = HANDLERS.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"unknown outbox job kind '{job['kind']}'")
+            await handler(self.db, job)
+        except Exception as e:
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"Outbox job #{job['id']} ({job['kind']}) dropped after "
+                             f"{job['attempts']} attempts: {e}")
+                await self.db.complete_outbox(job["id"])
+            else:
+                retry_in = min(2 ** job["attempts"], 300)
+                logger.warning(f"Outbox job #{job['id']} ({job['kind']}) failed, retry in {retry_in}s: {e}")
+                await self.db.fail_outbox(job["id"], str(e), retry_in)
+            return
+        await self.db.complete_outbox(job["id"])
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,117 @@
+import asyncio
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+
+from globals.config import PROFILE_MAX_SECONDS
+from logger.logger import logger
+
+# Одновременно может идти только одна сессия: cProfile не допускает
+# вложенных профайлеров, а два снимка tracemalloc мешают друг другу.
+_profile_lock = asyncio.Lock()
+
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 50
+PROFILE_SUMMARY_TOP = 10
+
+
+class ProfilerBusyError(RuntimeError):
+    """Профилирование уже запущено другим запросом."""
+
+
+def clamp_seconds(seconds: int) -> int:
+    """Ограничивает длительность сессии диапазоном 1..PROFILE_MAX_SECONDS."""
+    return max(1, min(int(seconds), PROFILE_MAX_SECONDS))
+
+
+def _stamp() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+async def profile_cpu(seconds: int) -> tuple[str, bytes, str]:
+    """
+    Снимает cProfile с живого процесса на N секунд.
+    Весь код бота и API крутится в одном event loop, поэтому профайлер,
+    включённый в главном потоке, видит все корутины за время сессии.
+    Возвращает (имя файла, содержимое .pstats, текстовый топ функций).
+    """
+    seconds = clamp_seconds(seconds)
+    if _profile_lock.locked():
+        raise ProfilerBusyError("Профилирование уже выполняется")
+
+    async with _profile_lock:
+        logger.info(f"🔬 cProfile запущен на {seconds}s")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+        profiler.create_stats()
+        dump = marshal.dumps(profiler.stats)
+        summary = _top_functions(profiler)
+        logger.info(f"🔬 cProfile завершён, {len(dump)} байт")
+        return f"profile-{_stamp()}.pstats", dump, summary
+
+
+def _top_functions(profiler: cProfile.Profile, limit: int = PROFILE_SUMMARY_TOP) -> str:
+    """Короткий текстовый топ функций по cumulative‑времени."""
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    # шапку pstats отрезаем — в подписи к файлу нужна только таблица
+    text = out.getvalue()
+    header = text.find("ncalls")
+    return text[header:].strip() if header != -1 else text.strip()
+
+
+async def profile_memory(seconds: int) -> tuple[str, bytes]:
+    """
+    Делает два снимка tracemalloc с интервалом N секунд и возвращает
+    разницу (рост памяти по строкам кода) в виде текстового отчёта.
+    """
+    seconds = clamp_seconds(seconds)
+    if _profile_lock.locked():
+        raise ProfilerBusyError("Профилирование уже выполняется")
+
+    async with _profile_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        logger.info(f"🧠 tracemalloc запущен на {seconds}s")
+        try:
+            before = tracemalloc.take_snapshot()
+            t0 = time.monotonic()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            elapsed = time.monotonic() - t0
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        before = before.filter_traces(filters)
+        after = after.filter_traces(filters)
+        diff = after.compare_to(before, "lineno")
+
+        total_before = sum(s.size for s in before.statistics("filename"))
+        total_after = sum(s.size for s in after.statistics("filename"))
+        lines = [
+            f"tracemalloc diff за {elapsed:.1f}s",
+            f"всего: {total_before / 1024:.1f} KiB → {total_after / 1024:.1f} KiB "
+            f"({(total_after - total_before) / 1024:+.1f} KiB)",
+            "",
+            f"Топ {TRACEMALLOC_TOP} по росту:",
+        ]
+        lines += [str(stat) for stat in diff[:TRACEMALLOC_TOP]]
+        report = "\n".join(lines).encode("utf-8")
+        logger.info(f"🧠 tracemalloc завершён, прирост {(total_after - total_before) / 1024:+.1f} KiB")
+        return f"memdiff-{_stamp()}.txt", report
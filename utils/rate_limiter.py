@@ -0,0 +1,72 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием: reserve() сразу забирает токен (баланс
+    может уйти в минус) и возвращает, сколько ждать. Без блокировок — в
+    asyncio вызов атомарен, а очередь ожидающих получается FIFO.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float | None = None) -> float:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def available(self, now: float | None = None) -> float:
+        """Сколько токенов можно взять прямо сейчас, ничего не забирая."""
+        now = time.monotonic() if now is None else now
+        return min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+
+    def penalize(self, seconds: float):
+        """Сдвигает бакет на seconds вперёд (например, после RetryAfter от Telegram)."""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты: limit событий за per секунд на каждый ключ
+    (например, chat_id). Бакеты неактивных ключей вытесняются по LRU.
+    """
+
+    def __init__(self, limit: float, per: float = 1.0, burst: float | None = None, max_keys: int = 4096):
+        self.rate = limit / per
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    def bucket(self, key=None) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def available(self, key=None) -> float:
+        return self.bucket(key).available()
+
+    def reserve(self, key=None) -> float:
+        return self.bucket(key).reserve()
+
+    async def acquire(self, key=None):
+        delay = self.reserve(key)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, key, seconds: float):
+        self.bucket(key).penalize(seconds)
@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import itertools
+import time
+from logger.logger import logger
+
+
+class _Timer:
+    __slots__ = ("when", "seq", "group", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, seq: int, group, callback, args: tuple):
+        self.when = when
+        self.seq = seq
+        self.group = group
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other: "_Timer"):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class TimerScheduler:
+    """
+    Планировщик отложенных корутин на одной куче и одной фоновой задаче.
+
+    Таймер — запись в куче, а не asyncio‑задача, поэтому тысячи ожидающих
+    таймеров почти ничего не стоят. Таймеры объединяются в группы (например,
+    по ID инцидента): cancel(group) отменяет все таймеры группы. Отмена
+    ленивая — запись помечается и выбрасывается, когда доходит до вершины.
+    Сроки задаются по wall‑clock (time.time()), чтобы их можно было
+    восстанавливать из БД.
+    """
+
+    def __init__(self, name: str = "timers"):
+        self.name = name
+        self._heap: list[_Timer] = []
+        self._groups: dict = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: asyncio.Task | None = None
+        self._running: set = set()
+
+    def start(self):
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run(), name=f"{self.name}-scheduler")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def call_at(self, when: float, group, callback, *args) -> _Timer:
+        """Запланировать callback(*args) (корутину) на время when (unix‑time)."""
+        timer = _Timer(when, next(self._seq), group, callback, args)
+        heapq.heappush(self._heap, timer)
+        self._groups.setdefault(group, set()).add(timer)
+        # новый таймер раньше всех — будим цикл, чтобы он пересчитал сон
+        if self._heap[0] is timer:
+            self._wakeup.set()
+        return timer
+
+    def cancel(self, group) -> int:
+        """Отменяет все таймеры группы; возвращает их количество."""
+        timers = self._groups.pop(group, ())
+        for timer in timers:
+            timer.cancelled = True
+        return len(timers)
+
+    def clear(self):
+        """Отменяет все таймеры."""
+        for group in list(self._groups):
+            self.cancel(group)
+        self._heap.clear()
+
+    def pending(self, group=None) -> int:
+        if group is not None:
+            return len(self._groups.get(group, ()))
+        return sum(len(t) for t in self._groups.values())
+
+    def _discard(self, timer: _Timer):
+        group = self._groups.get(timer.group)
+        if group is not None:
+            group.discard(timer)
+            if not group:
+                del self._groups[timer.group]
+
+    async def _run(self):
+        while True:
+            # выбрасываем отменённые таймеры с вершины кучи
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0].when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            timer = heapq.heappop(self._heap)
+            self._discard(timer)
+            task = asyncio.create_task(self._fire(timer))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, timer: _Timer):
+        try:
+            await timer.callback(*timer.args)
+        except Exception as e:
+            logger.error(f"[{self.name}] Ошибка таймера {timer.group}: {e}", exc_info=True)
@@ -0,0 +1,449 @@
+import asyncio
+import json
+import math
+import random
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+import aiohttp
+from globals.config import (
+    VCD_CONFIG, VCD_VERIFY_SSL, VCD_CONNECT_TIMEOUT, VCD_READ_TIMEOUT, VCD_TIMEOUT, VCD_MAX_CONNECTIONS,
+    VCD_TOKEN_REFRESH_AHEAD, VCD_PAGE_CONCURRENCY, VCD_RETRIES, VCD_RETRY_BACKOFF,
+    VCD_BREAKER_FAILURES, VCD_BREAKER_RESET_SECONDS, VCD_ENDPOINT_POLICY
+)
+from logger.logger import logger
+from utils.circuit_breaker import CircuitBreaker, CircuitOpen
+
+# Пространство имён XML‑ответов vCloud API
+VCD_NS = {"v": "http://www.vmware.com/vcloud/v1.5"}
+
+# Заголовки Accept: CloudAPI (JSON) и legacy API (XML)
+JSON_ACCEPT = "application/json;version=39.1"
+XML_ACCEPT = "application/*+xml;version=39.1"
+XML_ACCEPT_40 = "application/*+xml;version=40.0.0-alpha"
+
+# Максимальный pageSize, который принимают CloudAPI и /api/query
+CLOUDAPI_MAX_PAGE_SIZE = 128
+QUERY_MAX_PAGE_SIZE = 128
+# Размер куска при потоковом чтении ответа
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Если OAuth не вернул expires_in
+DEFAULT_TOKEN_TTL = 55 * 60
+# Токен, которому осталось жить меньше этого, уже не отдаём
+TOKEN_EXPIRY_MARGIN = 30
+# Пауза перед повтором неудачного фонового обновления
+TOKEN_RETRY_DELAY = 30
+
+# Отличия групп эндпоинтов от общих настроек (поверх — VCD_ENDPOINT_POLICY)
+ENDPOINT_DEFAULTS = {
+    "oauth": {"deadline": 15, "retries": 1},
+    "cloudapi": {},
+    "query": {"deadline": 60, "read_timeout": 30},  # страницы /api/query по 128 записей
+    "api": {},
+}
+# Ответы, после которых GET стоит повторить; остальные 4xx — ошибка запроса, а не VCD
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class VcdError(Exception):
+    """Ошибка запроса к VCD (HTTP‑статус, если ответ был)."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class VcdUnavailable(VcdError):
+    """Автомат группы эндпоинтов разомкнут — VCD не опрашивается."""
+
+
+def endpoint_group(url: str) -> str:
+    """Группа эндпоинта по пути: oauth, cloudapi, query или api."""
+    path = urlsplit(url).path
+    for prefix, group in (("/oauth/", "oauth"), ("/cloudapi/", "cloudapi"), ("/api/query", "query")):
+        if path.startswith(prefix):
+            return group
+    return "api"
+
+
+class EndpointPolicy:
+    """
+    Таймауты, повторы и автомат одной группы эндпоинтов VCD.
+
+    deadline — общий срок вызова вместе с повторами; read_timeout — сколько
+    ждать следующей порции ответа. Пауза перед повтором — случайная от 0
+    до backoff·2^n (full jitter), чтобы повторы не шли волной.
+    """
+
+    def __init__(self, name: str, connect_timeout: float, read_timeout: float, deadline: float,
+                 retries: int, backoff: float, breaker_failures: int, breaker_reset: float):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(f"VCD {name}", breaker_failures, breaker_reset)
+        self.attempts_total = 0
+        self.retries_total = 0
+        self.failures_total = 0
+
+    def timeout(self, remaining: float) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=remaining, connect=min(self.connect_timeout, remaining),
+                                     sock_read=self.read_timeout)
+
+    def backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def stats(self) -> dict:
+        return {
+            "attempts_total": self.attempts_total,
+            "retries_total": self.retries_total,
+            "failures_total": self.failures_total,
+            **self.breaker.stats(),
+        }
+
+
+class RecordStream:
+    """
+    Потоковый разбор страницы /api/query?format=records.
+
+    Байты подаются по мере прихода (feed); каждая запись *Record сразу
+    превращается в словарь атрибутов, а элемент удаляется из дерева —
+    память не растёт с размером страницы.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root = None
+        self._depth = 0
+        self.total: int | None = None
+        self.records: list[dict] = []
+
+    def feed(self, chunk: bytes):
+        self._parser.feed(chunk)
+        self._drain()
+
+    def close(self) -> list[dict]:
+        self._parser.close()
+        self._drain()
+        return self.records
+
+    def _drain(self):
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                    total = elem.attrib.get("total")
+                    self.total = int(total) if total and total.isdigit() else None
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth == 1 and elem.tag.endswith("Record"):
+                self.records.append(dict(elem.attrib))
+                self._root.remove(elem)
+
+
+class TokenManager:
+    """
+    Bearer‑токен VCD, общий для всех обработчиков.
+
+    Срок жизни берётся из expires_in ответа OAuth. Пока до истечения больше
+    refresh_ahead секунд, токен отдаётся сразу; ближе к концу — тоже сразу,
+    но в фоне запускается обновление. Одновременные запросы нового токена
+    ждут один и тот же запрос к OAuth. invalidate() — после 401.
+    """
+
+    def __init__(self, fetch, refresh_ahead: float = VCD_TOKEN_REFRESH_AHEAD):
+        self._fetch = fetch
+        self.refresh_ahead = refresh_ahead
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._inflight: asyncio.Task | None = None
+
+    @property
+    def expires_in(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic()) if self._token else 0.0
+
+    async def get(self) -> str:
+        now = time.monotonic()
+        if self._token and now < self._expires_at - TOKEN_EXPIRY_MARGIN:
+            if now >= self._refresh_at:
+                self._start_refresh()
+            return self._token
+        self._start_refresh()
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(self._inflight)
+
+    def invalidate(self, token: str | None):
+        """Сбрасывает токен, если это тот же, что получил 401."""
+        if token is not None and token == self._token:
+            self._token = None
+            logger.info("VCD bearer token invalidated")
+
+    def _start_refresh(self):
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._refresh(), name="vcd-token-refresh")
+            self._inflight.add_done_callback(self._log_failure)
+
+    async def _refresh(self) -> str:
+        started = time.monotonic()
+        try:
+            payload = await self._fetch()
+        except Exception:
+            # не долбим OAuth при каждом запросе, пока старый токен ещё жив
+            self._refresh_at = time.monotonic() + TOKEN_RETRY_DELAY
+            raise
+        ttl = float(payload.get("expires_in") or DEFAULT_TOKEN_TTL)
+        self._token = payload["access_token"]
+        self._expires_at = started + ttl
+        self._refresh_at = self._expires_at - min(self.refresh_ahead, ttl / 2)
+        logger.info(f"VCD bearer token refreshed, expires in {ttl:.0f}s")
+        return self._token
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"VCD token refresh failed: {task.exception()}")
+
+
+class VcdClient:
+    """
+    Асинхронный клиент vCloud Director.
+
+    Одна HTTP‑сессия на процесс: соединения keep-alive переиспользуются
+    (без нового TLS‑рукопожатия на каждый запрос), у каждого запроса есть
+    таймаут, и ожидание ответа VCD не блокирует цикл событий.
+    Авторизация — через общий TokenManager; на 401 токен сбрасывается
+    и запрос повторяется один раз.
+
+    У каждой группы эндпоинтов (oauth, cloudapi, query, api) своя
+    EndpointPolicy: таймауты, повторы GET в пределах общего срока и автомат,
+    который при лежащем VCD сразу отвечает VcdUnavailable — кэши
+    списков в это время отдают прежние данные.
+    """
+
+    def __init__(self, cfg: dict = VCD_CONFIG, timeout: float = VCD_TIMEOUT,
+                 connect_timeout: float = VCD_CONNECT_TIMEOUT, max_connections: int = VCD_MAX_CONNECTIONS,
+                 verify_ssl: bool = VCD_VERIFY_SSL, page_concurrency: int = VCD_PAGE_CONCURRENCY,
+                 endpoint_policy: dict = VCD_ENDPOINT_POLICY):
+        self.cfg = cfg
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.verify_ssl = verify_ssl
+        self._http: aiohttp.ClientSession | None = None
+        self.tokens = TokenManager(self.fetch_token)
+        # общий на все постраничные обходы: страницы разных списков не забивают пул
+        self._pages = asyncio.Semaphore(max(1, page_concurrency))
+        for group in endpoint_policy.keys() - ENDPOINT_DEFAULTS.keys():
+            logger.warning(f"VCD_ENDPOINT_POLICY: unknown endpoint group {group} ignored")
+        self.policies = {}
+        for group, overrides in ENDPOINT_DEFAULTS.items():
+            settings = dict(
+                connect_timeout=connect_timeout, read_timeout=VCD_READ_TIMEOUT, deadline=timeout,
+                retries=VCD_RETRIES, backoff=VCD_RETRY_BACKOFF,
+                breaker_failures=VCD_BREAKER_FAILURES, breaker_reset=VCD_BREAKER_RESET_SECONDS,
+            )
+            for key, value in {**overrides, **endpoint_policy.get(group, {})}.items():
+                if key in settings:
+                    settings[key] = type(settings[key])(value)
+                else:
+                    logger.warning(f"VCD_ENDPOINT_POLICY: unknown setting {group}.{key} ignored")
+            self.policies[group] = EndpointPolicy(group, **settings)
+
+    def _session(self) -> aiohttp.ClientSession:
+        # сессия создаётся лениво — внутри работающего цикла событий
+        if self._http is None or self._http.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                ssl=None if self.verify_ssl else False,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._http = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+            )
+        return self._http
+
+    def url(self, path: str) -> str:
+        """Полный URL: href из ответов VCD уже абсолютный."""
+        return path if path.startswith("http") else f"{self.cfg['base_url']}{path}"
+
+    async def request(self, method: str, path: str, *, accept: str, auth: bool = True,
+                      params: dict | None = None, data: dict | None = None,
+                      timeout: float | None = None, consume=None) -> bytes:
+        """
+        Запрос к VCD; тело ответа — bytes. С consume тело не копится,
+        а отдаётся кусками в consume(chunk) по мере чтения.
+        timeout — общий срок вызова вместо deadline группы эндпоинта.
+        """
+        policy = self.policies[endpoint_group(path)]
+        deadline = time.monotonic() + (timeout if timeout is not None else policy.deadline)
+        token = await self.tokens.get() if auth else None
+        try:
+            return await self._attempts(policy, deadline, method, path, accept, token, params, data, consume)
+        except VcdError as e:
+            if e.status != 401 or not auth:
+                raise
+            logger.warning(f"VCD returned 401 for {method} {path}, refreshing token")
+            self.tokens.invalidate(token)
+            token = await self.tokens.get()
+            return await self._attempts(policy, deadline, method, path, accept, token, params, data, consume)
+
+    async def _attempts(self, policy: EndpointPolicy, deadline: float, method: str, path: str,
+                        accept: str, token: str | None, params: dict | None, data: dict | None,
+                        consume=None) -> bytes:
+        """
+        Попытки запроса до deadline. Повторяются только GET и только пока
+        тело ещё не начало отдаваться в consume; исход каждой попытки
+        учитывается автоматом группы.
+        """
+        streamed = False
+
+        def feed(chunk: bytes):
+            nonlocal streamed
+            streamed = True
+            consume(chunk)
+
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise VcdError(f"{method} {self.url(path)}: deadline exceeded")
+            try:
+                policy.breaker.before()
+            except CircuitOpen as e:
+                raise VcdUnavailable(f"{method} {self.url(path)}: {e}") from e
+            policy.attempts_total += 1
+            try:
+                body = await self._send(method, path, accept, token, params, data,
+                                        policy.timeout(remaining), feed if consume is not None else None)
+            except VcdError as e:
+                if e.status is not None and e.status not in RETRY_STATUSES:
+                    # VCD ответил — ошибка в запросе, а не в доступности
+                    policy.breaker.success()
+                    raise
+                policy.breaker.failure()
+                policy.failures_total += 1
+                delay = policy.backoff_delay(attempt)
+                if (method != "GET" or streamed or attempt >= policy.retries
+                        or time.monotonic() + delay >= deadline):
+                    raise
+                attempt += 1
+                policy.retries_total += 1
+                logger.warning(f"{e}; retry {attempt}/{policy.retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                policy.breaker.release()
+                raise
+            policy.breaker.success()
+            return body
+
+    def stats(self) -> dict:
+        """Счётчики и состояние автоматов по группам эндпоинтов (для метрик)."""
+        return {group: policy.stats() for group, policy in self.policies.items()}
+
+    async def _send(self, method: str, path: str, accept: str, token: str | None,
+                    params: dict | None, data: dict | None, request_timeout: aiohttp.ClientTimeout,
+                    consume=None) -> bytes:
+        url = self.url(path)
+        headers = {"Accept": accept}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            async with self._session().request(method, url, headers=headers, params=params,
+                                               data=data, timeout=request_timeout) as response:
+                if response.status >= 400:
+                    raise VcdError(f"{method} {url}: HTTP {response.status}", response.status)
+                if consume is None:
+                    return await response.read()
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    consume(chunk)
+                return b""
+        except (aiohttp.ClientError, TimeoutError) as e:
+            raise VcdError(f"{method} {url}: {type(e).__name__} {e}") from e
+
+    async def get_json(self, path: str, params: dict | None = None,
+                       accept: str = JSON_ACCEPT, timeout: float | None = None) -> dict:
+        body = await self.request("GET", path, accept=accept, params=params, timeout=timeout)
+        return json.loads(body)
+
+    async def get_xml(self, path: str, params: dict | None = None,
+                      accept: str = XML_ACCEPT, timeout: float | None = None) -> bytes:
+        return await self.request("GET", path, accept=accept, params=params, timeout=timeout)
+
+    async def get_page(self, path: str, params: dict, xml: bool = False, **kwargs):
+        """Страница списка — под общим семафором постраничных обходов."""
+        async with self._pages:
+            if xml:
+                return await self.get_xml(path, params=params, **kwargs)
+            return await self.get_json(path, params=params, **kwargs)
+
+    async def get_all_values(self, path: str, params: dict | None = None,
+                             page_size: int = CLOUDAPI_MAX_PAGE_SIZE) -> list[dict]:
+        """
+        Все элементы values постраничного списка CloudAPI.
+
+        Первая страница сообщает pageCount, остальные запрашиваются
+        одновременно (не больше page_concurrency за раз).
+        """
+        params = dict(params or {}, pageSize=page_size)
+        first = await self.get_page(path, dict(params, page=1))
+        pages = await asyncio.gather(*(
+            self.get_page(path, dict(params, page=page))
+            for page in range(2, int(first.get("pageCount") or 1) + 1)
+        ))
+        values = list(first.get("values", []))
+        for page in pages:
+            values.extend(page.get("values", []))
+        return values
+
+    async def query_records(self, record_type: str, params: dict | None = None,
+                            page_size: int = QUERY_MAX_PAGE_SIZE) -> list[dict]:
+        """
+        Все записи /api/query?type=...&format=records — словари атрибутов.
+
+        Первая страница сообщает total, остальные запрашиваются одновременно
+        (под общим семафором страниц); каждая разбирается потоково.
+        """
+        params = dict(params or {}, type=record_type, format="records", pageSize=page_size)
+        records, total = await self._query_page(params, 1)
+        pages = math.ceil(total / page_size) if total else 1
+        rest = await asyncio.gather(*(self._query_page(params, page) for page in range(2, pages + 1)))
+        for page_records, _ in rest:
+            records.extend(page_records)
+        return records
+
+    async def _query_page(self, params: dict, page: int) -> tuple[list[dict], int | None]:
+        stream = RecordStream()
+        async with self._pages:
+            await self.request("GET", "/api/query", accept=XML_ACCEPT_40,
+                               params=dict(params, page=page), consume=stream.feed)
+        return stream.close(), stream.total
+
+    async def fetch_token(self) -> dict:
+        """Обмен refresh‑токена на Bearer‑токен; ответ OAuth целиком."""
+        body = await self.request(
+            "POST", f"/oauth/tenant/{self.cfg['tenant']}/token",
+            accept="application/json",
+            auth=False,
+            data={"grant_type": "refresh_token", "refresh_token": self.cfg["refresh_token"]},
+        )
+        payload = json.loads(body)
+        if not payload.get("access_token"):
+            raise VcdError("access_token отсутствует в ответе OAuth")
+        return payload
+
+    async def close(self):
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+            logger.info("VCD HTTP session closed")
+        self._http = None
+
+
+vcd = VcdClient()
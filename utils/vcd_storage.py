@@ -0,0 +1,37 @@
+import asyncio
+from globals.config import VCD_STORAGE_CACHE_TTL
+from utils.async_cache import AsyncTTLCache
+from utils.vcd_client import vcd
+
+POLICY_PATH = "/cloudapi/1.0.0/orgVdcStoragePolicies/{urn}"
+
+# urn политики -> {"limit_mb": ..., "used_mb": ...}; пока VCD недоступен — прежние цифры
+_policies = AsyncTTLCache(VCD_STORAGE_CACHE_TTL, serve_stale=True)
+
+
+async def _load_policy(urn: str) -> dict:
+    path = POLICY_PATH.format(urn=urn)
+    policy, consumers = await asyncio.gather(
+        vcd.get_json(path),
+        vcd.get_all_values(f"{path}/consumers"),
+    )
+    return {
+        "limit_mb": policy.get("storageLimitMb", 0),
+        "used_mb": sum(c.get("storageConsumedMb", 0) for c in consumers),
+    }
+
+
+async def storage_policy(urn: str) -> dict:
+    """Лимит и занятое место политики хранения, МБ (кэшируется)."""
+    return await _policies.get(urn, lambda: _load_policy(urn))
+
+
+def storage_policy_stale(urn: str) -> bool:
+    """Цифры политики взяты из кэша: VCD не ответил при последнем обновлении."""
+    return _policies.stale(urn)
+
+
+async def storage_policies(*urns: str) -> dict[str, dict]:
+    """Несколько политик сразу — запрашиваются одновременно."""
+    results = await asyncio.gather(*(storage_policy(urn) for urn in urns))
+    return dict(zip(urns, results))